@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+from qgis.core import (QgsProcessingAlgorithm, QgsProcessingException, QgsProcessingMultiStepFeedback,
+                       QgsProcessingParameterBoolean, QgsProcessingParameterDefinition, QgsProcessingParameterEnum, QgsProcessingParameterFile,
+                       QgsProcessingParameterFileDestination, QgsProcessingParameterNumber)
+import os
+
+from . import etl_manifiesto
+from .etl_cache import CacheETL
+from .etl_escritor import EscritorGpkg
+from .etl_estado import EstadoEjecucion, directorio_trabajo
+from .etl_grafo import ErrorPaso, ejecutar_grafo
+from .etl_pasos import MOTOR_DIRECTO, MOTORES, ConstructorPasos
+from .etl_perfil import PerfilMuestreo
+from .etl_rendimiento import TABLA as TABLA_RENDIMIENTO, MedicionEjecucion, ruta_informe
+from .etl_traza import Traza, ruta_traza
+
+
+class AlgoritmoETL(QgsProcessingAlgorithm):
+    # Cada modelo define su mapa de capas y la lista de pasos
+    CAPAS = {}
+    PASOS = []
+
+    def group(self):
+        return 'Validadores ETL'
+
+    def groupId(self):
+        return 'validadores_etl'
+
+    def createInstance(self):
+        return type(self)()
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterFile(
+                'input_gpkg',
+                'Seleccione el archivo GeoPackage de entrada',
+                extension='gpkg'
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                'output_gpkg',
+                'Archivo GeoPackage de salida',
+                'GeoPackage files (*.gpkg)'
+            )
+        )
+        hilos = QgsProcessingParameterNumber(
+            'hilos',
+            'Número de hilos (0 = todos los núcleos)',
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=0,
+            defaultValue=0,
+            optional=True
+        )
+        hilos.setFlags(hilos.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(hilos)
+        motor = QgsProcessingParameterEnum(
+            'motor',
+            'Motor de ejecución',
+            options=MOTORES,
+            defaultValue=MOTOR_DIRECTO
+        )
+        motor.setFlags(motor.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(motor)
+        usar_cache = QgsProcessingParameterBoolean(
+            'usar_cache',
+            'Reutilizar resultados intermedios de ejecuciones anteriores (guarda copias en la caché local)',
+            defaultValue=False
+        )
+        usar_cache.setFlags(usar_cache.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(usar_cache)
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                'incremental',
+                'Reconstruir solo las tablas cuyas fuentes cambiaron (si la salida ya existe)',
+                defaultValue=False
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                'reanudar',
+                'Reanudar la ejecución anterior interrumpida (sin repetir los pasos terminados)',
+                defaultValue=False
+            )
+        )
+        cache_escritura = QgsProcessingParameterNumber(
+            'cache_escritura_mb',
+            'Caché de páginas en MB del escritor de la salida (0 = 256 MB)',
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=0,
+            defaultValue=0,
+            optional=True
+        )
+        cache_escritura.setFlags(cache_escritura.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(cache_escritura)
+        traza = QgsProcessingParameterBoolean(
+            'traza',
+            'Guardar una traza de la ejecución (<salida>_traza.json, para chrome://tracing o Perfetto)',
+            defaultValue=False
+        )
+        traza.setFlags(traza.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(traza)
+        perfil = QgsProcessingParameterBoolean(
+            'perfil',
+            'Perfilar la ejecución (<salida>_perfil.pstats y <salida>_perfil.folded)',
+            defaultValue=False
+        )
+        perfil.setFlags(perfil.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(perfil)
+
+    def valor(self, parameters, nombre, defecto=None):
+        # El plugin llama a processAlgorithm directamente, sin valores por defecto
+        valor = parameters.get(nombre)
+        return defecto if valor is None or valor == '' else valor
+
+    def terminar_medicion(self, medicion, estado, feedback, cuantos=3):
+        if medicion.perfil is not None:
+            medicion.perfil.detener()
+        informe = medicion.terminar(estado)
+        lentos = sorted(informe['pasos'], key=lambda registro: -registro['segundos'])[:cuantos]
+        if lentos:
+            feedback.pushInfo("Pasos más lentos: " + ", ".join(
+                f"{registro['paso']} ({registro['segundos']:.2f} s)" for registro in lentos))
+        feedback.pushInfo(f"Informe de rendimiento: {ruta_informe(informe['salida'])} "
+                          f"(y tabla {TABLA_RENDIMIENTO} de la salida)")
+        if medicion.traza is not None:
+            ruta = medicion.traza.guardar(ruta_traza(informe['salida']), ejecucion=informe['ejecucion'],
+                                          modelo=informe['modelo'], estado=estado)
+            feedback.pushInfo(f"Traza de la ejecución: {ruta}")
+        if medicion.perfil is not None:
+            ruta_pstats, ruta_folded = medicion.perfil.guardar(informe['salida'])
+            feedback.pushInfo(f"Perfil de la ejecución: {ruta_pstats} y {ruta_folded}")
+            costosas = medicion.perfil.mas_costosas(cuantos)
+            if costosas:
+                feedback.pushInfo("Funciones con más tiempo propio: " + ", ".join(
+                    f"{funcion} ({segundos:.2f} s)" for funcion, segundos in costosas))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        input_gpkg = parameters['input_gpkg']
+        output_gpkg = parameters['output_gpkg']
+        hilos = int(self.valor(parameters, 'hilos', 0)) or os.cpu_count()
+        motor = int(self.valor(parameters, 'motor', MOTOR_DIRECTO))
+        cache = CacheETL() if self.valor(parameters, 'usar_cache', False) else None
+        incremental = bool(self.valor(parameters, 'incremental', False))
+        reanudar = bool(self.valor(parameters, 'reanudar', False))
+        cache_escritura_mb = int(self.valor(parameters, 'cache_escritura_mb', 0))
+        traza = None
+        if self.valor(parameters, 'traza', False):
+            traza = Traza(f"{self.name()} {os.path.basename(input_gpkg)}")
+        perfil = PerfilMuestreo() if self.valor(parameters, 'perfil', False) else None
+
+        if not os.path.isfile(input_gpkg):
+            raise QgsProcessingException(f"No existe el archivo de entrada: {input_gpkg}")
+
+        feedback.pushInfo(f"Archivo de entrada: {input_gpkg}")
+        feedback.pushInfo(f"Archivo de salida: {output_gpkg}")
+
+        # Crear el directorio de salida si no existe
+        directory = os.path.dirname(output_gpkg)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        estado = EstadoEjecucion(directorio_trabajo(output_gpkg), reanudar)
+        if reanudar:
+            feedback.pushInfo(f"Reanudando: {estado.anotados} pasos anotados en {estado.directorio}")
+        anteriores = etl_manifiesto.leer(output_gpkg) if incremental else None
+        cache_kb = cache_escritura_mb * 1024 if cache_escritura_mb else None
+        medicion = MedicionEjecucion(self.name(), input_gpkg, output_gpkg, hilos, MOTORES[motor], traza, perfil)
+        medicion.iniciar()
+        if perfil is not None:
+            perfil.iniciar()
+        # Con el motor directo todas las escrituras a la salida van por una conexión
+        escritor = EscritorGpkg(output_gpkg, cache_kb=cache_kb, traza=traza) if motor == MOTOR_DIRECTO else None
+        constructor = ConstructorPasos(input_gpkg, output_gpkg, self.CAPAS, context, motor, cache, estado, escritor,
+                                       medicion, traza)
+        try:
+            # En una ejecución incremental incluye las huellas de las tablas de entrada
+            with medicion.medir('planificacion', 'planificar', 'planificación de los pasos'):
+                grafo = constructor.construir(self.PASOS, anteriores)
+        except Exception:
+            if escritor is not None:
+                escritor.cerrar()
+            self.terminar_medicion(medicion, 'error', feedback)
+            raise
+        if constructor.conservadas:
+            feedback.pushInfo(f"Tablas sin cambios en sus fuentes (se conservan): "
+                              f"{', '.join(sorted(constructor.conservadas))}")
+        reconstruidas = {tabla: firma for tabla, firma in constructor.firmas_salida.items()
+                         if tabla not in constructor.conservadas}
+        # Sin incremental no hay firmas: ninguna tabla del manifiesto anterior queda al día
+        etl_manifiesto.olvidar(output_gpkg, reconstruidas if incremental else etl_manifiesto.leer(output_gpkg))
+        feedback = QgsProcessingMultiStepFeedback(len(grafo), feedback)
+        terminados = []
+
+        def al_iniciar(paso):
+            feedback.pushInfo(f"Procesando {paso.descripcion}...")
+
+        def al_terminar(paso, resultado):
+            terminados.append(paso.nombre)
+            geometrias = (resultado or {}).get('GEOMETRIAS')
+            if geometrias and geometrias['invalidas']:
+                feedback.pushInfo(f"{paso.nombre}: {geometrias['invalidas']} geometrías inválidas, "
+                                  f"{geometrias['corregidas']} corregidas, {geometrias['descartadas']} descartadas")
+            feedback.setCurrentStep(len(terminados))
+
+        resultados = None
+        terminada = 'error'
+        try:
+            resultados = ejecutar_grafo(grafo, max_hilos=hilos, cancelado=feedback.isCanceled,
+                                        al_iniciar=al_iniciar, al_terminar=al_terminar,
+                                        al_cancelar=constructor.cancelar)
+            terminada = 'ok' if resultados is not None else 'cancelado'
+        except ErrorPaso as e:
+            raise QgsProcessingException(f"{e}. Los pasos terminados quedaron anotados; "
+                                         f"puede continuar con la opción 'reanudar'.")
+        finally:
+            if escritor is not None:
+                # Los índices espaciales se construyen al final, con las tablas completas
+                if resultados is not None:
+                    feedback.pushInfo("Construyendo índices espaciales...")
+                    with medicion.medir('indices_espaciales', 'indice', 'índices espaciales', True, terminados):
+                        escritor.finalizar()
+                else:
+                    escritor.cerrar()
+            constructor.limpiar()
+            if cache is not None:
+                cache.recortar()
+            self.terminar_medicion(medicion, terminada, feedback)
+
+        if constructor.reutilizados:
+            feedback.pushInfo(f"Intermedios reutilizados de la caché: {', '.join(constructor.reutilizados)}")
+
+        if estado.recuperados:
+            feedback.pushInfo(f"Pasos recuperados de la ejecución anterior: {len(estado.recuperados)}")
+
+        if resultados is None:
+            return {}
+        estado.terminar()
+        if reconstruidas:
+            etl_manifiesto.escribir(output_gpkg, self.name(), reconstruidas)
+        return {'Output GeoPackage': output_gpkg}
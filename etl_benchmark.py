@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de escala de los tres ETL.
+
+    python -m Validadores.etl_benchmark -d bench/ --predios 10000 100000 1000000 --linea-base linea_base.json
+
+Por cada modelo y tamaño se genera (una vez) una entrada sintética con
+etl_sintetico, se ejecuta el algoritmo sin interfaz en un proceso nuevo (la
+memoria pico es la de esa ejecución, no la de las anteriores) y se lee su
+informe de rendimiento. De cada paso queda el tiempo, las entidades por
+segundo, el aumento de memoria y los bytes escritos; de cada ejecución, el
+tiempo total, predios por segundo, la memoria pico y el tamaño de la salida.
+
+El resultado se guarda en <directorio>/resultados.json y las curvas de escala
+en <directorio>/curvas.csv (una fila por modelo, paso y tamaño), con el
+exponente de escala de cada paso (1 = lineal) en el JSON. Si matplotlib está
+instalado también se dibuja <directorio>/curvas.png.
+
+Con --linea-base se compara contra un resultado guardado antes (con
+--guardar-linea-base): un paso o una ejecución que tarde más que la línea
+base por encima de la tolerancia, o que use más memoria, es una regresión y
+el código de salida es 1. Las líneas base solo son comparables en la misma
+máquina y con los mismos tamaños. Cada medición guarda además la huella de
+cada tabla de salida (etl_huella); si la de la línea base es distinta para el
+mismo modelo, tamaño y semilla, la salida cambió y también se informa.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from . import etl_huella, etl_sintetico
+from .etl_cli import MOTORES_CLI, NOMBRES_MODELOS
+from .etl_rendimiento import ruta_informe, version_plugin
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot
+except ImportError:
+    pyplot = None
+
+
+PREDIOS = [10000, 100000, 500000, 2000000]
+TOLERANCIA = 0.15           # aumento relativo que se tolera antes de marcar una regresión
+MINIMO_SEGUNDOS = 0.5       # diferencias menores se consideran ruido
+MINIMO_MEMORIA_MB = 50.0
+# Calidad de los datos generados: como un municipio real, con algunos registros problemáticos
+NULOS = 0.01
+HUERFANOS = 0.005
+INVALIDAS = 0.002
+
+
+def ruta_entrada(directorio, modelo, predios, semilla):
+    return os.path.join(directorio, 'entradas', f'{modelo}_{predios}_s{semilla}.gpkg')
+
+
+def ruta_salida(directorio, modelo, predios):
+    return os.path.join(directorio, 'salidas', f'{modelo}_{predios}.gpkg')
+
+
+def preparar_entrada(directorio, modelo, predios, semilla=0):
+    """GeoPackage sintético para (modelo, predios); se reutiliza si ya existe."""
+    ruta = ruta_entrada(directorio, modelo, predios, semilla)
+    if not os.path.isfile(ruta):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = ruta + '.tmp'
+        etl_sintetico.generar(modelo, temporal, predios, NULOS, HUERFANOS, INVALIDAS, semilla)
+        os.replace(temporal, ruta)
+    return ruta
+
+
+def _limpiar_salida(salida):
+    base = os.path.splitext(salida)[0]
+    for ruta in (salida, f'{salida}-wal', f'{salida}-shm', f'{salida}-journal', ruta_informe(salida),
+                 f'{base}_traza.json', f'{base}_perfil.pstats', f'{base}_perfil.folded'):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def ejecutar(trabajo, mismo_proceso=False):
+    """Ejecuta un trabajo de etl_cli; por defecto en un proceso nuevo que termina al acabar."""
+    if mismo_proceso:
+        from .etl_cli import ejecutar_trabajo
+        return ejecutar_trabajo(trabajo)
+    from .etl_workers import PoolTrabajadores
+    with PoolTrabajadores(1, max_trabajos=1) as pool:
+        return pool.mapa([trabajo])[0]
+
+
+def _por_segundo(entidades, segundos):
+    if not entidades or not segundos:
+        return None
+    return round(entidades / segundos, 1)
+
+
+def medicion(modelo, predios, informe, salida):
+    """Resumen de una ejecución a partir de su informe de rendimiento."""
+    pasos = {}
+    for registro in informe['pasos']:
+        entidades = registro['entidades_salida'] or registro['entidades_entrada']
+        pasos[registro['paso']] = {
+            'tipo': registro['tipo'],
+            'segundos': registro['segundos'],
+            'entidades': entidades,
+            'entidades_por_segundo': _por_segundo(entidades, registro['segundos']),
+            'memoria_pico_mb': registro['memoria_pico_mb'],
+            'bytes_escritos': registro['bytes_escritos'],
+        }
+    return {
+        'modelo': modelo,
+        'predios': predios,
+        'estado': informe['estado'],
+        'segundos': informe['segundos'],
+        'cpu_segundos': informe['cpu_segundos'],
+        'predios_por_segundo': _por_segundo(predios, informe['segundos']),
+        'memoria_pico_mb': informe['memoria_pico_mb'],
+        'bytes_salida': os.path.getsize(salida) if os.path.isfile(salida) else None,
+        'pasos': pasos,
+    }
+
+
+def medir(directorio, modelo, predios, repeticiones=1, semilla=0, hilos=0, motor='directo', mismo_proceso=False,
+          avisar=print):
+    """Mediana de `repeticiones` ejecuciones de `modelo` con `predios` predios."""
+    entrada = preparar_entrada(directorio, modelo, predios, semilla)
+    salida = ruta_salida(directorio, modelo, predios)
+    os.makedirs(os.path.dirname(salida), exist_ok=True)
+    parametros = {'hilos': hilos or os.cpu_count() or 1, 'motor': MOTORES_CLI[motor], 'usar_cache': False,
+                  'incremental': False, 'reanudar': False}
+    mediciones = []
+    for repeticion in range(repeticiones):
+        _limpiar_salida(salida)
+        resumen = ejecutar({'modelo': modelo, 'entrada': os.path.abspath(entrada), 'salida': os.path.abspath(salida),
+                            'parametros': parametros, 'silencioso': True}, mismo_proceso)
+        if resumen['estado'] != 'ok':
+            raise RuntimeError(f"{modelo} con {predios} predios: {resumen.get('error', resumen['estado'])}")
+        with open(ruta_informe(salida), encoding='utf-8') as archivo:
+            mediciones.append(medicion(modelo, predios, json.load(archivo), salida))
+        avisar(f'{modelo} {predios} predios ({repeticion + 1}/{repeticiones}): '
+               f"{mediciones[-1]['segundos']:.1f} s, {mediciones[-1]['predios_por_segundo']} predios/s")
+    # La ejecución de tiempo mediano representa el tamaño (los pasos quedan consistentes entre sí)
+    mediciones.sort(key=lambda resultado: resultado['segundos'])
+    elegida = mediciones[(len(mediciones) - 1) // 2]
+    elegida['repeticiones'] = [resultado['segundos'] for resultado in mediciones]
+    elegida['semilla'] = semilla
+    elegida['huellas'] = etl_huella.huellas(salida)
+    return elegida
+
+
+def exponente(puntos):
+    """Pendiente de log(segundos) contra log(predios): 1 es lineal, 2 cuadrático."""
+    puntos = [(math.log(predios), math.log(segundos)) for predios, segundos in puntos if predios > 0 and segundos]
+    if len(puntos) < 2:
+        return None
+    media_x = statistics.fmean(x for x, _ in puntos)
+    media_y = statistics.fmean(y for _, y in puntos)
+    varianza = sum((x - media_x) ** 2 for x, _ in puntos)
+    if not varianza:
+        return None
+    return round(sum((x - media_x) * (y - media_y) for x, y in puntos) / varianza, 3)
+
+
+def curvas(mediciones):
+    """{modelo: {'total': exponente, 'pasos': {paso: exponente}}} de las mediciones de todos los tamaños."""
+    resultado = {}
+    for modelo in sorted({m['modelo'] for m in mediciones}):
+        propias = sorted((m for m in mediciones if m['modelo'] == modelo), key=lambda m: m['predios'])
+        pasos = {paso for m in propias for paso in m['pasos']}
+        resultado[modelo] = {
+            'total': exponente([(m['predios'], m['segundos']) for m in propias]),
+            'pasos': {paso: exponente([(m['predios'], m['pasos'][paso]['segundos'])
+                                       for m in propias if paso in m['pasos']]) for paso in sorted(pasos)},
+        }
+    return resultado
+
+
+def escribir_csv(ruta, mediciones):
+    with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(['modelo', 'paso', 'tipo', 'predios', 'segundos', 'entidades', 'entidades_por_segundo',
+                           'memoria_pico_mb', 'bytes'])
+        for m in sorted(mediciones, key=lambda m: (m['modelo'], m['predios'])):
+            escritor.writerow([m['modelo'], '(total)', None, m['predios'], m['segundos'], m['predios'],
+                               m['predios_por_segundo'], m['memoria_pico_mb'], m['bytes_salida']])
+            for paso, datos in sorted(m['pasos'].items()):
+                escritor.writerow([m['modelo'], paso, datos['tipo'], m['predios'], datos['segundos'],
+                                   datos['entidades'], datos['entidades_por_segundo'], datos['memoria_pico_mb'],
+                                   datos['bytes_escritos']])
+
+
+def dibujar(ruta, mediciones, pasos_por_modelo=5):
+    # Tiempo total y de los pasos más lentos contra el número de predios, en escala log-log
+    modelos = sorted({m['modelo'] for m in mediciones})
+    figura, ejes = pyplot.subplots(1, len(modelos), figsize=(6 * len(modelos), 5), squeeze=False)
+    for eje, modelo in zip(ejes[0], modelos):
+        propias = sorted((m for m in mediciones if m['modelo'] == modelo), key=lambda m: m['predios'])
+        eje.plot([m['predios'] for m in propias], [m['segundos'] for m in propias], 'k-o', label='total')
+        mayor = propias[-1]['pasos']
+        for paso in sorted(mayor, key=lambda paso: mayor[paso]['segundos'], reverse=True)[:pasos_por_modelo]:
+            puntos = [(m['predios'], m['pasos'][paso]['segundos']) for m in propias if paso in m['pasos']]
+            eje.plot(*zip(*puntos), '--.', label=paso)
+        eje.set_xscale('log')
+        eje.set_yscale('log')
+        eje.set_title(modelo)
+        eje.set_xlabel('predios')
+        eje.set_ylabel('segundos')
+        eje.legend(fontsize='small')
+    figura.tight_layout()
+    figura.savefig(ruta)
+    pyplot.close(figura)
+
+
+def _cambio(base, nuevo, minimo, tolerancia):
+    # Aumento relativo si supera la tolerancia y el mínimo absoluto; None si no es regresión
+    if base is None or nuevo is None or nuevo - base < minimo:
+        return None
+    relativo = (nuevo - base) / base if base else math.inf
+    return relativo if relativo > tolerancia else None
+
+
+def comparar(linea_base, resultados, tolerancia=TOLERANCIA):
+    """Regresiones de `resultados` respecto a `linea_base` (mismo modelo y tamaño)."""
+    base = {(m['modelo'], m['predios']): m for m in linea_base['mediciones']}
+    regresiones = []
+    for m in resultados['mediciones']:
+        anterior = base.get((m['modelo'], m['predios']))
+        if anterior is None:
+            continue
+        candidatos = [('(total)', 'segundos', anterior['segundos'], m['segundos'], MINIMO_SEGUNDOS),
+                      ('(total)', 'memoria_pico_mb', anterior['memoria_pico_mb'], m['memoria_pico_mb'],
+                       MINIMO_MEMORIA_MB)]
+        candidatos += [(paso, 'segundos', anterior['pasos'][paso]['segundos'], datos['segundos'], MINIMO_SEGUNDOS)
+                       for paso, datos in m['pasos'].items() if paso in anterior['pasos']]
+        for paso, medida, antes, ahora, minimo in candidatos:
+            relativo = _cambio(antes, ahora, minimo, tolerancia)
+            if relativo is not None:
+                regresiones.append({'modelo': m['modelo'], 'predios': m['predios'], 'paso': paso, 'medida': medida,
+                                    'linea_base': antes, 'actual': ahora, 'aumento': round(relativo, 3)})
+    return regresiones
+
+
+def salidas_distintas(linea_base, resultados):
+    """Tablas cuya huella cambió respecto a `linea_base` (mismo modelo, tamaño y semilla)."""
+    base = {(m['modelo'], m['predios'], m.get('semilla')): m for m in linea_base['mediciones']}
+    cambios = []
+    for m in resultados['mediciones']:
+        anterior = base.get((m['modelo'], m['predios'], m.get('semilla')))
+        if anterior is None or 'huellas' not in anterior or 'huellas' not in m:
+            continue
+        for tabla in sorted(set(anterior['huellas']) | set(m['huellas'])):
+            antes, ahora = anterior['huellas'].get(tabla), m['huellas'].get(tabla)
+            if antes != ahora:
+                cambios.append({'modelo': m['modelo'], 'predios': m['predios'], 'tabla': tabla,
+                                'linea_base': antes, 'actual': ahora})
+    return cambios
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog='etl_benchmark',
+        description='Mide el tiempo, la memoria y el tamaño de salida de los ETL con entradas sintéticas de '
+                    'varios tamaños.'
+    )
+    parser.add_argument('-d', '--directorio', required=True,
+                        help='Directorio de trabajo: entradas generadas, salidas y resultados')
+    parser.add_argument('-m', '--modelos', nargs='+', choices=NOMBRES_MODELOS, default=NOMBRES_MODELOS,
+                        help='Modelos que se miden')
+    parser.add_argument('-n', '--predios', nargs='+', type=int, default=PREDIOS, help='Tamaños en número de predios')
+    parser.add_argument('-r', '--repeticiones', type=int, default=1,
+                        help='Ejecuciones por modelo y tamaño; se conserva la de tiempo mediano')
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla de las entradas sintéticas')
+    parser.add_argument('--hilos', type=int, default=0, help='Hilos por ejecución (0 = todos los núcleos)')
+    parser.add_argument('--motor', choices=sorted(MOTORES_CLI), default='directo', help='Motor de ejecución')
+    parser.add_argument('--linea-base', metavar='ARCHIVO', help='Resultados anteriores con los que comparar')
+    parser.add_argument('--guardar-linea-base', action='store_true',
+                        help='Guardar estos resultados como línea base en el archivo de --linea-base')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help='Aumento relativo tolerado antes de marcar una regresión (0.15 = 15 %%)')
+    parser.add_argument('--mismo-proceso', action='store_true',
+                        help='Ejecutar en este proceso (la memoria pico acumula las ejecuciones anteriores)')
+    return parser
+
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if args.guardar_linea_base and not args.linea_base:
+        parser.error('--guardar-linea-base requiere --linea-base')
+    if args.repeticiones < 1 or min(args.predios) < 1:
+        parser.error('Las repeticiones y los tamaños deben ser al menos 1')
+    os.makedirs(args.directorio, exist_ok=True)
+
+    def avisar(mensaje):
+        print(mensaje, file=sys.stderr, flush=True)
+
+    inicio = time.perf_counter()
+    mediciones = []
+    for modelo in args.modelos:
+        for predios in sorted(set(args.predios)):
+            mediciones.append(medir(args.directorio, modelo, predios, args.repeticiones, args.semilla, args.hilos,
+                                    args.motor, args.mismo_proceso, avisar))
+    resultados = {
+        'fecha': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'version': version_plugin(),
+        'maquina': {'sistema': platform.platform(), 'procesador': platform.processor() or platform.machine(),
+                    'nucleos': os.cpu_count(), 'python': platform.python_version()},
+        'motor': args.motor,
+        'hilos': args.hilos or os.cpu_count(),
+        'semilla': args.semilla,
+        'segundos': round(time.perf_counter() - inicio, 3),
+        'exponentes': curvas(mediciones),
+        'mediciones': mediciones,
+    }
+
+    regresiones = []
+    cambios = []
+    if args.linea_base and os.path.isfile(args.linea_base) and not args.guardar_linea_base:
+        with open(args.linea_base, encoding='utf-8') as archivo:
+            linea_base = json.load(archivo)
+        regresiones = comparar(linea_base, resultados, args.tolerancia)
+        cambios = salidas_distintas(linea_base, resultados)
+        resultados['linea_base'] = {'archivo': args.linea_base, 'version': linea_base.get('version'),
+                                    'fecha': linea_base.get('fecha'), 'regresiones': regresiones,
+                                    'salidas_distintas': cambios}
+        for r in regresiones:
+            avisar(f"Regresión: {r['modelo']} {r['predios']} predios, {r['paso']} {r['medida']}: "
+                   f"{r['linea_base']} -> {r['actual']} (+{r['aumento']:.0%})")
+        for c in cambios:
+            avisar(f"Salida distinta: {c['modelo']} {c['predios']} predios, {c['tabla']}: "
+                   f"{c['linea_base']} -> {c['actual']}")
+        if not regresiones and not cambios:
+            avisar(f'Sin regresiones respecto a {args.linea_base}')
+
+    with open(os.path.join(args.directorio, 'resultados.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+    escribir_csv(os.path.join(args.directorio, 'curvas.csv'), mediciones)
+    if pyplot is not None:
+        dibujar(os.path.join(args.directorio, 'curvas.png'), mediciones)
+    if args.guardar_linea_base:
+        with open(args.linea_base, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+        avisar(f'Línea base guardada en {args.linea_base}')
+    for modelo, exponentes in resultados['exponentes'].items():
+        avisar(f"{modelo}: exponente de escala {exponentes['total']}")
+    return 1 if regresiones or cambios else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Caché en disco de resultados intermedios entre ejecuciones.
+
+Cada resultado se guarda como un GeoPackage bajo una clave que combina los
+parámetros del paso con la huella de las tablas de origen (ver huella_tabla).
+Si la fuente no cambió, el intermedio se reutiliza; el tamaño total se limita
+desalojando las entradas usadas hace más tiempo (LRU).
+
+Este módulo no depende de QGIS.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from . import etl_huella, gpkg_sql
+
+
+VERSION = 2
+LIMITE_MB = 2048
+
+
+def directorio_por_defecto():
+    return os.environ.get('VALIDADORES_ETL_CACHE') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'validadores_etl')
+
+
+def limite_por_defecto():
+    return int(os.environ.get('VALIDADORES_ETL_CACHE_MB', LIMITE_MB)) * 1024 * 1024
+
+
+def huella_tabla(ruta, tabla, contenido=True):
+    """
+    Huella de una tabla. Con `contenido`, la huella exacta de sus filas
+    (etl_huella): cambia con cualquier edición, la haga QGIS o un script de
+    SQLite, también cuando dos filas intercambian valores (lo que cambia el
+    primer coincidente de una unión). Sin `contenido`, solo metadatos que no
+    obligan a leer las filas: número de filas, último rowid y
+    gpkg_contents.last_change.
+    """
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        if not gpkg_sql.existe_tabla(conn, tabla):
+            # El paso que la lee dará el error con su contexto
+            return {'existe': False}
+        tabla = gpkg_sql.nombre_real(conn, tabla)
+        if contenido:
+            return {'contenido': etl_huella.huella_tabla(conn, tabla, exacta=True)['huella']}
+        cambio = None
+        if gpkg_sql.existe_tabla(conn, 'gpkg_contents'):
+            fila = conn.execute('SELECT last_change FROM gpkg_contents WHERE lower(table_name) = lower(?)',
+                                (tabla,)).fetchone()
+            cambio = fila[0] if fila else None
+        filas, max_rowid = conn.execute(f'SELECT count(*), max(rowid) FROM {gpkg_sql.identificador(tabla)}').fetchone()
+        return {'filas': filas, 'max_rowid': max_rowid, 'last_change': cambio}
+    finally:
+        conn.close()
+
+
+def clave(firma):
+    texto = json.dumps([VERSION, firma], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _reemplazar(valor, antes, despues):
+    if isinstance(valor, str):
+        return valor.replace(antes, despues)
+    if isinstance(valor, dict):
+        return {k: _reemplazar(v, antes, despues) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return type(valor)(_reemplazar(v, antes, despues) for v in valor)
+    return valor
+
+
+def _ruta_resultado(resultado):
+    salida = resultado.get('OUTPUT')
+    if not isinstance(salida, str):
+        return None
+    ruta = salida.split('|', 1)[0]
+    return ruta if os.path.isfile(ruta) else None
+
+
+class CacheETL:
+    def __init__(self, directorio=None, limite=None):
+        self.directorio = directorio or directorio_por_defecto()
+        self.limite = limite_por_defecto() if limite is None else limite
+        os.makedirs(self.directorio, exist_ok=True)
+        self._indice = os.path.join(self.directorio, 'indice.sqlite')
+        self._lock = threading.Lock()
+        conn = self._conectar()
+        try:
+            conn.execute('''CREATE TABLE IF NOT EXISTS entradas (
+                clave TEXT PRIMARY KEY, archivo TEXT NOT NULL, bytes INTEGER NOT NULL,
+                resultado TEXT NOT NULL, ultimo_uso REAL NOT NULL)''')
+        finally:
+            conn.close()
+
+    def _conectar(self):
+        return gpkg_sql.conectar(self._indice)
+
+    def obtener(self, clave):
+        # Resultado guardado o None; marca la entrada como usada
+        with self._lock:
+            conn = self._conectar()
+            try:
+                fila = conn.execute('SELECT archivo, resultado FROM entradas WHERE clave = ?', (clave,)).fetchone()
+                if fila is None:
+                    return None
+                if not os.path.isfile(os.path.join(self.directorio, fila[0])):
+                    conn.execute('DELETE FROM entradas WHERE clave = ?', (clave,))
+                    return None
+                conn.execute('UPDATE entradas SET ultimo_uso = ? WHERE clave = ?', (time.time(), clave))
+            finally:
+                conn.close()
+        return _reemplazar(json.loads(fila[1]), '{cache}', self.directorio)
+
+    def guardar(self, clave, resultado):
+        # Copia el GeoPackage del resultado a la caché y devuelve el resultado apuntando a la copia
+        ruta = _ruta_resultado(resultado)
+        if ruta is None:
+            return resultado
+        archivo = f'{clave}.gpkg'
+        destino = os.path.join(self.directorio, archivo)
+        temporal = f'{destino}.{threading.get_ident()}.tmp'
+        shutil.copyfile(ruta, temporal)
+        os.replace(temporal, destino)
+        guardado = _reemplazar(resultado, ruta, os.path.join('{cache}', archivo))
+        with self._lock:
+            conn = self._conectar()
+            try:
+                conn.execute('INSERT OR REPLACE INTO entradas VALUES (?, ?, ?, ?, ?)',
+                             (clave, archivo, os.path.getsize(destino),
+                              json.dumps(guardado, ensure_ascii=False), time.time()))
+            finally:
+                conn.close()
+        return _reemplazar(guardado, '{cache}', self.directorio)
+
+    def recortar(self):
+        # Desaloja las entradas menos usadas hasta quedar dentro del límite
+        with self._lock:
+            conn = self._conectar()
+            try:
+                total = conn.execute('SELECT ifnull(sum(bytes), 0) FROM entradas').fetchone()[0]
+                if total <= self.limite:
+                    return 0
+                desalojadas = 0
+                for clave, archivo, tamano in conn.execute(
+                        'SELECT clave, archivo, bytes FROM entradas ORDER BY ultimo_uso').fetchall():
+                    if total <= self.limite:
+                        break
+                    try:
+                        os.remove(os.path.join(self.directorio, archivo))
+                    except FileNotFoundError:
+                        pass
+                    conn.execute('DELETE FROM entradas WHERE clave = ?', (clave,))
+                    total -= tamano
+                    desalojadas += 1
+                return desalojadas
+            finally:
+                conn.close()
+
+    def vaciar(self):
+        with self._lock:
+            conn = self._conectar()
+            try:
+                for archivo, in conn.execute('SELECT archivo FROM entradas').fetchall():
+                    try:
+                        os.remove(os.path.join(self.directorio, archivo))
+                    except FileNotFoundError:
+                        pass
+                conn.execute('DELETE FROM entradas')
+            finally:
+                conn.close()
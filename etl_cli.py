@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Ejecución de los ETL sin interfaz gráfica.
+
+    python -m Validadores.etl_cli ladm_1_2 municipio1.gpkg municipio2.gpkg -d salidas/ -j 4
+    python -m Validadores.etl_cli auto municipio1.gpkg municipio2.gpkg -d salidas/
+
+Con el modelo "auto" el de cada entrada se identifica por sus metadatos (ver
+etl_modelos); una entrada que no coincide con ningún perfil se informa como
+fallida sin ejecutarse.
+
+Cada GeoPackage de entrada es un trabajo; los trabajos se reparten entre
+procesos (cada uno inicializa QGIS una vez, ver etl_workers) o se envían a un
+servidor de trabajadores ya iniciado con --servidor. Al final se escribe un resumen
+JSON con el estado de cada uno. El código de salida es 0 si todos terminaron
+bien, 1 si alguno falló y 2 si los argumentos no son válidos.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from . import etl_modelos
+
+
+NOMBRES_MODELOS = list(etl_modelos.PERFILES)
+AUTOMATICO = 'auto'
+MOTORES_CLI = {'processing': 0, 'directo': 1}
+
+_app = None
+
+
+def iniciar_qgis():
+    """Inicializa QGIS sin ventana y registra Processing y el proveedor del plugin."""
+    global _app
+    if _app is not None:
+        return _app
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from qgis.core import QgsApplication
+    prefijo = os.environ.get('QGIS_PREFIX_PATH')
+    if prefijo:
+        QgsApplication.setPrefixPath(prefijo, True)
+    _app = QgsApplication([], False)
+    _app.initQgis()
+
+    # processing vive en los plugins de Python de QGIS
+    plugins = os.path.join(QgsApplication.pkgDataPath(), 'python', 'plugins')
+    if plugins not in sys.path:
+        sys.path.append(plugins)
+    from processing.core.Processing import Processing
+    Processing.initialize()
+    registro = QgsApplication.processingRegistry()
+    if registro.providerById('native') is None:
+        from qgis.analysis import QgsNativeAlgorithms
+        registro.addProvider(QgsNativeAlgorithms())
+
+    from .validadores_provider import ValidadoresProvider
+    if registro.providerById('validadoresETL') is None:
+        registro.addProvider(ValidadoresProvider())
+    return _app
+
+
+def _feedback(prefijo, silencioso):
+    from qgis.core import QgsProcessingFeedback
+
+    class FeedbackConsola(QgsProcessingFeedback):
+        def pushInfo(self, info):
+            if not silencioso:
+                print(f"[{prefijo}] {info}", file=sys.stderr, flush=True)
+
+        def pushWarning(self, warning):
+            print(f"[{prefijo}] Advertencia: {warning}", file=sys.stderr, flush=True)
+
+        def reportError(self, error, fatalError=False):
+            print(f"[{prefijo}] Error: {error}", file=sys.stderr, flush=True)
+
+    return FeedbackConsola()
+
+
+def ejecutar_trabajo(trabajo):
+    """
+    Ejecuta un trabajo {'modelo', 'entrada', 'salida', 'parametros', 'silencioso'}
+    y devuelve su resumen. Nunca lanza excepciones: el error queda en el resumen.
+    """
+    inicio = time.perf_counter()
+    resumen = {'modelo': trabajo['modelo'], 'entrada': trabajo['entrada'], 'salida': trabajo['salida']}
+    try:
+        iniciar_qgis()
+        from qgis.core import QgsProcessingContext
+        from .validadores_provider import MODELOS
+
+        algoritmo = MODELOS[trabajo['modelo']]()
+        algoritmo.initAlgorithm()
+        parametros = dict(trabajo.get('parametros') or {})
+        parametros.update({'input_gpkg': trabajo['entrada'], 'output_gpkg': trabajo['salida']})
+        prefijo = os.path.splitext(os.path.basename(trabajo['entrada']))[0]
+        resultado = algoritmo.processAlgorithm(parametros, QgsProcessingContext(),
+                                               _feedback(prefijo, trabajo.get('silencioso')))
+        resumen['estado'] = 'ok' if resultado else 'cancelado'
+    except Exception as e:
+        resumen['estado'] = 'error'
+        resumen['error'] = str(e)
+    resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resumen
+
+
+def _modelos(args):
+    # Modelo de cada entrada, o (None, motivo) si no se pudo identificar
+    if args.modelo != AUTOMATICO:
+        return [(args.modelo, None)] * len(args.entradas)
+    modelos = []
+    for entrada in args.entradas:
+        try:
+            modelos.append((etl_modelos.modelo_de(entrada, cache=not args.sin_cache), None))
+        except (OSError, ValueError) as e:
+            modelos.append((None, str(e)))
+    return modelos
+
+
+def _salidas(args, parser, modelos):
+    if args.salida:
+        if len(args.salida) != len(args.entradas):
+            parser.error('Debe indicar una salida por cada archivo de entrada')
+        return args.salida
+    if not args.directorio_salida:
+        parser.error('Indique las salidas con -o o un directorio con -d')
+    salidas = []
+    for entrada, (modelo, _) in zip(args.entradas, modelos):
+        nombre = os.path.splitext(os.path.basename(entrada))[0]
+        salidas.append(os.path.join(args.directorio_salida, f'{nombre}_{modelo or args.modelo}.gpkg'))
+    if len(set(salidas)) != len(salidas):
+        parser.error('Hay archivos de entrada con el mismo nombre; use -o para indicar las salidas')
+    return salidas
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog='etl_cli',
+        description='Ejecuta los ETL de Validadores sobre uno o varios GeoPackages sin interfaz gráfica.'
+    )
+    parser.add_argument('modelo', choices=NOMBRES_MODELOS + [AUTOMATICO],
+                        help='interno (modelo interno 1.0), ladm_1_2 (LADM COL 1.2), ladm_1_0 (LADM COL 1.0) o auto '
+                             '(identificar el de cada entrada)')
+    parser.add_argument('entradas', nargs='+', metavar='ENTRADA', help='GeoPackages de entrada')
+    parser.add_argument('-o', '--salida', nargs='+', metavar='SALIDA',
+                        help='GeoPackages de salida, uno por cada entrada y en el mismo orden')
+    parser.add_argument('-d', '--directorio-salida', metavar='DIRECTORIO',
+                        help='Directorio donde escribir <entrada>_<modelo>.gpkg')
+    parser.add_argument('-j', '--trabajos', type=int, default=1,
+                        help='Número de GeoPackages que se procesan a la vez (un proceso por trabajo)')
+    parser.add_argument('--hilos', type=int, default=0,
+                        help='Hilos por trabajo (0 = todos los núcleos repartidos entre los trabajos)')
+    parser.add_argument('--motor', choices=sorted(MOTORES_CLI), default='directo', help='Motor de ejecución')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reutilizar intermedios de ejecuciones anteriores (guarda copias de los datos en la caché '
+                             'local del usuario)')
+    parser.add_argument('--sin-cache', action='store_true',
+                        help='No usar ninguna caché, tampoco la de detección del modelo')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Si la salida existe, reconstruir solo las capas cuyas fuentes cambiaron')
+    parser.add_argument('--reanudar', action='store_true',
+                        help='Continuar una ejecución interrumpida sin repetir los pasos terminados')
+    parser.add_argument('--cache-escritura', type=int, default=0, metavar='MB',
+                        help='Caché de páginas de SQLite del escritor de cada salida; con un valor, las tablas '
+                             'temporales del escritor van a disco (0 = 256 MB en memoria)')
+    parser.add_argument('--traza', action='store_true',
+                        help='Guardar <salida>_traza.json con la línea de tiempo de cada trabajo '
+                             '(chrome://tracing o Perfetto)')
+    parser.add_argument('--perfil', action='store_true',
+                        help='Perfilar cada trabajo por muestreo (<salida>_perfil.pstats y <salida>_perfil.folded)')
+    parser.add_argument('--resumen', metavar='ARCHIVO', default='-',
+                        help='Archivo JSON con el resumen de la ejecución ("-" para la salida estándar)')
+    parser.add_argument('--servidor', type=int, metavar='PUERTO',
+                        help='Enviar los trabajos a los trabajadores de etl_workers que escuchan en este puerto local')
+    parser.add_argument('--reciclar-trabajos', type=int, default=None, metavar='N',
+                        help='Trabajos que ejecuta cada proceso antes de reemplazarlo')
+    parser.add_argument('--memoria-max', type=float, metavar='MB',
+                        help='Memoria residente a partir de la cual se reemplaza un proceso')
+    parser.add_argument('-q', '--silencioso', action='store_true', help='Mostrar solo advertencias y errores')
+    return parser
+
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if args.trabajos < 1:
+        parser.error('El número de trabajos debe ser al menos 1')
+    modelos = _modelos(args)
+    salidas = _salidas(args, parser, modelos)
+
+    trabajos_paralelos = min(args.trabajos, len(args.entradas))
+    hilos = args.hilos or max(1, (os.cpu_count() or 1) // trabajos_paralelos)
+    parametros = {'hilos': hilos, 'motor': MOTORES_CLI[args.motor], 'usar_cache': args.cache and not args.sin_cache,
+                  'incremental': args.incremental, 'reanudar': args.reanudar, 'cache_escritura_mb': args.cache_escritura,
+                  'traza': args.traza, 'perfil': args.perfil}
+    trabajos = [{'modelo': modelo, 'entrada': os.path.abspath(entrada), 'salida': os.path.abspath(salida),
+                 'parametros': parametros, 'silencioso': args.silencioso}
+                for entrada, salida, (modelo, _) in zip(args.entradas, salidas, modelos) if modelo]
+
+    inicio = time.perf_counter()
+    if not trabajos:
+        resultados = []
+    elif args.servidor:
+        from .etl_workers import enviar_al_servidor
+        resultados = enviar_al_servidor(trabajos, args.servidor)
+    elif trabajos_paralelos == 1 and not (args.reciclar_trabajos or args.memoria_max):
+        resultados = [ejecutar_trabajo(trabajo) for trabajo in trabajos]
+    else:
+        from .etl_workers import MAX_TRABAJOS, PoolTrabajadores
+        with PoolTrabajadores(trabajos_paralelos, args.reciclar_trabajos or MAX_TRABAJOS, args.memoria_max) as pool:
+            resultados = pool.mapa(trabajos)
+    # Las entradas que no se pudieron identificar quedan como fallidas, en su lugar
+    ejecutados = iter(resultados)
+    resultados = [next(ejecutados) if modelo else
+                  {'modelo': None, 'entrada': os.path.abspath(entrada), 'salida': os.path.abspath(salida),
+                   'estado': 'error', 'error': motivo, 'segundos': 0.0}
+                  for entrada, salida, (modelo, motivo) in zip(args.entradas, salidas, modelos)]
+
+    fallidos = [r for r in resultados if r['estado'] != 'ok']
+    resumen = {
+        'modelo': args.modelo,
+        'trabajos': resultados,
+        'correctos': len(resultados) - len(fallidos),
+        'fallidos': len(fallidos),
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+    texto = json.dumps(resumen, ensure_ascii=False, indent=2)
+    if args.resumen == '-':
+        print(texto)
+    else:
+        with open(args.resumen, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto + '\n')
+    return 1 if fallidos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Decodificación en memoria de los dominios (tablas *tipo) de la entrada.
+
+Las tablas de dominio (col_unidadadministrativabasicatipo, lc_derechotipo,
+cr_construccionplantatipo...) tienen pocas filas y en el ETL solo sirven para
+traducir un código (T_Id) a su iliCode. Todas se leen una sola vez, con una
+conexión, y cada una queda como un mapa por arreglos: los códigos ordenados
+(la primera fila de cada T_Id, como el "primer coincidente" de
+native:joinattributestable) y los valores de cada columna en ese orden.
+
+Con ese mapa, una unión contra un dominio no necesita una tabla de búsqueda
+ni otra pasada por la capa: en la consulta que escribe la capa
+(gpkg_sql.plan_cadena) cada columna copiada es un CASE sobre el código.
+
+Este módulo no depende de QGIS.
+"""
+import threading
+from array import array
+
+from . import gpkg_sql
+from .etl_traza import tramo
+
+
+SUFIJO = 'tipo'
+CLAVE = 'T_Id'
+MAX_CODIGOS = 20        # el CASE compara código por código: con más, la unión con tabla de búsqueda es más rápida
+MAX_FILAS = 10000       # una tabla *tipo más grande no es un dominio: no se carga
+
+
+def literal(valor):
+    """Literal SQL de un valor de SQLite."""
+    if valor is None:
+        return 'NULL'
+    if isinstance(valor, bool):
+        return str(int(valor))
+    if isinstance(valor, (int, float)):
+        return repr(valor)
+    if isinstance(valor, bytes):
+        return f"X'{valor.hex()}'"
+    return "'" + str(valor).replace("'", "''") + "'"
+
+
+def caso_sql(clave, valores, otro='NULL'):
+    """CASE de SQL que traduce `clave` con el diccionario `valores` ({código: valor})."""
+    ramas = ' '.join(f'WHEN {literal(codigo)} THEN {literal(valor)}' for codigo, valor in valores.items())
+    return f'CASE {clave} {ramas} ELSE {otro} END'
+
+
+def caso_qgis(campo, valores, otro='NULL'):
+    """La misma traducción como expresión de QGIS (calculadora de campos)."""
+    ramas = ' '.join(f'WHEN "{campo}" = {literal(codigo)} THEN {literal(valor)}' for codigo, valor in valores.items())
+    return f'CASE {ramas} ELSE {otro} END'
+
+
+class Dominio:
+    def __init__(self, nombre, columnas, codigos, valores):
+        self.nombre = nombre
+        self.columnas = columnas    # [(nombre, tipo declarado)]
+        self.codigos = codigos      # array('q') ordenado, un T_Id por código
+        self.valores = valores      # una lista por columna, en el orden de `codigos`
+
+    def columna(self, nombre):
+        for i, (columna, _) in enumerate(self.columnas):
+            if columna == nombre:
+                return i
+        for i, (columna, _) in enumerate(self.columnas):
+            if columna.lower() == nombre.lower():
+                return i
+        return -1
+
+    def expresion(self, clave, columna):
+        """CASE de SQL que traduce la expresión `clave` a `columna`, o None si hay demasiados códigos."""
+        if len(self.codigos) > MAX_CODIGOS:
+            return None
+        if not len(self.codigos):
+            return 'NULL'
+        return '(' + caso_sql(clave, dict(zip(self.codigos, self.valores[self.columna(columna)]))) + ')'
+
+
+def _leer(conn, nombre):
+    # Dominio de la tabla `nombre`, o None si no tiene T_Id o es demasiado grande
+    geometria = None
+    if gpkg_sql.existe_tabla(conn, 'gpkg_geometry_columns'):
+        geometria = gpkg_sql.columna_geometria(conn, nombre)
+    columnas = [(columna, tipo) for columna, tipo, _ in gpkg_sql.columnas(conn, nombre)
+                if geometria is None or columna.lower() != geometria[0].lower()]
+    clave = next((i for i, (columna, _) in enumerate(columnas) if columna.lower() == CLAVE.lower()), None)
+    if clave is None:
+        return None
+    seleccion = ', '.join(gpkg_sql.identificador(columna) for columna, _ in columnas)
+    filas = conn.execute(f'SELECT {seleccion} FROM {gpkg_sql.identificador(nombre)} '
+                         f'ORDER BY rowid LIMIT {MAX_FILAS + 1}').fetchall()
+    if len(filas) > MAX_FILAS:
+        return None
+    primeras = {}
+    for fila in filas:
+        codigo = fila[clave]
+        if type(codigo) is float and codigo.is_integer():
+            codigo = int(codigo)
+        if type(codigo) is int and codigo not in primeras:
+            primeras[codigo] = fila
+    try:
+        codigos = array('q', sorted(primeras))
+    except OverflowError:
+        return None
+    valores = [[primeras[codigo][i] for codigo in codigos] for i in range(len(columnas))]
+    return Dominio(nombre, columnas, codigos, valores)
+
+
+class Dominios:
+    """Todas las tablas *tipo de `ruta`, leídas juntas la primera vez que se pide una."""
+
+    def __init__(self, ruta, traza=None):
+        self.ruta = ruta
+        self.traza = traza
+        self._tablas = None
+        self._lock = threading.Lock()
+
+    def dominio(self, nombre):
+        """Dominio de la tabla `nombre`, o None si no es un dominio de la entrada."""
+        with self._lock:
+            if self._tablas is None:
+                with tramo(self.traza, 'leer', 'leer', tabla='dominios'):
+                    self._tablas = self._cargar()
+            return self._tablas.get(nombre.lower())
+
+    def _cargar(self):
+        conn = gpkg_sql.conectar(self.ruta)
+        try:
+            nombres = [nombre for (nombre,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND lower(name) LIKE ?", (f'%{SUFIJO}',))]
+            tablas = {}
+            for nombre in nombres:
+                dominio = _leer(conn, nombre)
+                if dominio is not None:
+                    tablas[nombre.lower()] = dominio
+            return tablas
+        finally:
+            conn.close()
+
+    def liberar(self):
+        with self._lock:
+            self._tablas = None
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Escritura del GeoPackage de salida por una única conexión.
+
+Todas las capas de una ejecución se escriben por la misma conexión sqlite3,
+en modo WAL, con escritura síncrona desactivada y una caché de páginas grande:
+cada capa es una transacción con un INSERT ... SELECT (o inserciones por lotes
+de geometrías ya en binario) en lugar de abrir y cerrar el archivo por cada
+capa. Los índices RTree se construyen todos al final, con las tablas ya
+completas, y al cerrar se vuelve al diario por defecto para que el archivo
+quede autocontenido (sin -wal ni -shm).
+
+En discos de red donde WAL no está disponible se puede elegir otro modo de
+diario con la variable de entorno VALIDADORES_ETL_DIARIO (p. ej. TRUNCATE).
+Con `cache_kb` la caché de páginas toma ese tamaño y las tablas temporales
+de SQLite van a disco. Con traza, el tiempo que cada capa espera
+la conexión queda como un tramo "espera escritor".
+
+Este módulo no depende de QGIS.
+"""
+import os
+import threading
+
+from . import gpkg_sql
+from .etl_traza import tramo
+
+
+LOTE = 5000
+CACHE_KB = 256 * 1024
+
+
+def diario_por_defecto():
+    return os.environ.get('VALIDADORES_ETL_DIARIO', 'WAL')
+
+
+class EscritorGpkg:
+    def __init__(self, ruta, diario=None, cache_kb=None, traza=None):
+        self.ruta = ruta
+        self.capas = 0
+        self.traza = traza
+        self._lock = threading.Lock()
+        self._conn = gpkg_sql.conectar(ruta)
+        self._conn.execute(f'PRAGMA journal_mode = {diario or diario_por_defecto()}')
+        self._conn.execute('PRAGMA synchronous = OFF')
+        self._conn.execute(f'PRAGMA cache_size = -{CACHE_KB if cache_kb is None else cache_kb}')
+        self._conn.execute(f"PRAGMA temp_store = {'MEMORY' if cache_kb is None else 'FILE'}")
+        self._transaccion(gpkg_sql.crear_gpkg)
+
+    def _transaccion(self, funcion, *args, adjunta=None):
+        # `adjunta` se monta como esquema ent (ATTACH no se permite dentro de una transacción)
+        with tramo(self.traza, 'espera escritor', 'espera'):
+            self._lock.acquire()
+        try:
+            if self._conn is None:
+                raise RuntimeError(f'El GeoPackage {self.ruta} ya se cerró')
+            if adjunta is not None:
+                self._conn.execute('ATTACH DATABASE ? AS ent', (adjunta,))
+            try:
+                with tramo(self.traza, 'escribir', 'escribir', operacion=funcion.__name__):
+                    self._conn.execute('BEGIN IMMEDIATE')
+                    resultado = funcion(self._conn, *args)
+                    self._conn.execute('COMMIT')
+                return resultado
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                raise
+            finally:
+                if adjunta is not None:
+                    self._conn.execute('DETACH DATABASE ent')
+        finally:
+            self._lock.release()
+
+    def copiar(self, entrada, origen, destino, no_nula='T_Id'):
+        """Como gpkg_sql.copiar_tabla, pero por la conexión compartida y sin índice espacial."""
+        filas = self._transaccion(gpkg_sql.copiar_adjunta, origen, destino, no_nula, False, adjunta=entrada)
+        self.capas += 1
+        return filas
+
+    def crear_capa(self, destino, campos, tipo_geometria, srs, z=0, m=0):
+        """
+        Crea una capa vacía con fid, geom y los `campos` [(nombre, tipo)].
+        `srs` es el registro de gpkg_spatial_ref_sys del sistema de la capa.
+        """
+        def crear(conn):
+            gpkg_sql.eliminar_tabla(conn, destino)
+            conn.execute('INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)', srs)
+            definicion = ['"fid" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL',
+                          f'{gpkg_sql.identificador(gpkg_sql.COLUMNA_GEOMETRIA)} {tipo_geometria}']
+            definicion += [f'{gpkg_sql.identificador(nombre)} {tipo}'.rstrip() for nombre, tipo in campos]
+            conn.execute(f'CREATE TABLE {gpkg_sql.identificador(destino)} ({", ".join(definicion)})')
+            gpkg_sql.registrar_capa(conn, destino, tipo_geometria, srs[1], z, m, indice=False)
+
+        self._transaccion(crear)
+        self.capas += 1
+
+    def copiar_transformada(self, entrada, origen, destino, transformar, srs, no_nula='T_Id', lote=LOTE):
+        """
+        Copia una capa aplicando `transformar` (lista de BLOB -> lista de BLOB) a las
+        geometrías por lotes. Las geometrías se calculan fuera del bloqueo, así que
+        varias capas se transforman a la vez y solo la inserción de cada lote se turna.
+        Si algo falla a mitad de la capa, la capa se elimina de la salida.
+        """
+        conn = gpkg_sql.conectar(entrada)
+        try:
+            origen = gpkg_sql.nombre_real(conn, origen)
+            col_geom, tipo_geom, _, z, m = gpkg_sql.columna_geometria(conn, origen)
+            campos = [(nombre, tipo) for nombre, tipo, _ in gpkg_sql.columnas(conn, origen)
+                      if nombre.lower() not in (col_geom.lower(), 'fid')]
+            con_fid = any(nombre.lower() == 'fid' for nombre, _, _ in gpkg_sql.columnas(conn, origen))
+            if no_nula is None:
+                filtro = '1'
+            elif any(nombre.lower() == no_nula.lower() for nombre, _ in campos):
+                filtro = f'{gpkg_sql.identificador(no_nula)} IS NOT NULL'
+            else:
+                filtro = '0'
+            # fixgeometries devuelve siempre geometrías múltiples
+            if tipo_geom.upper() in ('POINT', 'LINESTRING', 'POLYGON'):
+                tipo_geom = 'MULTI' + tipo_geom.upper()
+            self.crear_capa(destino, campos, tipo_geom, srs, z, m)
+
+            columnas = (['fid'] if con_fid else []) + [gpkg_sql.COLUMNA_GEOMETRIA] + [c for c, _ in campos]
+            origen_cols = (['"fid"'] if con_fid else []) + [gpkg_sql.identificador(col_geom)]
+            origen_cols += [gpkg_sql.identificador(c) for c, _ in campos]
+            posicion = 1 if con_fid else 0
+            total = 0
+            try:
+                cursor = conn.execute(f'SELECT {", ".join(origen_cols)} FROM {gpkg_sql.identificador(origen)} '
+                                      f'WHERE {filtro} ORDER BY rowid')
+                while True:
+                    with tramo(self.traza, 'leer', 'leer', tabla=origen):
+                        filas = cursor.fetchmany(lote)
+                    if not filas:
+                        break
+                    geometrias = transformar([fila[posicion] for fila in filas])
+                    filas = [fila[:posicion] + (geometria,) + fila[posicion + 1:]
+                             for fila, geometria in zip(filas, geometrias)]
+                    total += self.insertar_filas(destino, columnas, filas, lote)
+            except BaseException:
+                # Cada lote es su propia transacción: no dejar en la salida una capa a medias
+                self._descartar(destino)
+                raise
+            return total
+        finally:
+            conn.close()
+
+    def _descartar(self, destino):
+        try:
+            self._transaccion(gpkg_sql.eliminar_tabla, destino)
+            self.capas -= 1
+        except Exception:
+            # Salida ya cerrada (cancelación): la capa queda incompleta y el diario la repite al reanudar
+            pass
+
+    def insertar_filas(self, destino, columnas, filas, lote=LOTE):
+        """Inserta `filas` (tuplas en el orden de `columnas`, geometrías en binario GPKG) por lotes."""
+        sentencia = (f'INSERT INTO {gpkg_sql.identificador(destino)} '
+                     f'({", ".join(gpkg_sql.identificador(c) for c in columnas)}) '
+                     f'VALUES ({", ".join("?" * len(columnas))})')
+
+        def insertar(conn):
+            total = 0
+            bloque = []
+            for fila in filas:
+                bloque.append(fila)
+                if len(bloque) >= lote:
+                    conn.executemany(sentencia, bloque)
+                    total += len(bloque)
+                    bloque = []
+            if bloque:
+                conn.executemany(sentencia, bloque)
+                total += len(bloque)
+            if gpkg_sql.existe_tabla(conn, 'gpkg_ogr_contents'):
+                conn.execute('UPDATE gpkg_ogr_contents SET feature_count = feature_count + ? '
+                             'WHERE lower(table_name) = lower(?)', (total, destino))
+            return total
+
+        return self._transaccion(insertar)
+
+    def ejecutar_sql(self, sql):
+        self._transaccion(gpkg_sql.ejecutar_script, sql)
+
+    def finalizar(self):
+        """Construye los índices espaciales pendientes y cierra el archivo."""
+        def indexar(conn):
+            for tabla, columna in gpkg_sql.capas_sin_indice(conn):
+                with tramo(self.traza, 'indice', 'indice', tabla=tabla):
+                    gpkg_sql.crear_indice_espacial(conn, tabla, columna)
+
+        self._transaccion(indexar)
+        self.cerrar()
+
+    def cerrar(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute('PRAGMA synchronous = NORMAL')
+                self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                self._conn.execute('PRAGMA journal_mode = DELETE')
+            finally:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Diario de una ejecución para poder reanudarla.
+
+Los intermedios de la ejecución se escriben en un directorio de trabajo junto
+a la salida (<salida>.gpkg-etl) en lugar del directorio temporal, y cada paso
+terminado se anota en la tabla etl_estado_ejecucion de ese directorio con la
+firma de lo que calculó, su resultado y la huella exacta del contenido
+(etl_huella) de cada tabla que escribió, en la salida o en un intermedio. Al
+reanudar, un paso anotado con la misma firma no se repite si sus archivos
+siguen existiendo y sus tablas tienen la misma huella: una reescritura
+posterior interrumpida o una edición a mano cambian el contenido, y entonces
+el paso se repite. Cuando un paso reescribe una tabla que ya escribió otro
+(por ejemplo, al modificar una capa de la salida), la huella nueva reemplaza
+también la anotada en el paso anterior. Si la ejecución termina bien, el
+directorio se borra.
+
+Este módulo no depende de QGIS.
+"""
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+
+from . import etl_huella, gpkg_sql
+
+
+TABLA = 'etl_estado_ejecucion'
+
+
+def directorio_trabajo(output_gpkg):
+    return f'{output_gpkg}-etl'
+
+
+def _archivos_existen(resultado):
+    for valor in resultado.values():
+        if isinstance(valor, str) and '.gpkg' in valor:
+            if not os.path.isfile(valor.split('|', 1)[0]):
+                return False
+    return True
+
+
+def _huella(ruta, tabla):
+    # Huella exacta de `tabla` en `ruta`, o None si el archivo o la tabla ya no existen
+    if not os.path.isfile(ruta):
+        return None
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        if not gpkg_sql.existe_tabla(conn, tabla):
+            return None
+        return etl_huella.huella_tabla(conn, tabla, exacta=True)['huella']
+    finally:
+        conn.close()
+
+
+def _tablas_intactas(tablas):
+    # Los diarios anteriores guardaban el número de filas: no coincide con ninguna huella
+    return all(_huella(ruta, tabla) == huella for ruta, tabla, huella in tablas)
+
+
+class EstadoEjecucion:
+    def __init__(self, directorio, reanudar=False):
+        self.directorio = directorio
+        if not reanudar:
+            shutil.rmtree(directorio, ignore_errors=True)
+        os.makedirs(directorio, exist_ok=True)
+        self._ruta = os.path.join(directorio, 'estado.sqlite')
+        self._lock = threading.Lock()
+        self.recuperados = set()
+        conn = gpkg_sql.conectar(self._ruta)
+        try:
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS {TABLA} (
+                paso TEXT PRIMARY KEY, firma TEXT NOT NULL, resultado TEXT NOT NULL, fecha TEXT NOT NULL,
+                tablas TEXT NOT NULL DEFAULT '[]')''')
+            if 'tablas' not in {nombre for nombre, _, _ in gpkg_sql.columnas(conn, TABLA)}:
+                # Diario de una versión anterior: sus pasos no tienen tablas que revisar
+                conn.execute(f"ALTER TABLE {TABLA} ADD COLUMN tablas TEXT NOT NULL DEFAULT '[]'")
+            self.anotados = conn.execute(f'SELECT count(*) FROM {TABLA}').fetchone()[0]
+        finally:
+            conn.close()
+
+    def completado(self, paso, firma):
+        """Resultado anotado del paso si se completó con la misma firma, si no None."""
+        with self._lock:
+            conn = gpkg_sql.conectar(self._ruta)
+            try:
+                fila = conn.execute(f'SELECT firma, resultado, tablas FROM {TABLA} WHERE paso = ?',
+                                    (paso,)).fetchone()
+            finally:
+                conn.close()
+        if fila is None or fila[0] != firma:
+            return None
+        resultado = json.loads(fila[1])
+        if not _archivos_existen(resultado) or not _tablas_intactas(json.loads(fila[2])):
+            return None
+        return resultado
+
+    def registrar(self, paso, firma, resultado, tablas=()):
+        """Anota el paso terminado; `tablas`: (ruta, tabla) que escribió, para revisarlas al reanudar."""
+        fecha = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        texto = json.dumps(resultado or {}, ensure_ascii=False, default=str)
+        huellas = {(ruta, tabla): _huella(ruta, tabla) for ruta, tabla in tablas}
+        with self._lock:
+            conn = gpkg_sql.conectar(self._ruta)
+            try:
+                conn.execute('BEGIN')
+                # Los pasos anteriores que escribieron las mismas tablas las esperan como quedan ahora
+                for otro, anotadas in conn.execute(f'SELECT paso, tablas FROM {TABLA} WHERE paso <> ?',
+                                                   (paso,)).fetchall():
+                    anotadas = json.loads(anotadas)
+                    nuevas = [[ruta, tabla, huellas.get((ruta, tabla), huella)] for ruta, tabla, huella in anotadas]
+                    if nuevas != anotadas:
+                        conn.execute(f'UPDATE {TABLA} SET tablas = ? WHERE paso = ?',
+                                     (json.dumps(nuevas, ensure_ascii=False), otro))
+                conn.execute(f'INSERT OR REPLACE INTO {TABLA} VALUES (?, ?, ?, ?, ?)',
+                             (paso, firma, texto, fecha,
+                              json.dumps([[ruta, tabla, huella] for (ruta, tabla), huella in huellas.items()],
+                                         ensure_ascii=False)))
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+
+    def envolver(self, paso, firma, funcion, escritas):
+        """
+        Función de paso para etl_grafo que recupera el resultado anotado o lo
+        calcula y lo anota. `firma()` da la firma del paso (se calcula al
+        ejecutarlo) y `escritas(resultado)` las (ruta, tabla) que escribió.
+        """
+        def ejecutar(entradas):
+            clave = firma()
+            # Solo se recupera si todo lo anterior también se recuperó
+            if all(dep in self.recuperados for dep in entradas):
+                resultado = self.completado(paso, clave)
+                if resultado is not None:
+                    with self._lock:
+                        self.recuperados.add(paso)
+                    return resultado
+            resultado = funcion(entradas)
+            self.registrar(paso, clave, resultado, escritas(resultado))
+            return resultado
+        return ejecutar
+
+    def terminar(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
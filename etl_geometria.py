@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Corrección de geometrías y reproyección durante la escritura de una capa.
+
+Aplica a cada geometría lo mismo que native:fixgeometries seguido de
+native:reprojectlayer, pero sobre los BLOB GeoPackage que se copian a la
+salida, así que la capa se escribe una sola vez y ya corregida. El resultado
+de la corrección se conserva si es del mismo tipo que el original (punto,
+línea o polígono); de una colección se toman solo las partes de ese tipo, y
+si no queda ninguna la geometría se descarta, como en fixgeometries.
+
+La validez se revisa por lotes y solo se corrigen las geometrías inválidas;
+las válidas pasan sin cambios. Con shapely 2 la revisión y la corrección son
+llamadas vectorizadas a GEOS sobre el lote completo; sin shapely se usa GEOS
+a través de QGIS geometría por geometría.
+
+La reproyección también es por lotes: con pyproj las coordenadas del lote se
+leen del WKB a arreglos de NumPy, se transforman en una sola llamada con un
+transformador que se reutiliza entre capas y se escriben de nuevo en el WKB.
+Las capas que ya están en el sistema de destino no se transforman.
+
+QGIS solo hace falta para leer los sistemas de la capa (ajuste_capa) y cuando
+falta shapely o pyproj.
+"""
+import functools
+import struct
+
+from . import gpkg_sql
+from .etl_traza import tramo
+
+try:
+    from qgis.core import (QgsCoordinateReferenceSystem, QgsCoordinateTransform, QgsCoordinateTransformContext,
+                           QgsGeometry, QgsWkbTypes)
+except ImportError:
+    # Sin QGIS solo sirven shapely y pyproj, con sistemas que respondan authid() y toWkt()
+    QgsCoordinateReferenceSystem = QgsCoordinateTransform = QgsCoordinateTransformContext = None
+    QgsGeometry = QgsWkbTypes = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+try:
+    import pyproj
+except ImportError:
+    pyproj = None
+
+
+def crs_de_srs(fila):
+    # Sistema de QGIS a partir de un registro de gpkg_spatial_ref_sys
+    _, srs_id, organizacion, codigo, definicion, _ = fila
+    if organizacion and organizacion.upper() == 'EPSG':
+        return QgsCoordinateReferenceSystem(f'EPSG:{codigo}')
+    return QgsCoordinateReferenceSystem.fromWkt(definicion)
+
+
+def srs_de_crs(crs):
+    # Registro de gpkg_spatial_ref_sys para un sistema de QGIS
+    organizacion, _, codigo = crs.authid().partition(':')
+    codigo = int(codigo) if codigo.isdigit() else crs.postgisSrid()
+    return (crs.description(), codigo, organizacion or 'NONE', codigo, crs.toWkt(), crs.description())
+
+
+def _definicion(crs):
+    # Identificador para pyproj: el código de la autoridad o, si no tiene, el WKT
+    return crs.authid() or crs.toWkt()
+
+
+def mismo_crs(crs_origen, crs_destino):
+    return crs_origen == crs_destino or (bool(crs_origen.authid()) and crs_origen.authid() == crs_destino.authid())
+
+
+@functools.lru_cache(maxsize=None)
+def transformador(origen, destino):
+    # pyproj.Transformer es seguro entre hilos; uno por par de sistemas para toda la sesión
+    return pyproj.Transformer.from_crs(origen, destino, always_xy=True)
+
+
+def a_multiple(wkb):
+    # Envuelve un punto, línea o polígono WKB en su tipo múltiple con una sola parte
+    orden = '<' if wkb[0] == 1 else '>'
+    tipo = struct.unpack_from(orden + 'I', wkb, 1)[0]
+    if (tipo & 0x0FFFFFFF) % 1000 not in (1, 2, 3):
+        return wkb
+    return wkb[:1] + struct.pack(orden + 'II', tipo + 3, 1) + wkb
+
+
+def _partes_de_dimension(geometria, dimension):
+    # Resultado de shapely.make_valid con solo las partes de la dimensión original
+    if geometria is None or shapely.is_empty(geometria):
+        return None
+    if shapely.get_type_id(geometria) != 7:
+        return geometria if shapely.get_dimensions(geometria) == dimension else None
+    partes = shapely.get_parts(shapely.get_parts(geometria))
+    partes = partes[shapely.get_dimensions(partes) == dimension]
+    if not len(partes):
+        return None
+    return (shapely.multipoints, shapely.multilinestrings, shapely.multipolygons)[dimension](partes)
+
+
+class AjusteGeometrias:
+    def __init__(self, crs_origen, crs_destino, srs_id, contexto=None, traza=None):
+        self.srs_id = srs_id
+        self.traza = traza
+        self.invalidas = 0
+        self.corregidas = 0
+        self.descartadas = 0
+        self.transformador = None       # pyproj, por lotes
+        self.transformacion = None      # QGIS, geometría por geometría
+        if mismo_crs(crs_origen, crs_destino):
+            return
+        if pyproj is not None and numpy is not None:
+            self.transformador = transformador(_definicion(crs_origen), _definicion(crs_destino))
+        else:
+            self.transformacion = QgsCoordinateTransform(crs_origen, crs_destino,
+                                                         contexto or QgsCoordinateTransformContext())
+
+    def resumen(self):
+        return {'invalidas': self.invalidas, 'corregidas': self.corregidas, 'descartadas': self.descartadas}
+
+    def __call__(self, blobs):
+        originales = [gpkg_sql.wkb(blob) for blob in blobs]
+        corregir = self._corregir_shapely if shapely is not None else self._corregir_qgis
+        with tramo(self.traza, 'corregir', 'corregir', geometrias=len(blobs)):
+            corregidas = corregir(originales)
+        posiciones = [i for i, wkb in enumerate(corregidas) if wkb is not None]
+        with tramo(self.traza, 'reproyectar', 'reproyectar', geometrias=len(posiciones)):
+            reproyectadas = self._reproyectar([corregidas[i] for i in posiciones])
+        # Geometría nula o vacía: se copia tal cual; descartada en la corrección: nula
+        salida = [blob if original is None else None for blob, original in zip(blobs, originales)]
+        for i, wkb in zip(posiciones, reproyectadas):
+            salida[i] = gpkg_sql.blob_gpkg(wkb, self.srs_id)
+        return salida
+
+    def _corregir_shapely(self, wkbs):
+        posiciones = [i for i, wkb in enumerate(wkbs) if wkb is not None]
+        if not posiciones:
+            return wkbs
+        geometrias = shapely.from_wkb([wkbs[i] for i in posiciones])
+        invalidas = numpy.flatnonzero(~shapely.is_valid(geometrias))
+        self.invalidas += len(invalidas)
+        if not len(invalidas):
+            return wkbs
+        dimensiones = shapely.get_dimensions(geometrias[invalidas])
+        corregidas = shapely.make_valid(geometrias[invalidas])
+        resultado = list(wkbs)
+        for j, geometria, dimension in zip(invalidas, corregidas, dimensiones):
+            geometria = _partes_de_dimension(geometria, dimension)
+            if geometria is None:
+                self.descartadas += 1
+                resultado[posiciones[j]] = None
+            else:
+                self.corregidas += 1
+                resultado[posiciones[j]] = shapely.to_wkb(geometria)
+        return resultado
+
+    def _corregir_qgis(self, wkbs):
+        resultado = []
+        for wkb in wkbs:
+            if wkb is None:
+                resultado.append(None)
+                continue
+            geometria = QgsGeometry()
+            geometria.fromWkb(wkb)
+            if geometria.isGeosValid():
+                resultado.append(wkb)
+                continue
+            self.invalidas += 1
+            tipo = geometria.type()
+            corregida = geometria.makeValid()
+            if not corregida.isNull() and corregida.type() != tipo:
+                partes = []
+                if QgsWkbTypes.flatType(corregida.wkbType()) == QgsWkbTypes.GeometryCollection:
+                    partes = [parte for parte in corregida.asGeometryCollection() if parte.type() == tipo]
+                corregida = QgsGeometry.collectGeometry(partes) if partes else QgsGeometry()
+            if corregida.isNull():
+                self.descartadas += 1
+                resultado.append(None)
+            else:
+                self.corregidas += 1
+                resultado.append(bytes(corregida.asWkb()))
+        return resultado
+
+    def _reproyectar(self, wkbs):
+        wkbs = [a_multiple(wkb) for wkb in wkbs]
+        if self.transformador is not None:
+            return self._reproyectar_pyproj(wkbs)
+        if self.transformacion is not None:
+            resultado = []
+            for wkb in wkbs:
+                geometria = QgsGeometry()
+                geometria.fromWkb(wkb)
+                geometria.transform(self.transformacion)
+                resultado.append(bytes(geometria.asWkb()))
+            return resultado
+        return wkbs
+
+    def _reproyectar_pyproj(self, wkbs):
+        # Vistas de NumPy sobre las coordenadas de cada WKB: se transforman juntas y se
+        # escriben en el mismo lugar, sin reconstruir la estructura de la geometría
+        buffers = [bytearray(wkb) for wkb in wkbs]
+        vistas = []
+        for buffer in buffers:
+            for orden, pos, n, dims in gpkg_sql.secuencias_wkb(buffer):
+                if n:
+                    vistas.append(numpy.frombuffer(buffer, dtype=orden + 'f8', count=n * dims,
+                                                   offset=pos).reshape(n, dims))
+        if vistas:
+            x, y = self.transformador.transform(numpy.concatenate([vista[:, 0] for vista in vistas]),
+                                                numpy.concatenate([vista[:, 1] for vista in vistas]),
+                                                errcheck=True)
+            inicio = 0
+            for vista in vistas:
+                fin = inicio + len(vista)
+                vista[:, 0] = x[inicio:fin]
+                vista[:, 1] = y[inicio:fin]
+                inicio = fin
+        return [bytes(buffer) for buffer in buffers]
+
+
+def ajuste_capa(ruta, tabla, crs, contexto=None, traza=None):
+    """(función de ajuste, registro SRS de destino) para copiar `tabla` de `ruta` en `crs`."""
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        srs_id = gpkg_sql.columna_geometria(conn, gpkg_sql.nombre_real(conn, tabla))[2]
+        origen = crs_de_srs(gpkg_sql.fila_srs(conn, srs_id))
+    finally:
+        conn.close()
+    destino = QgsCoordinateReferenceSystem(crs)
+    srs = srs_de_crs(destino)
+    return AjusteGeometrias(origen, destino, srs[1], contexto, traza), srs
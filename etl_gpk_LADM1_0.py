@@ -1,610 +1,125 @@
-# -*- coding: utf-8 -*-
-from qgis.core import QgsProcessing,QgsCoordinateReferenceSystem, QgsProcessingAlgorithm, QgsProcessingMultiStepFeedback, QgsProcessingParameterFile, QgsProcessingParameterFileDestination
-import processing
-import os
-
-class ValidadoresLADM10(QgsProcessingAlgorithm):
-    def name(self):
-        return 'etl_modelo_ladm_1_0'
-
-    def displayName(self):
-        return 'ETL MODELO LADM COL 1.0'
-
-    def group(self):
-        return 'Validadores ETL'
-
-    def groupId(self):
-        return 'validadores_etl'
-
-    def createInstance(self):
-        return ValidadoresLADM10()
-
-    def initAlgorithm(self, config=None):
-        self.addParameter(
-            QgsProcessingParameterFile(
-                'input_gpkg',
-                'Seleccione el archivo GeoPackage de entrada',
-                extension='gpkg'
-            )
-        )
-        self.addParameter(
-            QgsProcessingParameterFileDestination(
-                'output_gpkg',
-                'Archivo GeoPackage de salida',
-                'GeoPackage files (*.gpkg)'
-            )
-        )
-
-    def processAlgorithm(self, parameters, context, feedback):
-        input_gpkg = parameters['input_gpkg']
-        output_gpkg = parameters['output_gpkg']
-        
-        feedback = QgsProcessingMultiStepFeedback(3, feedback)
-        results = {}
-        outputs = {}
-        
-        # Define CRS 9377
-        crs = QgsCoordinateReferenceSystem('EPSG:9377')
-        # Verificación de rutas
-        feedback.pushInfo(f"Archivo de entrada: {input_gpkg}")
-        feedback.pushInfo(f"Archivo de salida: {output_gpkg}")
-
-        # Crear el directorio de salida si no existe
-        directory = os.path.dirname(output_gpkg)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-
-        # Mapeo de capas según el ejemplo proporcionado
-        layer_mapping = {
-            'seleccionecoleubaunit': 'col_uebaunit',
-            'seleccioneconstruccion': 'lc_construccion',
-            'seleccioneconstruccion (2)': 'lc_unidadconstruccion',
-            'seleccioneconstruccion (2) (3)': 'extdireccion',
-            'seleccionetablapredio': 'lc_predio',
-            'seleccionetablapredio (2)': 'lc_derecho',
-            'seleccionetablapredio (2) (2)': 'lc_derechotipo',
-            'seleccionetablapredio (2) (2) (2)': 'col_unidadadministrativabasicatipo',
-            'seleccioneterreno': 'lc_terreno',
-            'seleccioneterreno (2)': 'cc_barrio',
-            'seleccioneterreno (2) (2)': 'cc_localidadcomuna',
-            'seleccioneterreno (2) (2) (2)': 'cc_sectorurbano',
-            'seleccioneterreno (2) (2) (2) (2)': 'cc_sectorrural',
-            'seleccioneterreno (2) (2) (2) (2) (2)': 'cc_centropoblado',
-            'seleccioneterreno (2) (2) (2) (3)': 'cc_corregimiento',
-            'seleccioneterreno (2) (2) (3)': 'cc_manzana',
-            'seleccioneterreno (2) (3)': 'cc_vereda',
-            'seleccioneterreno (2) (3) (2)': 'cc_limitemunicipio',
-            'seleccioneterreno (2) (4)': 'cc_perimetrourbano'
-        }
-
-        def layer_path(layer_name):
-            return f"{input_gpkg}|layername={layer_name}"
-
-        # Modified to include CRS in output for geometric layers
-        def create_output_path(table_name, geom=True):
-            if geom:
-                return f'ogr:dbname=\'{output_gpkg}\' table="{table_name}" (geom) sql='
-            return f'ogr:dbname=\'{output_gpkg}\' table="{table_name}"'
-        
-        # Unir atributos por valor de campo - Construccion
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 't_id',
-            'FIELDS_TO_COPY': [
-                'baunit',
-                'numero_sotanos',
-                'numero_mezanines',
-                'avaluo_construccion',
-                'numero_semisotanos',
-                'numero_pisos', 
-                'area_construccion'
-            ],
-            'FIELD_2': 'ue_lc_construccion',
-            'INPUT': layer_path(layer_mapping['seleccioneconstruccion']),
-            'INPUT_2': layer_path(layer_mapping['seleccionecoleubaunit']),
-            'METHOD': 1,
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }
-
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable para construccion.")
-            return {}
-
-        outputs['UnirAtributosPorValorDeCampo'] = result
-
-        feedback.setCurrentStep(1)
-        if feedback.isCanceled():
-            return {}
-        
-        
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno (2) (4)']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Perimetro_Urbano" (geom)',
-            'TARGET_CRS': crs
-
-        }
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(2)
-        if feedback.isCanceled():
-            return {}
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno (2) (2)']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Localidad_Comuna" (geom)',
-            'TARGET_CRS': crs
-        }
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(3)
-        if feedback.isCanceled():
-            return {}
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno (2) (2) (2) (2) (2)']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Centro_Poblado" (geom)',
-            'TARGET_CRS': crs
-        }
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(4)
-        if feedback.isCanceled():
-            return {}
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno (2) (2) (2) (3)']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Corregimiento" (geom)',
-            'TARGET_CRS': crs
-        }
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(5)
-        if feedback.isCanceled():
-            return {}
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno (2) (2) (2)']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Sector_Urbano" (geom)',
-            'TARGET_CRS': crs
-        }
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(6)
-        if feedback.isCanceled():
-            return {}
-
-        # Unir atributos por valor de campo
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 't_id',
-            'FIELDS_TO_COPY': ['baunit'],
-            'FIELD_2': 'ue_lc_unidadconstruccion',
-            'INPUT': layer_path(layer_mapping['seleccioneconstruccion (2)']),
-            'INPUT_2': layer_path(layer_mapping['seleccionecoleubaunit']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }
-        outputs['UnirAtributosPorValorDeCampo'] = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(7)
-        if feedback.isCanceled():
-            return {}
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno (2) (3) (2)']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Limite_Municipio" (geom)',
-            'TARGET_CRS': crs
-        }
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(8)
-        if feedback.isCanceled():
-            return {}
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno (2) (2) (2) (2)']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Sector_Rural" (geom)',
-            'TARGET_CRS': crs
-        }
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(9)
-        if feedback.isCanceled():
-            return {}
-
-        # Crear índice espacial
-        alg_params = {
-            'INPUT': layer_path(layer_mapping['seleccioneterreno'])
-        }
-        outputs['CrearNdiceEspacial'] = processing.run('native:createspatialindex', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(10)
-        if feedback.isCanceled():
-            return {}
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno (2) (2) (3)']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Manzana" (geom)',
-            'TARGET_CRS': crs
-        }
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(11)
-        if feedback.isCanceled():
-            return {}
-
-        # Unir atributos por valor de campo
-        # Segunda unión para construccion con predio
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'baunit',
-            'FIELDS_TO_COPY': ['numero_predial'],
-            'FIELD_2': 't_id',
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layer_mapping['seleccionetablapredio']),
-            'METHOD': 1,
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="LC_Construccion" (geom)',
-            'PREFIX': '',
-            'TARGET_CRS': crs
-        }
-
-        outputs['UnirAtributosPorValorDeCampo'] = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        feedback.setCurrentStep(12)
-        if feedback.isCanceled():
-            return {}
-
-        # Segunda unión para UnidadConstruccion con predio
-        # Primera unión para UnidadConstruccion
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 't_id',
-            'FIELDS_TO_COPY': [
-                'baunit',
-                'avaluo_unidad_construccion',
-                'area_privada_construida',
-                'total_pisos',
-                'planta_ubicacion',
-                'total_locales',
-                'total_banios',
-                'tipo_planta',
-                'lc_construccion',
-                'uso',
-                'area_construida',
-                'total_habitaciones',
-                'tipo_unidad_construccion'
-            ],
-            'FIELD_2': 'ue_lc_unidadconstruccion',
-            'INPUT': layer_path(layer_mapping['seleccioneconstruccion (2)']),
-            'INPUT_2': layer_path(layer_mapping['seleccionecoleubaunit']),
-            'METHOD': 1,
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }
-
-        unidad_result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        if unidad_result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable para unidad construccion.")
-            return {}
-
-        # Segunda unión para UnidadConstruccion con predio
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'baunit',
-            'FIELDS_TO_COPY': ['numero_predial'],
-            'FIELD_2': 't_id',
-            'INPUT': unidad_result['OUTPUT'],  # Ahora usa el resultado correcto
-            'INPUT_2': layer_path(layer_mapping['seleccionetablapredio']),
-            'METHOD': 1,
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="LC_UnidadDeConstruccion" (geom)',
-            'PREFIX': '',
-            'TARGET_CRS': crs
-        }
-
-        outputs['UnirAtributosPorValorDeCampo_unidad'] = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        feedback.setCurrentStep(13)
-        if feedback.isCanceled():
-            return {}
-
-        # Unir atributos por valor de campo_dir
-        # Unir atributos por valor de campo_dir
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 't_id',
-            'FIELDS_TO_COPY': [
-                'baunit',
-                'total_habitaciones',
-                'uso',
-                'total_locales',
-                'avaluo_unidad_construccion',
-                'tipo_unidad_construccion',
-                'total_banios',
-                'planta_ubicacion',
-                'lc_construccion',
-                'total_pisos',
-                'area_privada_construida',
-                'area_construida',
-                'tipo_planta'
-            ],
-            'FIELD_2': 'ue_lc_unidadconstruccion',
-            'INPUT': layer_path(layer_mapping['seleccioneconstruccion (2)']),
-            'INPUT_2': layer_path(layer_mapping['seleccionecoleubaunit']),
-            'METHOD': 1,
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }
-
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable para unidad construccion.")
-            return {}
-
-        outputs['UnirAtributosPorValorDeCampo'] = result
-        feedback.setCurrentStep(14)
-        if feedback.isCanceled():
-            return {}
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno (2) (3)']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Vereda" (geom)',
-            'TARGET_CRS': crs
-            
-        }
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(15)
-        if feedback.isCanceled():
-            return {}
-
-        # Unir atributos por valor de campo
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 't_id',
-            'FIELDS_TO_COPY': ['baunit'],
-            'FIELD_2': 'ue_lc_terreno',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno']),
-            'INPUT_2': layer_path(layer_mapping['seleccionecoleubaunit']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-            
-        }
-        outputs['UnirAtributosPorValorDeCampo'] = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(16)
-        if feedback.isCanceled():
-            return {}
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layer_mapping['seleccioneterreno (2)']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Barrio" (geom)',
-            'TARGET_CRS': crs
-        }
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(17)
-        if feedback.isCanceled():
-            return {}
-
-        # Unir atributos por valor de campo_dir
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'lc_predio_direccion',
-            'FIELDS_TO_COPY': [''],
-            'FIELD_2': 'T_id',
-            'INPUT': layer_path(layer_mapping['seleccioneconstruccion (2) (3)']),
-            'INPUT_2': layer_path(layer_mapping['seleccionetablapredio']),
-            'METHOD': 1,
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }
-        
-        outputs['UnirAtributosPorValorDeCampo_dir'] = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(14)
-        if feedback.isCanceled():
-            return {}
-
-        # Extraer por expresión para dirección
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': outputs['UnirAtributosPorValorDeCampo_dir']['OUTPUT'],
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="Direccion" (geom)',
-            'TARGET_CRS': crs
-        }
-        
-        outputs['ExtraerPorExpresin'] = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        feedback.setCurrentStep(18)
-        if feedback.isCanceled():
-            return {}
-
-        # Unir atributos por valor de campo_terreno
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'baunit',
-            'FIELDS_TO_COPY': [''],
-            'FIELD_2': 't_id',
-            'INPUT': outputs['UnirAtributosPorValorDeCampo']['OUTPUT'],
-            'INPUT_2': layer_path(layer_mapping['seleccionetablapredio']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="LC_Terreno" (geom)',
-            'PREFIX': '',
-            'TARGET_CRS': crs
-        }
-        outputs['UnirAtributosPorValorDeCampo_terreno'] = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(19)
-        if feedback.isCanceled():
-            return {}
-
-        # Unir atributos por valor de campo_derecho
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'baunit',
-            'FIELDS_TO_COPY': ['tipo'],
-            'FIELD_2': 'unidad',
-            'INPUT': outputs['UnirAtributosPorValorDeCampo_terreno']['OUTPUT'],
-            'INPUT_2': layer_path(layer_mapping['seleccionetablapredio (2)']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'OUTPUT': 'memory:derecho_temp',
-            'PREFIX': '',
-            
-        }
-        outputs['temp_derecho'] = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(20)
-        if feedback.isCanceled():
-            return {}
-        
-        # Crear expresión para ajustar tipo_2 para LC_Derecho
-        alg_params = {
-            'FIELD_LENGTH': 0,
-            'FIELD_NAME': 'tipo',
-            'FIELD_PRECISION': 0,
-            'FIELD_TYPE': 1,  # Integer
-            'FORMULA': 'tipo',
-            'INPUT': outputs['temp_derecho']['OUTPUT'],
-            'OUTPUT': 'memory:derecho_ajustado'
-        }
-        outputs['derecho_ajustado'] = processing.run('native:fieldcalculator', alg_params, context=context, feedback=feedback)
-        
-
-        # Unir atributos por valor de campo_derecho_tipo
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'tipo',
-            'FIELDS_TO_COPY': ['iliCode'],
-            'FIELD_2': 'T_id',
-            'INPUT': outputs['UnirAtributosPorValorDeCampo_terreno']['OUTPUT'],
-            'INPUT_2': layer_path(layer_mapping['seleccionetablapredio (2) (2) (2)']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="LC_Tipo_predio" (geom)\n',
-            'PREFIX': '',
-            'TARGET_CRS': crs
-        }
-        outputs['UnirAtributosPorValorDeCampo_derecho_tipo'] = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-
-        feedback.setCurrentStep(21)
-        if feedback.isCanceled():
-            return {}
-
-        # Unir atributos por valor de campo_derecho_tipo
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'tipo',
-            'FIELDS_TO_COPY': ['iliCode'],
-            'FIELD_2': 'T_id',
-            'INPUT': outputs['derecho_ajustado']['OUTPUT'],
-            'INPUT_2': layer_path(layer_mapping['seleccionetablapredio (2) (2)']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="LC_Derecho" (geom)',
-            'PREFIX': '',
-            'TARGET_CRS': crs
-        }
-        outputs['UnirAtributosPorValorDeCampo_derecho_tipo'] = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        feedback.setCurrentStep(22)
-        if feedback.isCanceled():
-            return {}
-        
-        # Consulta SQL para actualizar la columna ilicode
-        alg_params = {
-            'DATABASE': output_gpkg,
-            'SQL': '''
-            UPDATE LC_Derecho
-            SET ilicode = 
-                CASE 
-                    WHEN tipo_2 = 1 THEN 'Dominio'
-                    WHEN tipo_2 = 2 THEN 'Ocupación'
-                    WHEN tipo_2 = 3 THEN 'Posesión'
-                END
-            WHERE tipo_2 IN (1, 2, 3);
-            '''
-        }
-        processing.run("native:spatialiteexecutesql", alg_params, context=context, feedback=feedback)
-        
-        # Después del último SQL y antes del return results, añadir:
-
-        # Lista de capas a procesar
-        layers_to_fix = [
-            'CC_Manzana', 'CC_Vereda', 'CC_Barrio', 'CC_Centro_Poblado', 'CC_Corregimiento',
-            'CC_Limite_Municipio', 'CC_Localidad_Comuna', 'CC_Perimetro_Urbano', 'CC_Sector_Rural',
-            'CC_Sector_Urbano', 'Direccion', 'LC_Construccion', 'LC_Derecho', 'LC_Terreno',
-            'LC_Tipo_predio', 'LC_UnidadDeConstruccion'
-        ]
-
-        for layer_name in layers_to_fix:
-            input_layer = f"{output_gpkg}|layername={layer_name}"
-            
-            # Corregir geometrías
-            alg_params = {
-                'INPUT': input_layer,
-                'OUTPUT': 'memory:'
-            }
-            fixed_geom = processing.run('native:fixgeometries', alg_params, context=context, feedback=feedback)
-            
-            # Reproyectar a EPSG:9377
-            alg_params = {
-                'INPUT': fixed_geom['OUTPUT'],
-                'TARGET_CRS': QgsCoordinateReferenceSystem('EPSG:9377'),
-                'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="{layer_name}" (geom)'
-            }
-            processing.run('native:reprojectlayer', alg_params, context=context, feedback=feedback)
-            
-            feedback.pushInfo(f'Capa {layer_name} procesada: geometrías corregidas y reproyectada a EPSG:9377')
-
-        # Consulta SQL para actualizar SRC
-        alg_params = {
-            'DATABASE': output_gpkg,
-            'SQL': '''
-            UPDATE gpkg_geometry_columns 
-            SET srs_id = 9377 
-            WHERE table_name LIKE 'CC_%' 
-            OR table_name LIKE 'LC_%' 
-            OR table_name = 'Direccion';
-            '''
-        }
-        processing.run("native:spatialiteexecutesql", alg_params, context=context, feedback=feedback)
-        
-        return results
-    
-    def name(self):
-        return 'etl_modelo_ladm_1_0'
-
-    def displayName(self):
-        return 'ETL MODELO LADM COL 1.0'
-
-    def group(self):
-        return 'Validadores ETL'
-
-    def groupId(self):
-        return 'validadores_etl'
-
-    def createInstance(self):
-        return ValidadoresLADM10()
-
+# -*- coding: utf-8 -*-
+from .etl_base import AlgoritmoETL
+from .etl_dominios import caso_qgis, caso_sql
+from .etl_modelos import capas
+
+
+CRS = 'EPSG:9377'
+
+# Capas del GeoPackage de entrada: perfil 'ladm_1_0' de perfiles_modelos.json
+layer_mapping = capas('ladm_1_0')
+
+# iliCode de LC_Derecho según tipo_2 (los demás valores conservan el del dominio)
+TIPOS_DERECHO = {1: 'Dominio', 2: 'Ocupación', 3: 'Posesión'}
+
+# Capas de límites que se copian filtrando los registros sin T_Id: (capa, tabla de salida)
+EXTRACCIONES = [
+    ('seleccioneterreno (2) (4)', 'CC_Perimetro_Urbano'),
+    ('seleccioneterreno (2) (2)', 'CC_Localidad_Comuna'),
+    ('seleccioneterreno (2) (2) (2) (2) (2)', 'CC_Centro_Poblado'),
+    ('seleccioneterreno (2) (2) (2) (3)', 'CC_Corregimiento'),
+    ('seleccioneterreno (2) (2) (2)', 'CC_Sector_Urbano'),
+    ('seleccioneterreno (2) (3) (2)', 'CC_Limite_Municipio'),
+    ('seleccioneterreno (2) (2) (2) (2)', 'CC_Sector_Rural'),
+    ('seleccioneterreno (2) (2) (3)', 'CC_Manzana'),
+    ('seleccioneterreno (2) (3)', 'CC_Vereda'),
+    ('seleccioneterreno (2)', 'CC_Barrio'),
+]
+
+# Capas de salida a las que se les corrigen geometrías y se reproyectan al final
+layers_to_fix = [
+    'CC_Manzana', 'CC_Vereda', 'CC_Barrio', 'CC_Centro_Poblado', 'CC_Corregimiento',
+    'CC_Limite_Municipio', 'CC_Localidad_Comuna', 'CC_Perimetro_Urbano', 'CC_Sector_Rural',
+    'CC_Sector_Urbano', 'Direccion', 'LC_Construccion', 'LC_Derecho', 'LC_Terreno',
+    'LC_Tipo_predio', 'LC_UnidadDeConstruccion'
+]
+
+PASOS = [
+    # Crear índice espacial (modifica la entrada: se hace antes de leerla)
+    {'nombre': 'indice_terreno', 'tipo': 'indice', 'entrada': 'seleccioneterreno', 'modifica_entrada': True},
+] + [
+    {'nombre': salida, 'tipo': 'extraer', 'entrada': capa, 'salida': salida, 'crs': CRS}
+    for capa, salida in EXTRACCIONES
+] + [
+    # Construccion
+    {'nombre': 'construccion_baunit', 'tipo': 'unir', 'entrada': 'seleccioneconstruccion', 'campo': 't_id',
+     'entrada_2': 'seleccionecoleubaunit', 'campo_2': 'ue_lc_construccion',
+     'campos': ['baunit', 'numero_sotanos', 'numero_mezanines', 'avaluo_construccion',
+                'numero_semisotanos', 'numero_pisos', 'area_construccion']},
+    {'nombre': 'LC_Construccion', 'tipo': 'unir', 'entrada': '@construccion_baunit', 'campo': 'baunit',
+     'entrada_2': 'seleccionetablapredio', 'campo_2': 't_id', 'campos': ['numero_predial'],
+     'salida': 'LC_Construccion', 'crs': CRS},
+
+    # UnidadConstruccion
+    {'nombre': 'unidad_baunit', 'tipo': 'unir', 'entrada': 'seleccioneconstruccion (2)', 'campo': 't_id',
+     'entrada_2': 'seleccionecoleubaunit', 'campo_2': 'ue_lc_unidadconstruccion',
+     'campos': ['baunit', 'avaluo_unidad_construccion', 'area_privada_construida', 'total_pisos',
+                'planta_ubicacion', 'total_locales', 'total_banios', 'tipo_planta', 'lc_construccion',
+                'uso', 'area_construida', 'total_habitaciones', 'tipo_unidad_construccion']},
+    {'nombre': 'LC_UnidadDeConstruccion', 'tipo': 'unir', 'entrada': '@unidad_baunit', 'campo': 'baunit',
+     'entrada_2': 'seleccionetablapredio', 'campo_2': 't_id', 'campos': ['numero_predial'],
+     'salida': 'LC_UnidadDeConstruccion', 'crs': CRS},
+
+    # Direccion
+    {'nombre': 'direccion_predio', 'tipo': 'unir', 'entrada': 'seleccioneconstruccion (2) (3)',
+     'campo': 'lc_predio_direccion', 'entrada_2': 'seleccionetablapredio', 'campo_2': 'T_id', 'campos': None},
+    {'nombre': 'Direccion', 'tipo': 'extraer', 'entrada': '@direccion_predio', 'salida': 'Direccion', 'crs': CRS},
+
+    # Terreno
+    {'nombre': 'terreno_baunit', 'tipo': 'unir', 'entrada': 'seleccioneterreno', 'campo': 't_id',
+     'entrada_2': 'seleccionecoleubaunit', 'campo_2': 'ue_lc_terreno', 'campos': ['baunit']},
+    {'nombre': 'LC_Terreno', 'tipo': 'unir', 'entrada': '@terreno_baunit', 'campo': 'baunit',
+     'entrada_2': 'seleccionetablapredio', 'campo_2': 't_id', 'campos': None,
+     'salida': 'LC_Terreno', 'crs': CRS},
+
+    # Derecho
+    {'nombre': 'derecho_temp', 'tipo': 'unir', 'entrada': '@LC_Terreno', 'campo': 'baunit',
+     'entrada_2': 'seleccionetablapredio (2)', 'campo_2': 'unidad', 'campos': ['tipo']},
+    # Crear expresión para ajustar tipo_2 para LC_Derecho
+    {'nombre': 'derecho_ajustado', 'tipo': 'calcular', 'entrada': '@derecho_temp',
+     'campo': 'tipo', 'tipo_campo': 1, 'longitud': 0, 'formula': 'tipo',
+     'expresion_sql': 'CAST({tipo} AS INTEGER)'},
+    {'nombre': 'LC_Tipo_predio', 'tipo': 'decodificar', 'entrada': '@LC_Terreno', 'campo': 'tipo',
+     'entrada_2': 'seleccionetablapredio (2) (2) (2)', 'campo_2': 'T_id', 'campos': ['iliCode'],
+     'salida': 'LC_Tipo_predio', 'crs': CRS},
+    {'nombre': 'derecho_decodificado', 'tipo': 'decodificar', 'entrada': '@derecho_ajustado', 'campo': 'tipo',
+     'entrada_2': 'seleccionetablapredio (2) (2)', 'campo_2': 'T_id', 'campos': ['iliCode'], 'crs': CRS},
+    # Ajustar iliCode según tipo_2 en la misma escritura de LC_Derecho
+    {'nombre': 'LC_Derecho', 'tipo': 'calcular', 'entrada': '@derecho_decodificado',
+     'campo': 'iliCode', 'tipo_campo': 2, 'longitud': 0,
+     'formula': caso_qgis('tipo_2', TIPOS_DERECHO, '"iliCode"'),
+     'expresion_sql': caso_sql('{tipo_2}', TIPOS_DERECHO, '{iliCode}'),
+     'salida': 'LC_Derecho', 'crs': CRS},
+] + [
+    # Corregir geometrías y reproyectar a EPSG:9377 (con el motor directo se aplica al escribir cada capa)
+    spec
+    for layer_name in layers_to_fix
+    for spec in (
+        {'nombre': f'corregir_{layer_name}', 'tipo': 'corregir', 'entrada': f'@{layer_name}'},
+        {'nombre': f'reproyectar_{layer_name}', 'tipo': 'reproyectar', 'entrada': f'@corregir_{layer_name}',
+         'crs': CRS, 'salida': layer_name},
+    )
+] + [
+    # Consulta SQL para actualizar SRC
+    {'nombre': 'actualizar_srs', 'tipo': 'sql', 'modifica': '*', 'sql': '''
+            UPDATE gpkg_geometry_columns
+            SET srs_id = 9377
+            WHERE table_name LIKE 'CC_%'
+            OR table_name LIKE 'LC_%'
+            OR table_name = 'Direccion';
+            '''},
+]
+
+
+class ValidadoresLADM10(AlgoritmoETL):
+    CAPAS = layer_mapping
+    PASOS = PASOS
+
+    def name(self):
+        return 'etl_modelo_ladm_1_0'
+
+    def displayName(self):
+        return 'ETL MODELO LADM COL 1.0'
+
+    def createInstance(self):
+        return ValidadoresLADM10()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Grafo declarativo de pasos ETL y planificador concurrente.
+
+Este módulo no depende de QGIS: cada paso es una función que recibe las
+salidas de los pasos de los que depende. El planificador ejecuta en paralelo
+las ramas independientes y serializa solo lo que comparte datos o recursos
+(por ejemplo, el GeoPackage de salida).
+"""
+import os
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class ErrorGrafo(Exception):
+    pass
+
+
+class ErrorPaso(Exception):
+    def __init__(self, paso, error):
+        super().__init__(f"Error en el paso '{paso}': {error}")
+        self.paso = paso
+        self.error = error
+
+
+class Salida:
+    """Referencia a la salida de otro paso dentro de los parámetros."""
+
+    __slots__ = ('paso', 'clave')
+
+    def __init__(self, paso, clave='OUTPUT'):
+        self.paso = paso
+        self.clave = clave
+
+    def __repr__(self):
+        return f"Salida({self.paso!r}, {self.clave!r})"
+
+
+def referencias(valor):
+    # Nombres de los pasos referenciados (en cualquier nivel) por unos parámetros
+    if isinstance(valor, Salida):
+        return {valor.paso}
+    if isinstance(valor, dict):
+        valores = valor.values()
+    elif isinstance(valor, (list, tuple, set)):
+        valores = valor
+    else:
+        return set()
+    encontrados = set()
+    for v in valores:
+        encontrados |= referencias(v)
+    return encontrados
+
+
+def resolver(valor, resultados):
+    # Sustituye las referencias Salida por el resultado ya calculado
+    if isinstance(valor, Salida):
+        resultado = resultados[valor.paso]
+        if isinstance(resultado, dict) and valor.clave is not None:
+            return resultado[valor.clave]
+        return resultado
+    if isinstance(valor, dict):
+        return {k: resolver(v, resultados) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [resolver(v, resultados) for v in valor]
+    if isinstance(valor, tuple):
+        return tuple(resolver(v, resultados) for v in valor)
+    return valor
+
+
+class Paso:
+    def __init__(self, nombre, funcion, depende=(), recursos=(), descripcion=None):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.depende = set(depende)
+        self.recursos = set(recursos)
+        self.descripcion = descripcion or nombre
+
+    def __repr__(self):
+        return f"Paso({self.nombre!r})"
+
+
+class GrafoETL:
+    def __init__(self):
+        self.pasos = OrderedDict()
+
+    def agregar(self, paso):
+        if paso.nombre in self.pasos:
+            raise ErrorGrafo(f"Paso duplicado: {paso.nombre}")
+        self.pasos[paso.nombre] = paso
+        return paso
+
+    def __len__(self):
+        return len(self.pasos)
+
+    def __iter__(self):
+        return iter(self.pasos.values())
+
+    def __contains__(self, nombre):
+        return nombre in self.pasos
+
+    def __getitem__(self, nombre):
+        return self.pasos[nombre]
+
+    def dependientes(self):
+        hijos = {nombre: [] for nombre in self.pasos}
+        for paso in self:
+            for dep in paso.depende:
+                hijos[dep].append(paso.nombre)
+        return hijos
+
+    def validar(self):
+        for paso in self:
+            faltantes = paso.depende - set(self.pasos)
+            if faltantes:
+                raise ErrorGrafo(f"El paso '{paso.nombre}' depende de pasos inexistentes: {sorted(faltantes)}")
+        self.orden()
+
+    def orden(self):
+        # Orden topológico estable (respeta el orden de inserción)
+        grados = {paso.nombre: len(paso.depende) for paso in self}
+        hijos = self.dependientes()
+        listos = [nombre for nombre, grado in grados.items() if grado == 0]
+        orden = []
+        while listos:
+            nombre = listos.pop(0)
+            orden.append(nombre)
+            for hijo in hijos[nombre]:
+                grados[hijo] -= 1
+                if grados[hijo] == 0:
+                    listos.append(hijo)
+        if len(orden) != len(self.pasos):
+            ciclo = sorted(nombre for nombre, grado in grados.items() if grado > 0)
+            raise ErrorGrafo(f"El grafo de pasos tiene ciclos: {ciclo}")
+        return orden
+
+    def prioridades(self):
+        # Longitud de la cadena más larga que cuelga de cada paso (ruta crítica)
+        hijos = self.dependientes()
+        prioridad = {}
+        for nombre in reversed(self.orden()):
+            prioridad[nombre] = 1 + max((prioridad[h] for h in hijos[nombre]), default=0)
+        return prioridad
+
+
+def ejecutar_grafo(grafo, max_hilos=None, cancelado=None, al_iniciar=None, al_terminar=None, al_cancelar=None):
+    """
+    Ejecuta los pasos del grafo en un pool de hilos.
+
+    Devuelve un diccionario nombre -> resultado, o None si se canceló.
+    Un paso solo se lanza cuando terminaron todas sus dependencias y ningún
+    otro paso en curso ocupa alguno de sus recursos.
+    """
+    grafo.validar()
+    max_hilos = max(1, max_hilos or os.cpu_count() or 1)
+    prioridad = grafo.prioridades()
+    hijos = grafo.dependientes()
+    faltan = {paso.nombre: set(paso.depende) for paso in grafo}
+    listos = [nombre for nombre, deps in faltan.items() if not deps]
+    resultados = {}
+    en_curso = {}
+    ocupados = set()
+    error = None
+    interrumpido = False
+
+    def lanzar(ejecutor):
+        listos.sort(key=lambda nombre: -prioridad[nombre])
+        for nombre in list(listos):
+            if len(en_curso) >= max_hilos:
+                break
+            paso = grafo[nombre]
+            if paso.recursos & ocupados:
+                continue
+            listos.remove(nombre)
+            ocupados.update(paso.recursos)
+            entradas = {dep: resultados[dep] for dep in paso.depende}
+            if al_iniciar:
+                al_iniciar(paso)
+            en_curso[ejecutor.submit(paso.funcion, entradas)] = paso
+
+    with ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix='etl') as ejecutor:
+        while True:
+            if not interrumpido and cancelado is not None and cancelado():
+                interrumpido = True
+                if al_cancelar:
+                    al_cancelar()
+            if not interrumpido and error is None:
+                lanzar(ejecutor)
+            if not en_curso:
+                break
+            terminados, _ = wait(list(en_curso), timeout=0.2, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                paso = en_curso.pop(futuro)
+                ocupados.difference_update(paso.recursos)
+                excepcion = futuro.exception()
+                if excepcion is not None:
+                    if error is None:
+                        error = ErrorPaso(paso.nombre, excepcion)
+                        error.__cause__ = excepcion
+                        if al_cancelar:
+                            al_cancelar()
+                    continue
+                resultados[paso.nombre] = futuro.result()
+                if al_terminar:
+                    al_terminar(paso, resultados[paso.nombre])
+                for hijo in hijos[paso.nombre]:
+                    faltan[hijo].discard(paso.nombre)
+                    if not faltan[hijo]:
+                        listos.append(hijo)
+
+    if error is not None:
+        raise error
+    if interrumpido:
+        return None
+    return resultados
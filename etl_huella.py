@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+"""
+Huella canónica de las tablas de un GeoPackage de salida.
+
+    python -m Validadores.etl_huella salida.gpkg
+    python -m Validadores.etl_huella referencia.gpkg nueva.gpkg
+
+Sirve para comprobar que dos motores (o dos versiones del plugin) producen las
+mismas capas. La huella de una tabla no depende del orden de las filas, del
+orden de las columnas ni del fid:
+
+- cada fila se normaliza: columnas por nombre en minúsculas sin fid, reales
+  redondeados a DECIMALES (5.0 cuenta igual que 5, como en QGIS) y la
+  geometría como WKB sin la cabecera GeoPackage, en little-endian y con las
+  coordenadas redondeadas a DECIMALES_GEOMETRIA;
+- la huella de la tabla es la suma módulo 2^128 de los hashes de sus filas,
+  así que dos tablas con las mismas filas (con repeticiones) suman igual;
+- las filas se reparten además en CUBETAS por su hash, con una suma por
+  cubeta. Al comparar, solo se vuelven a leer las filas de las cubetas que
+  difieren, de modo que el informe dice qué filas sobran o faltan sin
+  guardar en memoria el hash de todas.
+
+Con `exacta` no se normaliza nada y el rowid entra en el hash de cada fila:
+la huella cambia con cualquier edición, también con dos filas que
+intercambian sus valores. Es la que usa etl_cache para las firmas de las
+tablas de entrada.
+
+Las tablas se leen en un solo recorrido y por lotes, con memoria constante.
+Este módulo no depende de QGIS.
+"""
+import argparse
+import hashlib
+import json
+import struct
+import sys
+from collections import Counter
+
+from . import gpkg_sql
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+DECIMALES = 9
+DECIMALES_GEOMETRIA = 6
+CUBETAS = 4096
+LOTE = 5000
+MASCARA = (1 << 128) - 1
+MAX_FILAS = 20              # filas distintas que se informan por tabla y lado
+CLAVES = ('t_id', 'numero_predial', 'numero_predial_nacional')
+
+
+# ---------------------------------------------------------------------------
+# Normalización
+
+def _normalizada(columna, decimales):
+    # Expresión SQL de la columna normalizada: reales redondeados y, si quedan
+    # enteros, convertidos a entero. SQLite lo resuelve sin pasar por Python.
+    nombre = gpkg_sql.identificador(columna)
+    redondeado = f'round({nombre}, {int(decimales)})'
+    return (f"CASE WHEN typeof({nombre}) != 'real' THEN {nombre} "
+            f"WHEN {redondeado} = CAST({redondeado} AS INTEGER) THEN CAST({redondeado} AS INTEGER) "
+            f"ELSE {redondeado} END")
+
+
+def _little_endian(wkb, pos, salida):
+    # Copia la geometría de `wkb` desde `pos` a `salida` en little-endian; devuelve la posición final
+    if wkb[pos] == 1:
+        fin = _fin_wkb(wkb, pos)
+        salida += wkb[pos:fin]
+        return fin
+    tipo = struct.unpack_from('>I', wkb, pos + 1)[0]
+    salida += struct.pack('<BI', 1, tipo)
+    pos += 5
+    dims = 2
+    if tipo & 0xE0000000:
+        dims += bool(tipo & 0x80000000) + bool(tipo & 0x40000000)
+        if tipo & 0x20000000:
+            salida += struct.pack('<I', *struct.unpack_from('>I', wkb, pos))
+            pos += 4
+        tipo &= 0x0FFFFFFF
+    else:
+        dims += {1: 1, 2: 1, 3: 2}.get(tipo // 1000, 0)
+        tipo %= 1000
+
+    def puntos(n, pos):
+        salida.extend(struct.pack(f'<{n * dims}d', *struct.unpack_from(f'>{n * dims}d', wkb, pos)))
+        return pos + n * 8 * dims
+
+    def cuenta(pos):
+        n = struct.unpack_from('>I', wkb, pos)[0]
+        salida.extend(struct.pack('<I', n))
+        return n, pos + 4
+
+    if tipo == 1:
+        return puntos(1, pos)
+    if tipo in (2, 8):
+        n, pos = cuenta(pos)
+        return puntos(n, pos)
+    if tipo == 3:
+        anillos, pos = cuenta(pos)
+        for _ in range(anillos):
+            n, pos = cuenta(pos)
+            pos = puntos(n, pos)
+        return pos
+    partes, pos = cuenta(pos)
+    for _ in range(partes):
+        pos = _little_endian(wkb, pos, salida)
+    return pos
+
+
+def _fin_wkb(wkb, pos):
+    secuencias = gpkg_sql.secuencias_wkb(wkb, pos)
+    if not secuencias:
+        # Colección sin partes: cabecera y número de partes
+        return pos + 9
+    _, inicio, n, dims = secuencias[-1]
+    return inicio + n * 8 * dims
+
+
+def geometrias_canonicas(blobs, decimales=DECIMALES_GEOMETRIA):
+    """WKB little-endian con coordenadas redondeadas de cada BLOB GeoPackage (None si es nulo o vacío)."""
+    buffers = []
+    for blob in blobs:
+        wkb = gpkg_sql.wkb(blob)
+        if wkb is None:
+            buffers.append(None)
+        elif wkb[0] == 1:
+            buffers.append(bytearray(wkb))
+        else:
+            buffer = bytearray()
+            _little_endian(wkb, 0, buffer)
+            buffers.append(buffer)
+    if numpy is not None:
+        # Todas las coordenadas del lote se redondean juntas sobre un único buffer:
+        # se reúnen los 8 bytes de cada doble, se redondean y se escriben en su lugar
+        unido = bytearray()
+        posiciones = []
+        cuentas = []
+        limites = []
+        for buffer in buffers:
+            if buffer is None:
+                limites.append(None)
+                continue
+            base = len(unido)
+            for orden, pos, n, dims in gpkg_sql.secuencias_wkb(buffer):
+                if n and orden == '<':
+                    posiciones.append(base + pos)
+                    cuentas.append(n * dims)
+            unido += buffer
+            limites.append((base, len(unido)))
+        if posiciones:
+            cuentas = numpy.array(cuentas, dtype=numpy.int64)
+            primeros = numpy.cumsum(cuentas) - cuentas
+            dobles = (numpy.repeat(numpy.array(posiciones, dtype=numpy.int64), cuentas) +
+                      8 * (numpy.arange(int(cuentas.sum()), dtype=numpy.int64) - numpy.repeat(primeros, cuentas)))
+            indices = dobles[:, None] + numpy.arange(8, dtype=numpy.int64)
+            octetos = numpy.frombuffer(unido, dtype=numpy.uint8)
+            valores = octetos[indices].copy().view('<f8')
+            octetos[indices] = (numpy.round(valores, decimales) + 0.0).view(numpy.uint8)
+        return [bytes(unido[limite[0]:limite[1]]) if limite is not None else None for limite in limites]
+    # Mismo redondeo que numpy.round (rint(c * 10^d) / 10^d), para que la huella no dependa de numpy
+    escala = 10.0 ** decimales
+    for buffer in buffers:
+        if buffer is None:
+            continue
+        for orden, pos, n, dims in gpkg_sql.secuencias_wkb(buffer):
+            if orden != '<':
+                continue
+            formato = f'<{n * dims}d'
+            struct.pack_into(formato, buffer, pos,
+                             *(round(c * escala) / escala + 0.0 for c in struct.unpack_from(formato, buffer, pos)))
+    return [bytes(buffer) if buffer is not None else None for buffer in buffers]
+
+
+# ---------------------------------------------------------------------------
+# Huellas
+
+def tablas_gpkg(conn):
+    """Tablas de datos del GeoPackage (las de gpkg_contents), por nombre en minúsculas."""
+    if not gpkg_sql.existe_tabla(conn, 'gpkg_contents'):
+        return {}
+    return {nombre.lower(): nombre
+            for (nombre,) in conn.execute("SELECT table_name FROM gpkg_contents "
+                                          "WHERE data_type IN ('features', 'attributes') ORDER BY table_name")
+            if gpkg_sql.existe_tabla(conn, nombre)}
+
+
+def esquema(conn, tabla):
+    """(columnas de atributos por nombre en minúsculas, columna de geometría o None)."""
+    geometria = None
+    if gpkg_sql.existe_tabla(conn, 'gpkg_geometry_columns'):
+        fila = gpkg_sql.columna_geometria(conn, tabla)
+        geometria = fila[0] if fila else None
+    columnas = {nombre.lower(): nombre for nombre, _, _ in gpkg_sql.columnas(conn, tabla)
+                if nombre.lower() != 'fid' and (geometria is None or nombre.lower() != geometria.lower())}
+    return columnas, geometria
+
+
+def _filas(conn, tabla, columnas, geometria, decimales, decimales_geometria, exacta=False):
+    # Listas de (rowid, hash de 16 bytes) de cada fila, una por lote
+    if exacta:
+        seleccion = ['rowid'] + [gpkg_sql.identificador(nombre) for nombre in columnas]
+    else:
+        seleccion = ['rowid'] + [_normalizada(nombre, decimales) for nombre in columnas]
+    if geometria:
+        seleccion.append(gpkg_sql.identificador(geometria))
+    cursor = conn.execute(f'SELECT {", ".join(seleccion)} FROM {gpkg_sql.identificador(tabla)}')
+    fin = len(columnas) + 1
+    blake2b = hashlib.blake2b
+    while True:
+        filas = cursor.fetchmany(LOTE)
+        if not filas:
+            return
+        if exacta:
+            # La fila completa, con su rowid y la geometría tal como está guardada
+            if not geometria:
+                yield [(fila[0], blake2b(repr(fila).encode('utf-8'), digest_size=16).digest()) for fila in filas]
+                continue
+            lote = []
+            for fila in filas:
+                digest = blake2b(repr(fila[:fin]).encode('utf-8') + b'\x00', digest_size=16)
+                if fila[fin] is not None:
+                    digest.update(b'\x01' + fila[fin])
+                lote.append((fila[0], digest.digest()))
+            yield lote
+            continue
+        if not geometria:
+            yield [(fila[0], blake2b(repr(fila[1:fin]).encode('utf-8') + b'\x00', digest_size=16).digest())
+                   for fila in filas]
+            continue
+        geometrias = geometrias_canonicas([fila[-1] for fila in filas], decimales_geometria)
+        yield [(fila[0], blake2b(repr(fila[1:fin]).encode('utf-8') +
+                                 (b'\x00' if geometria_canonica is None else b'\x01' + geometria_canonica),
+                                 digest_size=16).digest())
+               for fila, geometria_canonica in zip(filas, geometrias)]
+
+
+def _cubeta(valor):
+    # Los bits bajos del hash (CUBETAS es potencia de 2)
+    return valor & (CUBETAS - 1)
+
+
+def huella_tabla(conn, tabla, columnas=None, decimales=DECIMALES, decimales_geometria=DECIMALES_GEOMETRIA,
+                 exacta=False):
+    """
+    {'filas', 'huella', 'columnas', 'cubetas'} de `tabla`. `columnas` (nombres en
+    minúsculas) limita los atributos que cuentan; por defecto, todos menos fid.
+    Con `exacta`, los valores sin normalizar y el rowid de cada fila.
+    """
+    propias, geometria = esquema(conn, tabla)
+    nombres = sorted(propias if columnas is None else set(columnas) & set(propias))
+    cubetas = [0] * CUBETAS
+    suma = 0
+    filas = 0
+    for lote in _filas(conn, tabla, [propias[nombre] for nombre in nombres], geometria, decimales,
+                       decimales_geometria, exacta):
+        for _, digest in lote:
+            valor = int.from_bytes(digest, 'little')
+            suma += valor
+            cubetas[_cubeta(valor)] += valor
+        filas += len(lote)
+    return {
+        'filas': filas,
+        'huella': f'{filas}:{suma & MASCARA:032x}',
+        'columnas': nombres + ([f'<{geometria.lower()}>'] if geometria else []),
+        'cubetas': [valor & MASCARA for valor in cubetas],
+    }
+
+
+def huellas(ruta, tablas=None, ignorar=(), decimales=DECIMALES, decimales_geometria=DECIMALES_GEOMETRIA):
+    """{tabla: huella} de las tablas de datos de `ruta` (o de `tablas`)."""
+    ignorar = {nombre.lower() for nombre in ignorar}
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        disponibles = tablas_gpkg(conn)
+        nombres = [disponibles[t.lower()] for t in tablas if t.lower() in disponibles] if tablas else disponibles.values()
+        resultado = {}
+        for tabla in nombres:
+            propias, _ = esquema(conn, tabla)
+            resultado[tabla] = huella_tabla(conn, tabla, set(propias) - ignorar, decimales,
+                                            decimales_geometria)['huella']
+        return resultado
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Comparación
+
+def _identificar(conn, tabla, rowids):
+    # fid y claves legibles (T_Id, número predial) de las filas indicadas
+    propias, _ = esquema(conn, tabla)
+    claves = [propias[clave] for clave in CLAVES if clave in propias]
+    seleccion = ', '.join(['rowid'] + [gpkg_sql.identificador(clave) for clave in claves])
+    resultado = []
+    for inicio in range(0, len(rowids), 500):
+        parte = rowids[inicio:inicio + 500]
+        filas = conn.execute(f'SELECT {seleccion} FROM {gpkg_sql.identificador(tabla)} '
+                             f'WHERE rowid IN ({", ".join("?" * len(parte))})', parte).fetchall()
+        resultado += [dict(zip(['fid'] + claves, fila)) for fila in filas]
+    return sorted(resultado, key=lambda fila: fila['fid'])
+
+
+def filas_distintas(conn_a, tabla_a, conn_b, tabla_b, columnas, cubetas, max_filas=MAX_FILAS,
+                    decimales=DECIMALES, decimales_geometria=DECIMALES_GEOMETRIA):
+    """(filas solo en A, filas solo en B, total de cada lado) dentro de las `cubetas` indicadas."""
+    cubetas = set(cubetas)
+    lados = []
+    for conn, tabla in ((conn_a, tabla_a), (conn_b, tabla_b)):
+        propias, geometria = esquema(conn, tabla)
+        por_hash = {}
+        for lote in _filas(conn, tabla, [propias[nombre] for nombre in columnas], geometria, decimales,
+                           decimales_geometria):
+            for rowid, digest in lote:
+                if _cubeta(int.from_bytes(digest, 'little')) in cubetas:
+                    por_hash.setdefault(digest, []).append(rowid)
+        lados.append(por_hash)
+    a, b = lados
+    conteo_a = Counter({digest: len(rowids) for digest, rowids in a.items()})
+    conteo_b = Counter({digest: len(rowids) for digest, rowids in b.items()})
+    # Con filas repetidas sobran las últimas de cada hash
+    solo_a = [rowid for digest, n in (conteo_a - conteo_b).items() for rowid in a[digest][-n:]]
+    solo_b = [rowid for digest, n in (conteo_b - conteo_a).items() for rowid in b[digest][-n:]]
+    return (_identificar(conn_a, tabla_a, sorted(solo_a)[:max_filas]),
+            _identificar(conn_b, tabla_b, sorted(solo_b)[:max_filas]), len(solo_a), len(solo_b))
+
+
+def comparar(ruta_a, ruta_b, tablas=None, ignorar=(), max_filas=MAX_FILAS, decimales=DECIMALES,
+             decimales_geometria=DECIMALES_GEOMETRIA):
+    """
+    {tabla: resultado} con 'estado' igual, distinta, solo_a o solo_b. Las tablas
+    distintas traen las columnas de cada lado que no están en el otro y las
+    filas (fid y claves) que solo aparecen en cada lado, comparando las columnas comunes.
+    """
+    ignorar = {nombre.lower() for nombre in ignorar}
+    conn_a = gpkg_sql.conectar(ruta_a)
+    conn_b = gpkg_sql.conectar(ruta_b)
+    try:
+        tablas_a = tablas_gpkg(conn_a)
+        tablas_b = tablas_gpkg(conn_b)
+        nombres = sorted({t.lower() for t in tablas} if tablas else set(tablas_a) | set(tablas_b))
+        resultado = {}
+        for nombre in nombres:
+            if nombre not in tablas_b or nombre not in tablas_a:
+                if nombre in tablas_a or nombre in tablas_b:
+                    resultado[tablas_a.get(nombre) or tablas_b[nombre]] = {
+                        'estado': 'solo_a' if nombre in tablas_a else 'solo_b'}
+                continue
+            tabla_a, tabla_b = tablas_a[nombre], tablas_b[nombre]
+            columnas_a = set(esquema(conn_a, tabla_a)[0]) - ignorar
+            columnas_b = set(esquema(conn_b, tabla_b)[0]) - ignorar
+            comunes = sorted(columnas_a & columnas_b)
+            huella_a = huella_tabla(conn_a, tabla_a, comunes, decimales, decimales_geometria)
+            huella_b = huella_tabla(conn_b, tabla_b, comunes, decimales, decimales_geometria)
+            registro = {'estado': 'igual', 'filas_a': huella_a['filas'], 'filas_b': huella_b['filas'],
+                        'huella_a': huella_a['huella'], 'huella_b': huella_b['huella']}
+            if columnas_a != columnas_b:
+                registro['columnas_solo_a'] = sorted(columnas_a - columnas_b)
+                registro['columnas_solo_b'] = sorted(columnas_b - columnas_a)
+                registro['estado'] = 'distinta'
+            if huella_a['huella'] != huella_b['huella']:
+                registro['estado'] = 'distinta'
+                cubetas = [i for i, (x, y) in enumerate(zip(huella_a['cubetas'], huella_b['cubetas'])) if x != y]
+                solo_a, solo_b, total_a, total_b = filas_distintas(conn_a, tabla_a, conn_b, tabla_b, comunes, cubetas,
+                                                                   max_filas, decimales, decimales_geometria)
+                registro.update({'filas_solo_a': total_a, 'filas_solo_b': total_b,
+                                 'ejemplos_solo_a': solo_a, 'ejemplos_solo_b': solo_b})
+            resultado[tabla_a] = registro
+        return resultado
+    finally:
+        conn_a.close()
+        conn_b.close()
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog='etl_huella',
+        description='Calcula la huella de las tablas de un GeoPackage o compara dos GeoPackages fila por fila.'
+    )
+    parser.add_argument('gpkg', nargs='+', metavar='GPKG', help='Un GeoPackage (huellas) o dos (comparación)')
+    parser.add_argument('-t', '--tablas', nargs='+', help='Tablas que se consideran (por defecto todas)')
+    parser.add_argument('--ignorar', nargs='+', default=[], metavar='COLUMNA',
+                        help='Columnas que no cuentan en la comparación')
+    parser.add_argument('--decimales', type=int, default=DECIMALES, help='Decimales de los atributos reales')
+    parser.add_argument('--decimales-geometria', type=int, default=DECIMALES_GEOMETRIA,
+                        help='Decimales de las coordenadas')
+    parser.add_argument('--max-filas', type=int, default=MAX_FILAS,
+                        help='Filas distintas que se muestran por tabla y lado')
+    return parser
+
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if len(args.gpkg) > 2:
+        parser.error('Indique un GeoPackage o dos para compararlos')
+    if len(args.gpkg) == 1:
+        resultado = huellas(args.gpkg[0], args.tablas, args.ignorar, args.decimales, args.decimales_geometria)
+        print(json.dumps(resultado, ensure_ascii=False, indent=2))
+        return 0
+    resultado = comparar(args.gpkg[0], args.gpkg[1], args.tablas, args.ignorar, args.max_filas, args.decimales,
+                         args.decimales_geometria)
+    print(json.dumps(resultado, ensure_ascii=False, indent=2, default=str))
+    distintas = [tabla for tabla, registro in resultado.items() if registro['estado'] != 'igual']
+    print(f"{len(resultado) - len(distintas)} tablas iguales, {len(distintas)} distintas"
+          + (f": {', '.join(distintas)}" if distintas else ''), file=sys.stderr)
+    return 1 if distintas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
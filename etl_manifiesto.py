@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Manifiesto de las tablas de un GeoPackage de salida.
+
+Por cada tabla generada se guarda la firma de su contenido: la cadena de
+pasos que la produce junto con la huella de las tablas de entrada de las que
+sale. En una ejecución incremental solo se reconstruyen las tablas cuya firma
+cambió; las demás se conservan tal cual, con su índice espacial.
+
+La tabla etl_manifiesto no se registra en gpkg_contents, así que QGIS no la
+muestra como capa. Este módulo no depende de QGIS.
+"""
+import os
+from datetime import datetime, timezone
+
+from . import gpkg_sql
+
+
+TABLA = 'etl_manifiesto'
+
+
+def leer(ruta):
+    """{tabla: firma} del manifiesto de `ruta`, o {} si no existe."""
+    if not os.path.isfile(ruta):
+        return {}
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        if not gpkg_sql.existe_tabla(conn, TABLA):
+            return {}
+        firmas = {}
+        for tabla, firma in conn.execute(f'SELECT tabla, firma FROM {TABLA}'):
+            if gpkg_sql.existe_tabla(conn, tabla):
+                firmas[tabla] = firma
+        return firmas
+    finally:
+        conn.close()
+
+
+def olvidar(ruta, tablas):
+    # Antes de reescribir unas tablas: si la ejecución falla no deben parecer al día
+    if not os.path.isfile(ruta):
+        return
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        if gpkg_sql.existe_tabla(conn, TABLA):
+            conn.executemany(f'DELETE FROM {TABLA} WHERE tabla = ?', [(tabla,) for tabla in tablas])
+    finally:
+        conn.close()
+
+
+def escribir(ruta, modelo, firmas):
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {TABLA} (
+            tabla TEXT PRIMARY KEY, modelo TEXT, firma TEXT NOT NULL, fecha TEXT)''')
+        fecha = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        conn.executemany(f'INSERT OR REPLACE INTO {TABLA} VALUES (?, ?, ?, ?)',
+                         [(tabla, modelo, firma, fecha) for tabla, firma in firmas.items()])
+        conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
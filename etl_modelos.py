@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Perfiles de los modelos de entrada y detección automática del modelo.
+
+    python -m Validadores.etl_modelos municipio1.gpkg municipio2.gpkg
+
+Cada modelo (interno, LADM COL 1.2, LADM COL 1.0) se describe en
+perfiles_modelos.json: el mapa de capas que usan sus pasos y las reglas para
+reconocerlo. Las reglas son tablas que deben existir (con algunas columnas) y
+tablas que no deben existir; entre los modelos que las cumplen se elige el que
+encuentra más tablas de su mapa de capas.
+
+La detección solo lee metadatos (gpkg_contents, sqlite_master y
+PRAGMA table_info de las tablas de las reglas), nunca las filas, y se guarda
+por huella del archivo (ruta, tamaño y fecha de modificación) junto a la caché
+de intermedios, de modo que un lote no vuelve a abrir los archivos ya vistos.
+
+Este módulo no depende de QGIS.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+import threading
+import time
+
+from . import gpkg_sql
+from .etl_cache import directorio_por_defecto
+
+
+ARCHIVO_PERFILES = os.path.join(os.path.dirname(__file__), 'perfiles_modelos.json')
+VERSION = 1
+
+
+def leer_perfiles(ruta=ARCHIVO_PERFILES):
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+_DATOS = leer_perfiles()
+PERFILES = _DATOS['modelos']
+# Cambia si cambian los perfiles: las detecciones guardadas con otros perfiles no se reutilizan
+_VERSION_PERFILES = hashlib.blake2b(
+    json.dumps([VERSION, _DATOS], sort_keys=True).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def capas(modelo):
+    """Mapa de capas (clave de los pasos -> tabla de entrada) de `modelo`."""
+    return dict(PERFILES[modelo]['capas'])
+
+
+def esquema(ruta, perfiles=None):
+    """
+    {tabla en minúsculas: columnas en minúsculas} de `ruta`. Las columnas solo
+    se leen para las tablas que nombran las reglas de `perfiles`.
+    """
+    perfiles = PERFILES if perfiles is None else perfiles
+    # Solo lectura: detectar el modelo no debe crear el archivo ni bloquearlo
+    conn = sqlite3.connect(pathlib.Path(ruta).resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        nombres = {nombre.lower(): nombre for (nombre,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+        if 'gpkg_contents' in nombres:
+            nombres.update({nombre.lower(): nombre for (nombre,) in conn.execute(
+                'SELECT table_name FROM gpkg_contents') if nombre.lower() in nombres})
+        leer = {tabla for perfil in perfiles.values() for tabla in perfil['deteccion']['requeridas']}
+        resultado = {}
+        for tabla, nombre in nombres.items():
+            resultado[tabla] = ({columna.lower() for columna, _, _ in gpkg_sql.columnas(conn, nombre)}
+                                if tabla in leer else set())
+        return resultado
+    finally:
+        conn.close()
+
+
+def evaluar(perfil, tablas):
+    """(cumple las reglas, fracción del mapa de capas presente, motivos por los que no cumple)."""
+    motivos = []
+    for tabla, columnas in perfil['deteccion']['requeridas'].items():
+        if tabla not in tablas:
+            motivos.append(f'falta la tabla {tabla}')
+            continue
+        faltan = [columna for columna in columnas if columna not in tablas[tabla]]
+        if faltan:
+            motivos.append(f"a {tabla} le faltan {', '.join(faltan)}")
+    motivos += [f'tiene la tabla {tabla}' for tabla in perfil['deteccion']['excluidas'] if tabla in tablas]
+    propias = {tabla.lower() for tabla in perfil['capas'].values()}
+    cobertura = len(propias & set(tablas)) / len(propias) if propias else 0.0
+    return not motivos, round(cobertura, 3), motivos
+
+
+def detectar_esquema(tablas, perfiles=None):
+    """Detección a partir de un esquema ya leído (ver `esquema`)."""
+    perfiles = PERFILES if perfiles is None else perfiles
+    candidatos = []
+    descartados = {}
+    for modelo, perfil in perfiles.items():
+        cumple, cobertura, motivos = evaluar(perfil, tablas)
+        if cumple:
+            candidatos.append((cobertura, modelo))
+        else:
+            descartados[modelo] = motivos
+    candidatos.sort(reverse=True)
+    resultado = {'modelo': None, 'cobertura': {modelo: cobertura for cobertura, modelo in candidatos},
+                 'descartados': descartados}
+    if not candidatos:
+        resultado['motivo'] = 'ningún perfil coincide'
+    elif len(candidatos) > 1 and candidatos[0][0] == candidatos[1][0]:
+        resultado['motivo'] = f'ambiguo entre {candidatos[0][1]} y {candidatos[1][1]}'
+    else:
+        resultado['modelo'] = candidatos[0][1]
+    return resultado
+
+
+class CacheDetecciones:
+    """Detecciones por huella del archivo, en memoria y en <caché>/modelos.sqlite."""
+
+    def __init__(self, directorio=None):
+        self.directorio = directorio or directorio_por_defecto()
+        self._ruta = os.path.join(self.directorio, 'modelos.sqlite')
+        self._memoria = {}
+        self._lock = threading.Lock()
+        self._creada = False
+
+    def _conectar(self):
+        conn = gpkg_sql.conectar(self._ruta)
+        if not self._creada:
+            conn.execute('CREATE TABLE IF NOT EXISTS detecciones (huella TEXT PRIMARY KEY, resultado TEXT NOT NULL, '
+                         'fecha REAL NOT NULL)')
+            self._creada = True
+        return conn
+
+    def obtener(self, huella):
+        with self._lock:
+            if huella in self._memoria:
+                return self._memoria[huella]
+            if not os.path.isfile(self._ruta):
+                return None
+            conn = self._conectar()
+            try:
+                fila = conn.execute('SELECT resultado FROM detecciones WHERE huella = ?', (huella,)).fetchone()
+            finally:
+                conn.close()
+            if fila is None:
+                return None
+            self._memoria[huella] = json.loads(fila[0])
+            return self._memoria[huella]
+
+    def guardar(self, huella, resultado):
+        with self._lock:
+            self._memoria[huella] = resultado
+            os.makedirs(self.directorio, exist_ok=True)
+            conn = self._conectar()
+            try:
+                conn.execute('INSERT OR REPLACE INTO detecciones VALUES (?, ?, ?)',
+                             (huella, json.dumps(resultado, ensure_ascii=False), time.time()))
+            finally:
+                conn.close()
+
+
+_cache = None
+
+
+def cache_por_defecto():
+    global _cache
+    if _cache is None:
+        _cache = CacheDetecciones()
+    return _cache
+
+
+def huella_archivo(ruta):
+    # Ruta, tamaño y fecha de modificación (incluye el -wal, que cambia antes que el archivo)
+    ruta = os.path.realpath(ruta)
+    partes = [_VERSION_PERFILES, ruta]
+    for archivo in (ruta, ruta + '-wal'):
+        if os.path.exists(archivo):
+            estado = os.stat(archivo)
+            partes += [estado.st_size, estado.st_mtime_ns]
+    return hashlib.blake2b(json.dumps(partes).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def detectar(ruta, cache=True):
+    """
+    {'modelo', 'cobertura', 'descartados'[, 'motivo']} de `ruta`; 'modelo' es
+    None si ningún perfil coincide o si hay empate. `cache` puede ser False,
+    True (caché por defecto) o una CacheDetecciones.
+    """
+    if not os.path.isfile(ruta):
+        raise FileNotFoundError(f"No existe el archivo de entrada: {ruta}")
+    if cache is True:
+        cache = cache_por_defecto()
+    huella = huella_archivo(ruta) if cache else None
+    if cache:
+        guardado = cache.obtener(huella)
+        if guardado is not None:
+            return dict(guardado, cache=True)
+    resultado = detectar_esquema(esquema(ruta))
+    if cache:
+        cache.guardar(huella, resultado)
+    return dict(resultado, cache=False)
+
+
+def modelo_de(ruta, cache=True):
+    """Nombre corto del modelo de `ruta`; ValueError si no se puede determinar."""
+    resultado = detectar(ruta, cache)
+    if resultado['modelo'] is None:
+        detalle = '; '.join(f"{modelo}: {', '.join(motivos)}" for modelo, motivos in resultado['descartados'].items())
+        raise ValueError(f"No se pudo identificar el modelo de {ruta} ({resultado['motivo']}). {detalle}")
+    return resultado['modelo']
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog='etl_modelos',
+        description='Identifica el modelo (interno, LADM COL 1.2 o 1.0) de GeoPackages de entrada leyendo solo '
+                    'sus metadatos.'
+    )
+    parser.add_argument('entradas', nargs='+', metavar='ENTRADA', help='GeoPackages de entrada')
+    parser.add_argument('--sin-cache', action='store_true', help='No usar ni guardar detecciones anteriores')
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    resultados = {}
+    for entrada in args.entradas:
+        inicio = time.perf_counter()
+        try:
+            resultado = detectar(entrada, cache=not args.sin_cache)
+        except Exception as e:
+            resultado = {'modelo': None, 'motivo': str(e)}
+        resultado['milisegundos'] = round((time.perf_counter() - inicio) * 1000, 2)
+        resultados[entrada] = resultado
+    print(json.dumps(resultados, ensure_ascii=False, indent=2))
+    return 0 if all(resultado['modelo'] for resultado in resultados.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
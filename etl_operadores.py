@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+Micro pruebas de rendimiento de cada operación del ETL.
+
+    python -m Validadores.etl_operadores
+    python -m Validadores.etl_operadores --actualizar-umbrales
+
+Cada operación se mide sola, con las funciones que usa el motor directo y
+sobre datos sintéticos fijos (etl_sintetico con semilla 0): filtro de
+registros sin T_Id, unión de primer coincidente, decodificación de dominios,
+concatenación de planta_total / piso_total, corrección de geometrías,
+reproyección y escritura en el GeoPackage. La preparación de cada operación no se mide; de varias
+repeticiones se toma la más rápida.
+
+Los tiempos se expresan relativos a una carga de calibración (SQLite y Python
+puro) medida en la misma máquina, para que los umbrales guardados en
+umbrales_operadores.json sirvan en otras máquinas. Una operación que supere su
+umbral más la tolerancia es una regresión y el código de salida es 1. Los
+umbrales solo se comparan con el mismo número de predios y las mismas
+bibliotecas (NumPy, shapely, pyproj o QGIS) en cada operación.
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+
+from . import etl_sintetico, gpkg_sql
+from .etl_dominios import Dominios
+from .etl_escritor import EscritorGpkg
+
+
+UMBRALES = os.path.join(os.path.dirname(__file__), 'umbrales_operadores.json')
+PREDIOS = 20000
+REPETICIONES = 5
+TOLERANCIA = 0.3
+MINIMO_SEGUNDOS = 0.02      # diferencias menores se consideran ruido
+# Datos fijos: la misma semilla y proporciones que en los umbrales guardados
+SEMILLA = 0
+NULOS = 0.01
+HUERFANOS = 0.005
+INVALIDAS = 0.01
+
+EXPRESION_PLANTA = "ifnull(CAST({iliCode} AS TEXT), '') || ' ' || ifnull(CAST({planta_ubicacion} AS TEXT), '')"
+
+
+def _contar(ruta, tabla):
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        return conn.execute(f'SELECT count(*) FROM {gpkg_sql.identificador(tabla)}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _blobs(ruta, tabla):
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        columna = gpkg_sql.columna_geometria(conn, tabla)[0]
+        return [blob for (blob,) in conn.execute(f'SELECT {gpkg_sql.identificador(columna)} '
+                                                 f'FROM {gpkg_sql.identificador(tabla)} ORDER BY rowid')]
+    finally:
+        conn.close()
+
+
+def motor(nombre):
+    """Bibliotecas que usa la operación; los umbrales solo valen con las mismas."""
+    if nombre == 'corregir_geometrias':
+        from . import etl_geometria
+        return 'shapely' if etl_geometria.shapely is not None else 'qgis'
+    if nombre == 'reproyectar':
+        from . import etl_geometria
+        return 'pyproj' if etl_geometria.pyproj is not None and etl_geometria.numpy is not None else 'qgis'
+    return 'sqlite'
+
+
+def _ajuste(ruta, tabla, crs):
+    # etl_geometria necesita QGIS para los sistemas de referencia
+    from .etl_cli import iniciar_qgis
+    iniciar_qgis()
+    from . import etl_geometria
+    return etl_geometria.ajuste_capa(ruta, tabla, crs)[0]
+
+
+# ---------------------------------------------------------------------------
+# Operaciones: preparar(datos, directorio) -> (función medida, entidades, limpieza o None)
+
+def filtro_t_id(datos, directorio):
+    # Copia de una capa de entrada sin los registros con T_Id nulo (extracción directa)
+    escritor = EscritorGpkg(os.path.join(directorio, 'filtro.gpkg'))
+    return (lambda: escritor.copiar(datos['interno'], 'cr_terreno', 'filtrada'),
+            _contar(datos['interno'], 'cr_terreno'), escritor.cerrar)
+
+
+def union_sqlite(datos, directorio):
+    # Primer coincidente resuelto en SQLite (tabla de búsqueda en disco)
+    operaciones = [{'tipo': 'unir', 'campo': 'T_Id', 'tabla': 'col_uebaunit', 'campo_2': 'ue_cr_terreno',
+                    'campos': ['baunit']}]
+    salida = os.path.join(directorio, 'union.gpkg')
+    return (lambda: gpkg_sql.unir_cadena(datos['interno'], salida, 'cr_terreno', operaciones, 'unida', indice=False),
+            _contar(datos['interno'], 'cr_terreno'), None)
+
+
+def decodificar_dominio(datos, directorio):
+    # Código de tipo_planta -> iliCode de cr_construccionplantatipo (incluye la lectura de los dominios)
+    operaciones = [{'tipo': 'decodificar', 'campo': 'tipo_planta', 'tabla': 'cr_construccionplantatipo',
+                    'campo_2': 'T_Id', 'campos': ['iliCode']}]
+    salida = os.path.join(directorio, 'dominio.gpkg')
+    return (lambda: gpkg_sql.unir_cadena(datos['interno'], salida, 'cr_unidadconstruccion', operaciones,
+                                         'decodificada', indice=False, dominios=Dominios(datos['interno'])),
+            _contar(datos['interno'], 'cr_unidadconstruccion'), None)
+
+
+def concatenar_planta(datos, directorio):
+    # planta_total / piso_total sobre una capa que ya tiene iliCode (la unión no se mide)
+    base = os.path.join(directorio, 'planta_base.gpkg')
+    if not os.path.isfile(base):
+        gpkg_sql.unir_cadena(datos['interno'], base, 'cr_unidadconstruccion',
+                             [{'tipo': 'unir', 'campo': 'tipo_planta', 'tabla': 'cr_construccionplantatipo',
+                               'campo_2': 'T_Id', 'campos': ['iliCode']}], 'decodificada', indice=False)
+    operaciones = [{'tipo': 'calcular', 'campo': 'planta_total', 'expresion': EXPRESION_PLANTA,
+                    'tipo_sql': gpkg_sql.tipo_calculado(2, 20)}]
+    salida = os.path.join(directorio, 'planta.gpkg')
+    return (lambda: gpkg_sql.unir_cadena(base, salida, 'decodificada', operaciones, 'planta', indice=False),
+            _contar(base, 'decodificada'), None)
+
+
+def corregir_geometrias(datos, directorio):
+    # Mismo sistema de origen y destino: solo validación y corrección
+    ajuste = _ajuste(datos['ladm_1_0'], 'lc_terreno', 'EPSG:3116')
+    blobs = _blobs(datos['ladm_1_0'], 'lc_terreno')
+    return lambda: ajuste(blobs), len(blobs), None
+
+
+def reproyectar(datos, directorio):
+    # EPSG:3116 -> EPSG:9377 de geometrías ya válidas
+    ajuste = _ajuste(datos['ladm_1_0'], 'lc_terreno', 'EPSG:9377')
+    wkbs = [gpkg_sql.wkb(blob) for blob in _blobs(datos['ladm_1_0'], 'lc_terreno')]
+    return lambda: ajuste._reproyectar(wkbs), len(wkbs), None
+
+
+def escribir_gpkg(datos, directorio):
+    # Inserción por lotes de filas ya leídas en una capa nueva de la salida
+    conn = gpkg_sql.conectar(datos['interno'])
+    try:
+        col_geom, tipo_geom, srs_id, _, _ = gpkg_sql.columna_geometria(conn, 'cr_terreno')
+        campos = [(nombre, tipo) for nombre, tipo, _ in gpkg_sql.columnas(conn, 'cr_terreno')
+                  if nombre.lower() not in (col_geom.lower(), 'fid')]
+        columnas = [gpkg_sql.COLUMNA_GEOMETRIA] + [nombre for nombre, _ in campos]
+        seleccion = ', '.join(gpkg_sql.identificador(nombre) for nombre in [col_geom] + columnas[1:])
+        filas = conn.execute(f'SELECT {seleccion} FROM cr_terreno ORDER BY rowid').fetchall()
+        srs = gpkg_sql.fila_srs(conn, srs_id)
+    finally:
+        conn.close()
+    ruta = os.path.join(directorio, 'escritura.gpkg')
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    escritor = EscritorGpkg(ruta)
+    escritor.crear_capa('escrita', campos, tipo_geom, srs)
+    return lambda: escritor.insertar_filas('escrita', columnas, filas), len(filas), escritor.cerrar
+
+
+OPERACIONES = {
+    'filtro_t_id': filtro_t_id,
+    'union_sqlite': union_sqlite,
+    'decodificar_dominio': decodificar_dominio,
+    'concatenar_planta': concatenar_planta,
+    'corregir_geometrias': corregir_geometrias,
+    'reproyectar': reproyectar,
+    'escribir_gpkg': escribir_gpkg,
+}
+
+
+# ---------------------------------------------------------------------------
+# Medición
+
+def calibrar(repeticiones=REPETICIONES):
+    """Segundos de una carga fija de SQLite y Python puro (la más rápida de las repeticiones)."""
+    def carga():
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE t (k INTEGER PRIMARY KEY, v TEXT, b BLOB)')
+        conn.executemany('INSERT INTO t VALUES (?, ?, ?)',
+                         ((i, f'{i * 7919 % 100003}', struct.pack('<dd', i, -i)) for i in range(100000)))
+        total = 0
+        for v, b in conn.execute('SELECT v, b FROM t ORDER BY v'):
+            total += len(v) + struct.unpack('<dd', b)[0]
+        conn.close()
+        return total
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        carga()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+def preparar_datos(directorio, predios=PREDIOS):
+    """GeoPackages sintéticos fijos (interno y ladm_1_0) para las operaciones."""
+    datos = {}
+    for modelo in ('interno', 'ladm_1_0'):
+        ruta = os.path.join(directorio, f'{modelo}_{predios}_s{SEMILLA}.gpkg')
+        if not os.path.isfile(ruta):
+            etl_sintetico.generar(modelo, ruta + '.tmp', predios, NULOS, HUERFANOS, INVALIDAS, SEMILLA)
+            os.replace(ruta + '.tmp', ruta)
+        datos[modelo] = ruta
+    return datos
+
+
+def medir(nombre, datos, directorio, repeticiones=REPETICIONES):
+    """(segundos de la repetición más rápida, entidades) de una operación."""
+    tiempos = []
+    entidades = None
+    for _ in range(repeticiones):
+        funcion, entidades, limpiar = OPERACIONES[nombre](datos, directorio)
+        try:
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        finally:
+            if limpiar is not None:
+                limpiar()
+    return min(tiempos), entidades
+
+
+def leer_umbrales(ruta=UMBRALES):
+    if not os.path.isfile(ruta):
+        return None
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def evaluar(resultados, umbrales, calibracion, tolerancia=None):
+    """Marca cada resultado como 'ok', 'regresion' o 'sin umbral' según `umbrales`."""
+    operaciones = (umbrales or {}).get('operaciones', {})
+    mismos_datos = umbrales is not None and umbrales.get('predios') == resultados['predios']
+    for nombre, resultado in resultados['operaciones'].items():
+        umbral = operaciones.get(nombre)
+        if not mismos_datos or umbral is None or umbral.get('motor') != resultado['motor']:
+            resultado['estado'] = 'sin umbral'
+            continue
+        tolerado = tolerancia if tolerancia is not None else umbral.get('tolerancia', TOLERANCIA)
+        limite = umbral['relativo'] * (1 + tolerado)
+        resultado['umbral'] = umbral['relativo']
+        resultado['limite'] = round(limite, 4)
+        exceso = (resultado['relativo'] - limite) * calibracion
+        resultado['estado'] = 'regresion' if exceso > MINIMO_SEGUNDOS else 'ok'
+    return [nombre for nombre, resultado in resultados['operaciones'].items() if resultado['estado'] == 'regresion']
+
+
+def umbrales_de(resultados, tolerancia=TOLERANCIA):
+    return {
+        'predios': resultados['predios'],
+        'calibracion_segundos': resultados['calibracion_segundos'],
+        'operaciones': {nombre: {'relativo': resultado['relativo'], 'motor': resultado['motor'],
+                                 'tolerancia': tolerancia}
+                        for nombre, resultado in resultados['operaciones'].items()},
+    }
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog='etl_operadores',
+        description='Mide cada operación del ETL por separado y la compara con los umbrales guardados.'
+    )
+    parser.add_argument('operaciones', nargs='*', metavar='OPERACION',
+                        help=f"Operaciones que se miden (por defecto todas: {', '.join(OPERACIONES)})")
+    parser.add_argument('-d', '--directorio', help='Directorio para los datos generados (se conserva entre ejecuciones)')
+    parser.add_argument('-n', '--predios', type=int, default=None,
+                        help=f'Predios de los datos (por defecto los de los umbrales o {PREDIOS})')
+    parser.add_argument('-r', '--repeticiones', type=int, default=REPETICIONES, help='Repeticiones por operación')
+    parser.add_argument('--umbrales', default=UMBRALES, metavar='ARCHIVO', help='Archivo de umbrales')
+    parser.add_argument('--tolerancia', type=float, default=None,
+                        help='Aumento relativo tolerado (por defecto el de cada umbral)')
+    parser.add_argument('--actualizar-umbrales', action='store_true',
+                        help='Guardar los tiempos medidos como nuevos umbrales')
+    parser.add_argument('--resultado', metavar='ARCHIVO', help='Guardar los resultados en JSON')
+    return parser
+
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if args.repeticiones < 1:
+        parser.error('Las repeticiones deben ser al menos 1')
+    desconocidas = [nombre for nombre in args.operaciones if nombre not in OPERACIONES]
+    if desconocidas:
+        parser.error(f"Operaciones desconocidas: {', '.join(desconocidas)}")
+    umbrales = leer_umbrales(args.umbrales)
+    predios = args.predios or (umbrales or {}).get('predios') or PREDIOS
+    nombres = args.operaciones or list(OPERACIONES)
+
+    directorio = args.directorio or tempfile.mkdtemp(prefix='etl_operadores_')
+    os.makedirs(directorio, exist_ok=True)
+    trabajo = tempfile.mkdtemp(prefix='trabajo_', dir=directorio)
+    try:
+        datos = preparar_datos(directorio, predios)
+        calibracion = calibrar(args.repeticiones)
+        resultados = {'predios': predios, 'calibracion_segundos': round(calibracion, 4), 'operaciones': {}}
+        for nombre in nombres:
+            segundos, entidades = medir(nombre, datos, trabajo, args.repeticiones)
+            resultados['operaciones'][nombre] = {
+                'segundos': round(segundos, 4),
+                'entidades': entidades,
+                'entidades_por_segundo': round(entidades / segundos, 1) if segundos else None,
+                'relativo': round(segundos / calibracion, 4),
+                'motor': motor(nombre),
+            }
+    finally:
+        shutil.rmtree(trabajo, ignore_errors=True)
+        if not args.directorio:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    regresiones = evaluar(resultados, umbrales, calibracion, args.tolerancia)
+    print(f'Calibración: {calibracion:.3f} s; {predios} predios')
+    print(f"{'operación':<22} {'segundos':>9} {'entidades/s':>12} {'relativo':>9} {'límite':>9}  estado")
+    for nombre, r in resultados['operaciones'].items():
+        limite = f"{r['limite']:.3f}" if 'limite' in r else '-'
+        print(f"{nombre:<22} {r['segundos']:>9.3f} {r['entidades_por_segundo'] or 0:>12.0f} "
+              f"{r['relativo']:>9.3f} {limite:>9}  {r['estado']}")
+    if args.resultado:
+        with open(args.resultado, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+    if args.actualizar_umbrales:
+        nuevos = umbrales_de(resultados, args.tolerancia if args.tolerancia is not None else TOLERANCIA)
+        if umbrales and umbrales.get('predios') == predios:
+            # Se conservan los umbrales de las operaciones que no se midieron esta vez
+            nuevos['operaciones'] = dict(umbrales.get('operaciones', {}), **nuevos['operaciones'])
+        with open(args.umbrales, 'w', encoding='utf-8') as archivo:
+            json.dump(nuevos, archivo, ensure_ascii=False, indent=2)
+            archivo.write('\n')
+        print(f'Umbrales guardados en {args.umbrales}')
+        return 0
+    return 1 if regresiones else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,627 @@
+# -*- coding: utf-8 -*-
+"""
+Construcción del grafo de pasos a partir de la descripción de cada modelo.
+
+Cada modelo describe sus pasos como una lista de diccionarios:
+
+    {'nombre': 'lc_predio', 'tipo': 'unir', 'entrada': '@terreno_baunit',
+     'campo': 'baunit', 'entrada_2': 'tabla_predio', 'campo_2': 't_id',
+     'campos': None, 'salida': 'lc_predio'}
+
+'entrada' es una clave del diccionario de capas del modelo o '@paso' para usar
+la salida de otro paso. Si el paso no tiene 'salida' el resultado se escribe en
+un GeoPackage temporal.
+
+Un paso 'decodificar' es una unión (mismas claves que 'unir') con una tabla de
+dominio *tipo por su T_Id. Con Processing se ejecuta como la unión; con el motor
+directo se traduce en la misma consulta que escribe la capa (ver etl_dominios).
+"""
+import os
+import shutil
+import tempfile
+import threading
+
+from qgis.core import (QgsCoordinateReferenceSystem, QgsProcessing, QgsProcessingContext,
+                       QgsProcessingFeedback, QgsProcessingUtils)
+import processing
+
+from . import etl_cache, etl_geometria, etl_rendimiento, gpkg_sql
+from .etl_dominios import Dominios
+from .etl_grafo import GrafoETL, Paso, Salida, referencias, resolver
+from .etl_traza import tramo
+
+
+EXPRESION_T_ID = ' "T_Id" is not NULL'
+
+# Pasos cuyo resultado es un intermedio que se puede reutilizar
+TIPOS_REUTILIZABLES = ('extraer', 'unir', 'decodificar', 'calcular', 'corregir', 'reproyectar', 'cadena')
+
+# Motores de ejecución
+MOTOR_PROCESSING = 0
+MOTOR_DIRECTO = 1
+MOTORES = ['Processing de QGIS', 'SQLite directo']
+
+
+class ConstructorPasos:
+    def __init__(self, input_gpkg, output_gpkg, capas, context, motor=MOTOR_DIRECTO, cache=None, estado=None,
+                 escritor=None, medicion=None, traza=None):
+        self.input_gpkg = input_gpkg
+        self.output_gpkg = output_gpkg
+        self.capas = capas
+        self.context = context
+        self.motor = motor
+        self.cache = cache
+        self.estado = estado        # etl_estado.EstadoEjecucion: diario para reanudar
+        self.escritor = escritor    # etl_escritor.EscritorGpkg: única conexión de escritura a la salida
+        self.medicion = medicion    # etl_rendimiento.MedicionEjecucion: tiempos y volúmenes por paso
+        self.traza = traza          # etl_traza.Traza: tramos de las operaciones dentro de cada paso
+        self.dominios = Dominios(input_gpkg, traza)   # tablas *tipo, leídas una vez
+        self.reutilizados = []
+        self.firmas_salida = {}
+        self.conservadas = set()
+        self._feedbacks = set()
+        self._lock = threading.Lock()
+        self._temporal = None
+        self._huellas = {}
+
+    def layer_path(self, layer_name):
+        return f"{self.input_gpkg}|layername={layer_name}"
+
+    def output_path(self, table_name):
+        return f'ogr:dbname=\'{self.output_gpkg}\' table="{table_name}" (geom)'
+
+    def construir(self, especificaciones, anteriores=None):
+        # anteriores: {tabla: firma} del manifiesto de la salida (ejecución incremental)
+        if self.motor == MOTOR_DIRECTO:
+            especificaciones = self._planificar(especificaciones)
+        especificaciones, firmas, firma_tabla = self._firmar(especificaciones)
+        # Las firmas de las tablas de salida solo sirven para el manifiesto de una ejecución incremental
+        self.firmas_salida = {}
+        if anteriores is not None:
+            self.firmas_salida = {tabla: etl_cache.clave(self._resolver_firma(firma))
+                                  for tabla, firma in firma_tabla.items()}
+        if anteriores:
+            self.conservadas = {tabla for tabla, firma in self.firmas_salida.items()
+                                if anteriores.get(tabla) == firma}
+            especificaciones = self._podar(especificaciones, set(self.firmas_salida) - self.conservadas)
+        grafo = GrafoETL()
+        escritores = {}   # tabla de salida -> último paso que la escribió
+        lectores = {}     # tabla de salida -> pasos que la leyeron desde entonces
+        tabla_de = {}     # paso -> tabla de salida que escribe
+        modifican_entrada = []
+        for spec in especificaciones:
+            funcion, parametros = self._crear(spec)
+            if self.cache is not None and self._reutilizable(spec):
+                funcion = self._con_cache(spec['nombre'], firmas[spec['nombre']], funcion)
+            if self.estado is not None:
+                funcion = self._con_estado(spec, firmas[spec['nombre']], funcion)
+            if self.medicion is not None:
+                funcion = self._con_medicion(spec, funcion)
+            depende = set(spec.get('depende', ())) | referencias(parametros)
+            recursos = set()
+
+            # Lectura de tablas ya escritas en la salida: esperar al último escritor
+            leidas = {tabla_de[dep] for dep in depende if dep in tabla_de}
+            for tabla in leidas:
+                depende.add(escritores[tabla])
+                lectores.setdefault(tabla, set()).add(spec['nombre'])
+            if leidas:
+                recursos.add(self.output_gpkg)
+
+            if self._lee_entrada(spec):
+                depende.update(modifican_entrada)
+            if spec.get('modifica_entrada'):
+                recursos.add(self.input_gpkg)
+                modifican_entrada.append(spec['nombre'])
+
+            escritas = set()
+            if spec.get('salida'):
+                escritas.add(spec['salida'])
+            if spec.get('modifica'):
+                escritas.add(spec['modifica'])
+            if spec.get('modifica') == '*':
+                depende.update(grafo.pasos)
+            for tabla in escritas - {'*'}:
+                # Escritura sobre una tabla existente: esperar a quienes la leen
+                if tabla in escritores:
+                    depende.add(escritores[tabla])
+                    depende.update(lectores.get(tabla, ()))
+                escritores[tabla] = spec['nombre']
+                lectores[tabla] = set()
+                tabla_de[spec['nombre']] = tabla
+            if escritas:
+                recursos.add(self.output_gpkg)
+
+            depende.discard(spec['nombre'])
+            grafo.agregar(Paso(spec['nombre'], funcion, depende=depende, recursos=recursos,
+                               descripcion=spec.get('descripcion')))
+        grafo.validar()
+        return grafo
+
+    def cancelar(self):
+        with self._lock:
+            for feedback in self._feedbacks:
+                feedback.cancel()
+
+    def directorio_temporal(self):
+        # Con diario los intermedios van al directorio de trabajo para sobrevivir a un fallo
+        if self.estado is not None:
+            return self.estado.directorio
+        with self._lock:
+            if self._temporal is None:
+                self._temporal = tempfile.mkdtemp(prefix='validadores_etl_')
+            return self._temporal
+
+    def limpiar(self):
+        self.dominios.liberar()
+        if self._temporal is not None:
+            shutil.rmtree(self._temporal, ignore_errors=True)
+            self._temporal = None
+
+    def _cadena(self, spec, cadenas):
+        # (capa base, operaciones) si el paso se puede resolver como una sola consulta SQL
+        if spec['tipo'] not in ('unir', 'decodificar', 'calcular', 'extraer'):
+            return None
+        entrada = spec['entrada']
+        if entrada.startswith('@'):
+            if entrada[1:] not in cadenas:
+                return None
+            base, operaciones = cadenas[entrada[1:]]
+        else:
+            base, operaciones = entrada, []
+        if spec['tipo'] in ('unir', 'decodificar'):
+            if spec['entrada_2'].startswith('@'):
+                return None
+            op = {'tipo': spec['tipo'], 'campo': spec['campo'], 'tabla': self.capas[spec['entrada_2']],
+                  'campo_2': spec['campo_2'], 'campos': spec.get('campos')}
+        elif spec['tipo'] == 'calcular':
+            if 'expresion_sql' not in spec:
+                return None
+            op = {'tipo': 'calcular', 'campo': spec['campo'], 'expresion': spec['expresion_sql'],
+                  'tipo_sql': gpkg_sql.tipo_calculado(spec['tipo_campo'], spec.get('longitud', 0))}
+        else:
+            if spec.get('expresion', EXPRESION_T_ID) != EXPRESION_T_ID:
+                return None
+            op = {'tipo': 'filtrar', 'campo': 'T_Id'}
+        return base, operaciones + [op]
+
+    def _planificar(self, especificaciones):
+        # Funde las cadenas extraer/unir/calcular en una consulta por tabla de salida.
+        # Cada tabla se calcula en un archivo de trabajo (en paralelo) y luego se publica
+        # en la salida con una copia directa, que es la única parte que toca la salida.
+        cadenas = {}
+        for spec in especificaciones:
+            if self._es_copia_directa(spec):
+                continue
+            cadena = self._cadena(spec, cadenas)
+            if cadena is not None:
+                cadenas[spec['nombre']] = cadena
+        usados_fuera = set()
+        for spec in especificaciones:
+            if spec['nombre'] in cadenas:
+                continue
+            for clave in ('entrada', 'entrada_2'):
+                valor = spec.get(clave) or ''
+                if valor.startswith('@'):
+                    usados_fuera.add(valor[1:])
+
+        plan = []
+        for spec in especificaciones:
+            nombre = spec['nombre']
+            if nombre not in cadenas:
+                plan.append(spec)
+                continue
+            base, operaciones = cadenas[nombre]
+            if spec.get('salida'):
+                plan.append({'nombre': f'{nombre}_sql', 'tipo': 'cadena', 'entrada': base,
+                             'operaciones': operaciones, 'tabla': spec['salida'],
+                             'descripcion': spec.get('descripcion', nombre)})
+                plan.append({'nombre': nombre, 'tipo': 'publicar', 'entrada': f'@{nombre}_sql',
+                             'salida': spec['salida'], 'descripcion': f"escritura de {spec['salida']}"})
+            elif nombre in usados_fuera:
+                plan.append({'nombre': nombre, 'tipo': 'cadena', 'entrada': base,
+                             'operaciones': operaciones, 'tabla': nombre})
+        if self.escritor is not None:
+            plan = self._fundir_ajustes(plan)
+        return plan
+
+    def _fundir_ajustes(self, plan):
+        # Un par corregir -> reproyectar que reescribe una tabla recién escrita se aplica
+        # en la escritura original de la tabla: se evita leerla y escribirla otra vez.
+        por_nombre = {spec['nombre']: spec for spec in plan}
+        lecturas = {}
+        for spec in plan:
+            for clave in ('entrada', 'entrada_2'):
+                valor = spec.get(clave) or ''
+                if valor.startswith('@'):
+                    lecturas[valor[1:]] = lecturas.get(valor[1:], 0) + 1
+        ajustes = {}    # paso que escribe la tabla -> crs de destino
+        alias = {}      # paso eliminado -> paso que lo sustituye
+        for spec in plan:
+            if spec['tipo'] != 'reproyectar' or not spec.get('salida') or not spec['entrada'].startswith('@'):
+                continue
+            corregir = por_nombre.get(spec['entrada'][1:])
+            if (corregir is None or corregir['tipo'] != 'corregir' or lecturas.get(corregir['nombre']) != 1
+                    or not corregir['entrada'].startswith('@')):
+                continue
+            escritura = por_nombre.get(corregir['entrada'][1:])
+            if (escritura is None or escritura.get('salida') != spec['salida'] or escritura['nombre'] in ajustes
+                    or lecturas.get(escritura['nombre']) != 1 or escritura['tipo'] in ('corregir', 'reproyectar')):
+                continue
+            ajustes[escritura['nombre']] = spec['crs']
+            alias[corregir['nombre']] = alias[spec['nombre']] = escritura['nombre']
+        if not ajustes:
+            return plan
+
+        fundido = []
+        for spec in plan:
+            if spec['nombre'] in alias:
+                continue
+            spec = dict(spec)
+            if spec['nombre'] in ajustes:
+                spec['ajustar'] = {'crs': ajustes[spec['nombre']]}
+            for clave in ('entrada', 'entrada_2'):
+                valor = spec.get(clave) or ''
+                if valor.startswith('@') and valor[1:] in alias:
+                    spec[clave] = f'@{alias[valor[1:]]}'
+            if spec.get('depende'):
+                spec['depende'] = [alias.get(dep, dep) for dep in spec['depende']]
+            fundido.append(spec)
+        return fundido
+
+    def _reutilizable(self, spec):
+        return (spec['tipo'] in TIPOS_REUTILIZABLES and not spec.get('salida')
+                and not spec.get('modifica') and not spec.get('modifica_entrada'))
+
+    def _firmar(self, especificaciones):
+        # Firma de cada paso: sus parámetros con las capas de entrada como {'tabla': ...}
+        # y las referencias a otros pasos sustituidas por la firma de lo que producen.
+        # Dos intermedios con la misma firma se calculan una sola vez.
+        firmas = {}
+        firma_tabla = {}   # tabla de salida -> firma de su contenido actual
+        salida_de = {}
+        alias = {}
+        plan = []
+        for spec in especificaciones:
+            spec = dict(spec)
+            for clave in ('entrada', 'entrada_2'):
+                valor = spec.get(clave)
+                if valor and valor.startswith('@') and valor[1:] in alias:
+                    spec[clave] = '@' + alias[valor[1:]]
+            if spec.get('depende'):
+                spec['depende'] = [alias.get(dep, dep) for dep in spec['depende']]
+
+            firma = {k: v for k, v in spec.items() if k not in ('nombre', 'descripcion', 'salida', 'depende')}
+            for clave in ('entrada', 'entrada_2'):
+                valor = firma.get(clave)
+                if not valor:
+                    continue
+                if valor.startswith('@'):
+                    ref = valor[1:]
+                    firma[clave] = firma_tabla[salida_de[ref]] if ref in salida_de else firmas[ref]
+                else:
+                    firma[clave] = {'tabla': self.capas[valor]}
+            for clave in ('campo', 'campo_2'):
+                # QGIS busca los campos sin distinguir mayúsculas
+                if isinstance(firma.get(clave), str):
+                    firma[clave] = firma[clave].lower()
+            if 'operaciones' in firma:
+                firma['operaciones'] = [dict(op, tabla={'tabla': op['tabla']}) if 'tabla' in op else op
+                                        for op in firma['operaciones']]
+
+            if self._reutilizable(spec):
+                repetido = next((nombre for nombre, otra in firmas.items()
+                                 if otra == firma and nombre not in salida_de), None)
+                if repetido is not None:
+                    alias[spec['nombre']] = repetido
+                    continue
+            firmas[spec['nombre']] = firma
+            if spec.get('salida'):
+                salida_de[spec['nombre']] = spec['salida']
+                firma_tabla[spec['salida']] = firma
+            modifica = spec.get('modifica')
+            if modifica == '*':
+                for tabla in firma_tabla:
+                    firma_tabla[tabla] = [firma_tabla[tabla], firma]
+            elif modifica:
+                firma_tabla[modifica] = [firma_tabla.get(modifica), firma]
+            plan.append(spec)
+        return plan, firmas, firma_tabla
+
+    def _podar(self, especificaciones, reconstruir):
+        # Pasos necesarios para reconstruir las tablas indicadas. Si uno de ellos lee
+        # una tabla de salida que se iba a conservar, esa tabla también se reconstruye
+        # completa (sus pasos posteriores la modifican en el mismo archivo).
+        if not reconstruir:
+            self.conservadas = set(self.firmas_salida)
+            return []
+        por_nombre = {spec['nombre']: spec for spec in especificaciones}
+        while True:
+            necesarios = set()
+            for spec in reversed(especificaciones):
+                escritas = {spec.get('salida'), spec.get('modifica')} - {None}
+                if spec['nombre'] in necesarios or escritas & reconstruir or '*' in escritas:
+                    necesarios.add(spec['nombre'])
+                    for clave in ('entrada', 'entrada_2'):
+                        valor = spec.get(clave) or ''
+                        if valor.startswith('@'):
+                            necesarios.add(valor[1:])
+                    necesarios.update(spec.get('depende', ()))
+            nuevas = {por_nombre[nombre]['salida'] for nombre in necesarios
+                      if por_nombre[nombre].get('salida')} - reconstruir
+            if not nuevas:
+                break
+            reconstruir |= nuevas
+        self.conservadas = set(self.firmas_salida) - reconstruir
+        return [spec for spec in especificaciones
+                if spec['nombre'] in necesarios or spec.get('modifica_entrada')]
+
+    def _huella(self, tabla, contenido):
+        with self._lock:
+            if (tabla, contenido) not in self._huellas:
+                self._huellas[tabla, contenido] = (threading.Lock(), {})
+            lock, valor = self._huellas[tabla, contenido]
+        with lock:
+            if not valor:
+                valor.update(etl_cache.huella_tabla(self.input_gpkg, tabla, contenido))
+        return valor
+
+    def _resolver_firma(self, firma, contenido=True):
+        # Sin `contenido` la huella es solo de metadatos (diario para reanudar, en todas las ejecuciones)
+        if isinstance(firma, dict):
+            if set(firma) == {'tabla'}:
+                return {'tabla': firma['tabla'].lower(), 'huella': self._huella(firma['tabla'], contenido)}
+            return {k: self._resolver_firma(v, contenido) for k, v in firma.items()}
+        if isinstance(firma, (list, tuple)):
+            return [self._resolver_firma(v, contenido) for v in firma]
+        return firma
+
+    def _con_cache(self, nombre, firma, funcion):
+        def ejecutar(entradas):
+            clave = etl_cache.clave(self._resolver_firma(firma))
+            resultado = self.cache.obtener(clave)
+            if resultado is not None:
+                with self._lock:
+                    self.reutilizados.append(nombre)
+                return resultado
+            return self.cache.guardar(clave, funcion(entradas))
+        return ejecutar
+
+    def _con_estado(self, spec, firma, funcion):
+        # Sin `contenido` la huella de las entradas es solo de metadatos
+        return self.estado.envolver(spec['nombre'],
+                                    lambda: etl_cache.clave(self._resolver_firma(firma, contenido=False)),
+                                    funcion, lambda resultado: self._capas_escritas(spec, resultado))
+
+    def _con_medicion(self, spec, funcion):
+        escribe_salida = bool(spec.get('salida') or spec.get('modifica'))
+
+        def ejecutar(entradas):
+            with self.medicion.medir(spec['nombre'], spec['tipo'], spec.get('descripcion'),
+                                     escribe_salida, depende=list(entradas)) as registro:
+                resultado = funcion(entradas)
+            # Los conteos quedan fuera del tiempo medido
+            if self.estado is not None and spec['nombre'] in self.estado.recuperados:
+                registro['origen'] = 'reanudado'
+            elif spec['nombre'] in self.reutilizados:
+                registro['origen'] = 'cache'
+            registro['entidades_entrada'] = self._sumar_entidades(self._capas_leidas(spec, entradas))
+            escritas = self._capas_escritas(spec, resultado)
+            intermedio = escritas[0] if escritas and escritas[0][0] != self.output_gpkg else None
+            registro['entidades_salida'] = self._sumar_entidades(escritas)
+            if intermedio and registro['origen'] == 'calculado' and os.path.isfile(intermedio[0]):
+                registro['bytes_escritos'] = os.path.getsize(intermedio[0])
+            return resultado
+        return ejecutar
+
+    def _capas_escritas(self, spec, resultado):
+        # (ruta, tabla) que escribe un paso: sus tablas de la salida o, si no tiene, su intermedio
+        escritas = [(self.output_gpkg, tabla) for tabla in (spec.get('salida'), spec.get('modifica'))
+                    if tabla and tabla != '*']
+        if not escritas:
+            intermedio = etl_rendimiento.capa((resultado or {}).get('OUTPUT'))
+            escritas = [intermedio] if intermedio else []
+        return escritas
+
+    def _capas_leidas(self, spec, entradas):
+        # (ruta, tabla) de las capas que lee un paso: de la entrada, de la salida o intermedios
+        capas = []
+        for clave in ('entrada', 'entrada_2'):
+            valor = spec.get(clave)
+            if not valor:
+                continue
+            if not valor.startswith('@'):
+                capas.append((self.input_gpkg, self.capas[valor]))
+                continue
+            capa = etl_rendimiento.capa((entradas.get(valor[1:]) or {}).get('OUTPUT'))
+            if capa:
+                capas.append(capa)
+        capas += [(self.input_gpkg, op['tabla']) for op in spec.get('operaciones', ()) if 'tabla' in op]
+        return capas
+
+    def _sumar_entidades(self, capas):
+        if not capas:
+            return None
+        total = 0
+        for ruta, tabla in capas:
+            entidades = self.medicion.entidades(ruta, tabla, fija=ruta != self.output_gpkg)
+            if entidades is None:
+                return None
+            total += entidades
+        return total
+
+    def _lee_entrada(self, spec):
+        for clave in ('entrada', 'entrada_2'):
+            valor = spec.get(clave)
+            if valor and not valor.startswith('@'):
+                return True
+        return False
+
+    def _entrada(self, valor):
+        if valor.startswith('@'):
+            return Salida(valor[1:])
+        return self.layer_path(self.capas[valor])
+
+    def _destino(self, spec):
+        if spec.get('salida') and self.escritor is None:
+            return self.output_path(spec['salida'])
+        if spec.get('salida'):
+            # Se escribe aparte y se copia a la salida por la conexión del escritor
+            return os.path.join(self.directorio_temporal(), f"{spec['nombre']}.gpkg")
+        # Los intermedios van a archivo para poder compartirlos entre hilos
+        if self.estado is not None:
+            return os.path.join(self.estado.directorio, f"{spec['nombre']}.gpkg")
+        return QgsProcessingUtils.generateTempFilename(f"{spec['nombre']}.gpkg")
+
+    def _crear(self, spec):
+        tipo = spec['tipo']
+        if self._es_copia_directa(spec):
+            return self._paso_copia(spec), {}
+        if tipo == 'cadena':
+            return self._paso_cadena(spec), {}
+        if tipo == 'publicar':
+            origen = Salida(spec['entrada'][1:])
+            return self._paso_publicar(spec, origen), {'INPUT': origen}
+        if tipo == 'extraer':
+            algoritmo = 'native:extractbyexpression'
+            parametros = {
+                'EXPRESSION': spec.get('expresion', EXPRESION_T_ID),
+                'INPUT': self._entrada(spec['entrada']),
+                'OUTPUT': self._destino(spec),
+            }
+        elif tipo in ('unir', 'decodificar'):
+            algoritmo = 'native:joinattributestable'
+            parametros = {
+                'DISCARD_NONMATCHING': False,
+                'FIELD': spec['campo'],
+                'FIELDS_TO_COPY': spec.get('campos') or [''],
+                'FIELD_2': spec['campo_2'],
+                'INPUT': self._entrada(spec['entrada']),
+                'INPUT_2': self._entrada(spec['entrada_2']),
+                'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
+                'PREFIX': '',
+                'OUTPUT': self._destino(spec),
+            }
+        elif tipo == 'calcular':
+            algoritmo = 'native:fieldcalculator'
+            parametros = {
+                'FIELD_NAME': spec['campo'],
+                'FIELD_TYPE': spec['tipo_campo'],
+                'FIELD_LENGTH': spec.get('longitud', 0),
+                'FIELD_PRECISION': 0,
+                'NEW_FIELD': True,
+                'FORMULA': spec['formula'],
+                'INPUT': self._entrada(spec['entrada']),
+                'OUTPUT': self._destino(spec),
+            }
+        elif tipo == 'indice':
+            algoritmo = 'native:createspatialindex'
+            parametros = {'INPUT': self._entrada(spec['entrada'])}
+        elif tipo == 'sql' and self.escritor is not None:
+            return self._paso_sql(spec), {}
+        elif tipo == 'sql':
+            algoritmo = 'native:spatialiteexecutesql'
+            parametros = {'DATABASE': self.output_gpkg, 'SQL': spec['sql']}
+        elif tipo == 'corregir':
+            algoritmo = 'native:fixgeometries'
+            parametros = {'INPUT': self._entrada(spec['entrada']), 'OUTPUT': self._destino(spec)}
+        elif tipo == 'reproyectar':
+            algoritmo = 'native:reprojectlayer'
+            parametros = {
+                'INPUT': self._entrada(spec['entrada']),
+                'TARGET_CRS': QgsCoordinateReferenceSystem(spec['crs']),
+                'OUTPUT': self._destino(spec),
+            }
+        else:
+            raise ValueError(f"Tipo de paso desconocido: {tipo}")
+
+        if spec.get('crs') and tipo in ('extraer', 'unir', 'decodificar'):
+            parametros['TARGET_CRS'] = QgsCoordinateReferenceSystem(spec['crs'])
+
+        funcion = self._paso_processing(algoritmo, parametros)
+        if spec.get('salida') and self.escritor is not None:
+            funcion = self._importar(spec, funcion)
+        return funcion, parametros
+
+    def _es_copia_directa(self, spec):
+        # Extracción de una capa de entrada a una tabla de salida con el filtro de T_Id.
+        # TARGET_CRS no forma parte de extractbyexpression, así que no cambia el resultado.
+        return (self.motor == MOTOR_DIRECTO and spec['tipo'] == 'extraer' and spec.get('salida')
+                and not spec['entrada'].startswith('@')
+                and spec.get('expresion', EXPRESION_T_ID) == EXPRESION_T_ID)
+
+    def _paso_copia(self, spec):
+        tabla = self.capas[spec['entrada']]
+
+        def ejecutar(entradas):
+            if self.escritor is not None:
+                return self._escribir(spec, self.input_gpkg, tabla)
+            gpkg_sql.copiar_tabla(self.input_gpkg, self.output_gpkg, tabla, spec['salida'])
+            return {'OUTPUT': f"{self.output_gpkg}|layername={spec['salida']}"}
+        return ejecutar
+
+    def _paso_cadena(self, spec):
+        tabla = self.capas[spec['entrada']]
+
+        def ejecutar(entradas):
+            ruta = os.path.join(self.directorio_temporal(), f"{spec['nombre']}.gpkg")
+            with tramo(self.traza, 'unir', 'unir', tabla=spec['tabla']):
+                gpkg_sql.unir_cadena(self.input_gpkg, ruta, tabla, spec['operaciones'], spec['tabla'], indice=False,
+                                     dominios=self.dominios)
+            return {'OUTPUT': f"{ruta}|layername={spec['tabla']}", 'RUTA': ruta, 'TABLA': spec['tabla']}
+        return ejecutar
+
+    def _paso_publicar(self, spec, origen):
+        def ejecutar(entradas):
+            calculado = entradas[origen.paso]
+            if self.escritor is not None:
+                return self._escribir(spec, calculado['RUTA'], calculado['TABLA'], no_nula=None)
+            gpkg_sql.copiar_tabla(calculado['RUTA'], self.output_gpkg, calculado['TABLA'], spec['salida'],
+                                  no_nula=None)
+            return {'OUTPUT': f"{self.output_gpkg}|layername={spec['salida']}"}
+        return ejecutar
+
+    def _paso_sql(self, spec):
+        def ejecutar(entradas):
+            self.escritor.ejecutar_sql(spec['sql'])
+            return {}
+        return ejecutar
+
+    def _importar(self, spec, funcion):
+        # Copia a la salida la capa que Processing escribió en un GeoPackage aparte
+        def ejecutar(entradas):
+            resultado = funcion(entradas)
+            ruta, _, capa = str(resultado['OUTPUT']).partition('|layername=')
+            capa = capa or os.path.splitext(os.path.basename(ruta))[0]
+            return self._escribir(spec, ruta, capa, no_nula=None)
+        return ejecutar
+
+    def _escribir(self, spec, ruta, tabla, no_nula='T_Id'):
+        # Copia a la salida; con 'ajustar' las geometrías se corrigen y reproyectan en la misma copia
+        resultado = {'OUTPUT': f"{self.output_gpkg}|layername={spec['salida']}"}
+        ajuste = spec.get('ajustar')
+        if ajuste is None:
+            self.escritor.copiar(ruta, tabla, spec['salida'], no_nula=no_nula)
+            return resultado
+        contexto = self.context.transformContext() if self.context is not None else None
+        transformar, srs = etl_geometria.ajuste_capa(ruta, tabla, ajuste['crs'], contexto, self.traza)
+        self.escritor.copiar_transformada(ruta, tabla, spec['salida'], transformar, srs, no_nula)
+        resultado['GEOMETRIAS'] = transformar.resumen()
+        return resultado
+
+    def _paso_processing(self, algoritmo, parametros):
+        def ejecutar(entradas):
+            # Contexto y feedback propios: no son seguros para compartir entre hilos
+            context = QgsProcessingContext()
+            context.copyThreadSafeSettings(self.context)
+            feedback = QgsProcessingFeedback()
+            with self._lock:
+                self._feedbacks.add(feedback)
+            try:
+                with tramo(self.traza, algoritmo, 'processing'):
+                    return processing.run(algoritmo, resolver(parametros, entradas), context=context,
+                                          feedback=feedback, is_child_algorithm=True)
+            finally:
+                with self._lock:
+                    self._feedbacks.discard(feedback)
+        return ejecutar
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Perfil por muestreo de una ejecución.
+
+Los pasos corren en los hilos del pool y cProfile solo mide el hilo donde se
+activa (y desde Python 3.12 no admite dos perfiles activos a la vez), así que
+el perfil se toma por muestreo: un hilo aparte lee cada INTERVALO segundos la
+pila de los hilos que están ejecutando un paso (sys._current_frames) y la
+anota bajo el nombre de ese paso. Los hilos ociosos no se muestrean.
+
+Se guardan dos archivos junto a la salida:
+
+- <salida>_perfil.pstats: se abre con pstats, snakeviz o tuna. Cada paso es
+  una función raíz "<paso>"; las llamadas son número de muestras y los
+  tiempos, muestras por intervalo.
+- <salida>_perfil.folded: pilas colapsadas ("paso;función;función N"), para
+  flamegraph.pl, speedscope o inferno.
+
+Este módulo no depende de QGIS.
+"""
+import contextlib
+import marshal
+import os
+import sys
+import threading
+from collections import Counter
+
+
+INTERVALO = 0.005
+
+
+def rutas_perfil(output_gpkg):
+    base = os.path.splitext(output_gpkg)[0]
+    return f'{base}_perfil.pstats', f'{base}_perfil.folded'
+
+
+def _funcion(codigo):
+    # Clave de función como la usa pstats: (archivo, primera línea, nombre)
+    return codigo.co_filename, codigo.co_firstlineno, codigo.co_name
+
+
+def _etiqueta(funcion):
+    archivo, linea, nombre = funcion
+    if not linea:
+        return nombre
+    return f'{nombre} ({os.path.basename(archivo)}:{linea})'
+
+
+class PerfilMuestreo:
+    def __init__(self, intervalo=INTERVALO):
+        self.intervalo = intervalo
+        self.muestras = Counter()   # (paso, funciones de la raíz a la hoja) -> muestras
+        self._pasos = {}            # identificador del hilo -> [pasos en curso]
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._muestrear, name='etl-perfil', daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    @contextlib.contextmanager
+    def paso(self, nombre):
+        """Atribuye a `nombre` las muestras del hilo actual mientras dura el bloque."""
+        identificador = threading.get_ident()
+        with self._lock:
+            self._pasos.setdefault(identificador, []).append(nombre)
+        try:
+            yield
+        finally:
+            with self._lock:
+                en_curso = self._pasos[identificador]
+                en_curso.pop()
+                if not en_curso:
+                    del self._pasos[identificador]
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            with self._lock:
+                activos = {identificador: pasos[-1] for identificador, pasos in self._pasos.items()}
+            if not activos:
+                continue
+            marcos = sys._current_frames()
+            for identificador, paso in activos.items():
+                marco = marcos.get(identificador)
+                pila = []
+                while marco is not None:
+                    pila.append(_funcion(marco.f_code))
+                    marco = marco.f_back
+                pila.reverse()
+                self.muestras[(paso, tuple(pila))] += 1
+            del marcos
+
+    def por_paso(self):
+        """Segundos muestreados de cada paso."""
+        totales = Counter()
+        for (paso, _), cantidad in self.muestras.items():
+            totales[paso] += cantidad * self.intervalo
+        return dict(totales)
+
+    def estadisticas(self):
+        """Diccionario en el formato que pstats.Stats carga de un archivo."""
+        stats = {}
+        for (paso, pila), cantidad in self.muestras.items():
+            pila = ((f'<{paso}>', 0, f'<{paso}>'),) + pila
+            segundos = cantidad * self.intervalo
+            vistas = set()
+            for i, funcion in enumerate(pila):
+                cc, nc, tt, ct, llamadores = stats.setdefault(funcion, [0, 0, 0.0, 0.0, {}])
+                propio = segundos if i == len(pila) - 1 else 0.0
+                # Con recursión, el tiempo acumulado se cuenta una vez por muestra
+                acumulado = segundos if funcion not in vistas else 0.0
+                stats[funcion][:4] = [cc + cantidad, nc + cantidad, tt + propio, ct + acumulado]
+                if i:
+                    anterior = llamadores.get(pila[i - 1], (0, 0, 0.0, 0.0))
+                    llamadores[pila[i - 1]] = (anterior[0] + cantidad, anterior[1] + cantidad,
+                                               anterior[2] + propio, anterior[3] + acumulado)
+                vistas.add(funcion)
+        return {funcion: (cc, nc, tt, ct, llamadores) for funcion, (cc, nc, tt, ct, llamadores) in stats.items()}
+
+    def mas_costosas(self, cuantas=5):
+        """(etiqueta, segundos propios) de las funciones con más tiempo propio."""
+        propios = Counter()
+        for (_, pila), cantidad in self.muestras.items():
+            if pila:
+                propios[pila[-1]] += cantidad * self.intervalo
+        return [(_etiqueta(funcion), segundos) for funcion, segundos in propios.most_common(cuantas)]
+
+    def guardar(self, output_gpkg):
+        """Escribe el .pstats y el .folded junto a la salida; devuelve sus rutas."""
+        ruta_pstats, ruta_folded = rutas_perfil(output_gpkg)
+        with open(ruta_pstats, 'wb') as archivo:
+            marshal.dump(self.estadisticas(), archivo)
+        colapsadas = Counter()
+        for (paso, pila), cantidad in self.muestras.items():
+            marcos = [paso] + [_etiqueta(funcion) for funcion in pila]
+            colapsadas[';'.join(marco.replace(';', ',') for marco in marcos)] += cantidad
+        with open(ruta_folded, 'w', encoding='utf-8') as archivo:
+            for pila, cantidad in sorted(colapsadas.items()):
+                archivo.write(f'{pila} {cantidad}\n')
+        return ruta_pstats, ruta_folded
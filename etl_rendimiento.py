@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Informe de rendimiento de una ejecución.
+
+Por cada paso se mide el tiempo de reloj, el tiempo de CPU del hilo que lo
+ejecuta, las entidades de sus capas de entrada y de salida, los bytes que
+escribió y cuánto subió la memoria residente mientras corría. La memoria se
+muestrea desde un hilo aparte; con pasos en paralelo el pico es el del
+proceso completo, no solo el del paso.
+
+El informe se guarda en JSON junto a la salida (<salida>_rendimiento.json) y
+se agrega a la tabla etl_run_stats del GeoPackage de salida, una fila por
+paso y ejecución, para comparar ejecuciones entre versiones del plugin y
+entre municipios. Como etl_manifiesto, la tabla no se registra en
+gpkg_contents.
+
+Este módulo no depende de QGIS.
+"""
+import configparser
+import contextlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from . import gpkg_sql
+from .etl_workers import memoria_mb
+
+
+TABLA = 'etl_run_stats'
+INTERVALO = 0.05    # segundos entre muestras de memoria
+
+
+def version_plugin():
+    metadatos = configparser.ConfigParser()
+    metadatos.read(os.path.join(os.path.dirname(__file__), 'metadata.txt'), encoding='utf-8')
+    return metadatos.get('general', 'version', fallback='')
+
+
+def ruta_informe(output_gpkg):
+    return f'{os.path.splitext(output_gpkg)[0]}_rendimiento.json'
+
+
+def capa(valor):
+    # (ruta, tabla) de un valor 'ruta|layername=tabla'; None si no es una capa de GeoPackage
+    if not isinstance(valor, str):
+        return None
+    ruta, _, tabla = valor.partition('|layername=')
+    if not ruta.lower().endswith('.gpkg'):
+        return None
+    return ruta, tabla or os.path.splitext(os.path.basename(ruta))[0]
+
+
+def contar(ruta, tabla):
+    if not os.path.isfile(ruta):
+        return None
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        if not gpkg_sql.existe_tabla(conn, tabla):
+            return None
+        tabla = gpkg_sql.nombre_real(conn, tabla)
+        return conn.execute(f'SELECT count(*) FROM {gpkg_sql.identificador(tabla)}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def bytes_usados(ruta):
+    # Tamaño de las páginas en uso (con WAL el archivo no crece hasta el checkpoint)
+    if not os.path.isfile(ruta):
+        return 0
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        paginas = conn.execute('PRAGMA page_count').fetchone()[0]
+        libres = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return (paginas - libres) * conn.execute('PRAGMA page_size').fetchone()[0]
+    finally:
+        conn.close()
+
+
+class MedicionEjecucion:
+    def __init__(self, modelo, input_gpkg, output_gpkg, hilos=None, motor=None, traza=None, perfil=None):
+        self.modelo = modelo
+        self.input_gpkg = input_gpkg
+        self.output_gpkg = output_gpkg
+        self.hilos = hilos
+        self.motor = motor
+        self.traza = traza          # etl_traza.Traza: cada paso medido también queda en la traza
+        self.perfil = perfil        # etl_perfil.PerfilMuestreo: las muestras se atribuyen al paso medido
+        self.ejecucion = uuid.uuid4().hex
+        self.pasos = []
+        self.memoria_inicial = None
+        self.memoria_pico = None
+        self._lock = threading.Lock()
+        self._conteos = {}      # (ruta, tabla) -> entidades de capas que no cambian durante la ejecución
+        self._activos = {}      # id de la medición -> [memoria pico]
+        self._detener = threading.Event()
+        self._muestreo = None
+        self._inicio = None
+        self._fecha = None
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+        self._fecha = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        self.memoria_inicial = self.memoria_pico = memoria_mb() or None
+        if self.memoria_inicial is not None:
+            self._muestreo = threading.Thread(target=self._muestrear, name='etl-memoria', daemon=True)
+            self._muestreo.start()
+
+    def _muestrear(self):
+        while not self._detener.wait(INTERVALO):
+            self._anotar_memoria()
+
+    def _anotar_memoria(self):
+        actual = memoria_mb()
+        with self._lock:
+            self.memoria_pico = max(self.memoria_pico or 0, actual)
+            for pico in self._activos.values():
+                pico[0] = max(pico[0], actual)
+        return actual
+
+    def entidades(self, ruta, tabla, fija=True):
+        """Entidades de una capa; las capas `fija` (entrada, intermedios) se cuentan una vez."""
+        if not fija:
+            return contar(ruta, tabla)
+        clave = (ruta, tabla.lower())
+        if clave not in self._conteos:
+            self._conteos[clave] = contar(ruta, tabla)
+        return self._conteos[clave]
+
+    @contextlib.contextmanager
+    def medir(self, paso, tipo=None, descripcion=None, escribe_salida=False, depende=()):
+        """
+        Mide el bloque como un paso. Quien mide completa en el registro que recibe
+        'entidades_entrada', 'entidades_salida', 'bytes_escritos' y 'origen'.
+        """
+        registro = {'paso': paso, 'tipo': tipo, 'descripcion': descripcion or paso,
+                    'hilo': threading.current_thread().name, 'origen': 'calculado',
+                    'entidades_entrada': None, 'entidades_salida': None, 'bytes_escritos': None}
+        # Los pasos que escriben en la salida no corren a la vez (comparten el recurso)
+        salida_antes = bytes_usados(self.output_gpkg) if escribe_salida else None
+        memoria = [0]
+        inicio_memoria = self._anotar_memoria() if self.memoria_inicial is not None else None
+        with self._lock:
+            self._activos[id(registro)] = memoria
+        seguimiento = contextlib.ExitStack()
+        if self.traza is not None:
+            seguimiento.enter_context(self.traza.paso(paso, tipo, depende, descripcion=registro['descripcion']))
+        if self.perfil is not None:
+            seguimiento.enter_context(self.perfil.paso(paso))
+        inicio = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            with seguimiento:
+                yield registro
+        except BaseException:
+            registro['origen'] = 'error'
+            raise
+        finally:
+            registro['segundos'] = round(time.perf_counter() - inicio, 4)
+            registro['cpu_segundos'] = round(time.thread_time() - cpu, 4)
+            registro['inicio'] = round(inicio - self._inicio, 4) if self._inicio is not None else 0
+            if inicio_memoria is not None:
+                self._anotar_memoria()
+                registro['memoria_pico_mb'] = round(max(memoria[0] - inicio_memoria, 0), 1)
+            else:
+                registro['memoria_pico_mb'] = None
+            with self._lock:
+                del self._activos[id(registro)]
+            if salida_antes is not None:
+                escritos = max(bytes_usados(self.output_gpkg) - salida_antes, 0)
+                registro['bytes_escritos'] = (registro['bytes_escritos'] or 0) + escritos
+            with self._lock:
+                self.pasos.append(registro)
+
+    def resumen(self, estado):
+        pasos = sorted(self.pasos, key=lambda registro: registro['inicio'])
+        return {
+            'ejecucion': self.ejecucion,
+            'fecha': self._fecha,
+            'modelo': self.modelo,
+            'version': version_plugin(),
+            'entrada': self.input_gpkg,
+            'salida': self.output_gpkg,
+            'hilos': self.hilos,
+            'motor': self.motor,
+            'estado': estado,
+            'segundos': round(time.perf_counter() - self._inicio, 4) if self._inicio is not None else 0,
+            'cpu_segundos': round(sum(registro['cpu_segundos'] for registro in pasos), 4),
+            'bytes_escritos': sum(registro['bytes_escritos'] or 0 for registro in pasos),
+            'memoria_inicial_mb': round(self.memoria_inicial, 1) if self.memoria_inicial else None,
+            'memoria_pico_mb': round(self.memoria_pico, 1) if self.memoria_pico else None,
+            'pasos': pasos,
+        }
+
+    def terminar(self, estado='ok'):
+        """Detiene el muestreo y guarda el informe; devuelve el resumen."""
+        self._detener.set()
+        if self._muestreo is not None:
+            self._muestreo.join()
+        resumen = self.resumen(estado)
+        with open(ruta_informe(self.output_gpkg), 'w', encoding='utf-8') as archivo:
+            json.dump(resumen, archivo, ensure_ascii=False, indent=2)
+        if os.path.isfile(self.output_gpkg):
+            escribir_tabla(self.output_gpkg, resumen)
+        return resumen
+
+
+def escribir_tabla(ruta, resumen):
+    filas = [(resumen['ejecucion'], resumen['fecha'], resumen['modelo'], resumen['version'],
+              os.path.basename(resumen['entrada']), resumen['estado'], registro['paso'], registro['tipo'],
+              registro['descripcion'], registro['origen'], registro['hilo'], registro['inicio'],
+              registro['segundos'], registro['cpu_segundos'], registro['entidades_entrada'],
+              registro['entidades_salida'], registro['bytes_escritos'], registro['memoria_pico_mb'])
+             for registro in resumen['pasos']]
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {TABLA} (
+            ejecucion TEXT NOT NULL, fecha TEXT, modelo TEXT, version TEXT, entrada TEXT, estado TEXT,
+            paso TEXT NOT NULL, tipo TEXT, descripcion TEXT, origen TEXT, hilo TEXT, inicio REAL,
+            segundos REAL, cpu_segundos REAL, entidades_entrada INTEGER, entidades_salida INTEGER,
+            bytes_escritos INTEGER, memoria_pico_mb REAL)''')
+        conn.executemany(f'INSERT INTO {TABLA} VALUES ({", ".join("?" * 18)})', filas)
+        conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
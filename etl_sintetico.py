@@ -0,0 +1,566 @@
+# -*- coding: utf-8 -*-
+"""
+GeoPackages de entrada sintéticos para los tres modelos de origen.
+
+    python -m Validadores.etl_sintetico ladm_1_2 prueba.gpkg --predios 100000 --invalidas 0.002
+
+Genera un municipio ficticio con el esquema de entrada de cada modelo
+(interno, ladm_1_2 o ladm_1_0): manzanas en cuadrícula partidas en terrenos
+que comparten linderos, construcciones dentro de los terrenos, una unidad de
+construcción por piso, direcciones sobre el frente de cada terreno, predios,
+derechos, las relaciones de col_uebaunit, las tablas de dominio y las capas
+de límites (manzanas, barrios, veredas, perímetro...).
+
+Se controlan las proporciones de registros sin T_Id, de llaves huérfanas
+(referencias a predios, características o terrenos que no existen) y de
+geometrías inválidas (anillos que se cruzan). Con la misma semilla el archivo
+es siempre el mismo, así que sirve como entrada reproducible para medir
+rendimiento y comparar resultados sin compartir datos catastrales reales.
+
+Los predios se generan y se escriben por lotes, con memoria constante, desde
+mil hasta varios millones. Este módulo no depende de QGIS.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import struct
+import sys
+
+from . import gpkg_sql
+
+
+LOTE = 20000
+
+# Terrenos por manzana: dos filas de FRENTES terrenos de ANCHO x FONDO metros
+FRENTES = 10
+ANCHO = 10.0
+FONDO = 25.0
+CALLE = 12.0
+
+_DEFINICIONES = {
+    9377: ('MAGNA-SIRGAS 2018 / Origen-Nacional',
+           'PROJCS["MAGNA-SIRGAS 2018 / Origen-Nacional",GEOGCS["MAGNA-SIRGAS 2018",'
+           'DATUM["Marco_Geocentrico_Nacional_de_Referencia_2018",SPHEROID["GRS 1980",6378137,298.257222101,'
+           'AUTHORITY["EPSG","7019"]],AUTHORITY["EPSG","1329"]],PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],'
+           'UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","20046"]],'
+           'PROJECTION["Transverse_Mercator"],PARAMETER["latitude_of_origin",4],PARAMETER["central_meridian",-73],'
+           'PARAMETER["scale_factor",0.9992],PARAMETER["false_easting",5000000],'
+           'PARAMETER["false_northing",2000000],UNIT["metre",1,AUTHORITY["EPSG","9001"]],'
+           'AXIS["Northing",NORTH],AXIS["Easting",EAST],AUTHORITY["EPSG","9377"]]',
+           (4880000.0, 2065000.0)),
+    3116: ('MAGNA-SIRGAS / Colombia Bogota zone',
+           'PROJCS["MAGNA-SIRGAS / Colombia Bogota zone",GEOGCS["MAGNA-SIRGAS",'
+           'DATUM["Marco_Geocentrico_Nacional_de_Referencia",SPHEROID["GRS 1980",6378137,298.257222101,'
+           'AUTHORITY["EPSG","7019"]],AUTHORITY["EPSG","6686"]],PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],'
+           'UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],AUTHORITY["EPSG","4686"]],'
+           'PROJECTION["Transverse_Mercator"],PARAMETER["latitude_of_origin",4.596200416666666],'
+           'PARAMETER["central_meridian",-74.07750791666666],PARAMETER["scale_factor",1],'
+           'PARAMETER["false_easting",1000000],PARAMETER["false_northing",1000000],'
+           'UNIT["metre",1,AUTHORITY["EPSG","9001"]],AXIS["Northing",NORTH],AXIS["Easting",EAST],'
+           'AUTHORITY["EPSG","3116"]]',
+           (1000000.0, 1000000.0)),
+}
+
+# Dominios: (T_Id, iliCode) en el orden de las tablas de ili2db
+PREDIO_TIPO = [(1, 'Predio.Privado.Privado'), (2, 'Predio.Publico.Fiscal'), (3, 'Predio.Publico.Baldio'),
+               (4, 'Predio.Publico.Uso_Publico'), (5, 'Predio.Privado.Colectivo')]
+DERECHO_TIPO = [(1, 'Dominio'), (2, 'Ocupacion'), (3, 'Posesion')]
+PLANTA_TIPO = [(1, 'Piso'), (2, 'Mezanine'), (3, 'Sotano'), (4, 'Semisotano')]
+UNIDAD_TIPO = [(1, 'Residencial'), (2, 'Comercial'), (3, 'Industrial'), (4, 'Institucional'), (5, 'Anexo')]
+USOS = ['Residencial.Vivienda_Hasta_3_Pisos', 'Comercial.Comercio', 'Residencial.Apartamentos_4_y_mas_pisos',
+        'Institucional.Educativo', 'Anexo.Enramadas_Cobertizos_Caneyes']
+
+# Bloques de T_Id por tabla, como la secuencia única de ili2db
+BLOQUE_T_ID = 10 ** 8
+_BASES = {'predio': 1, 'terreno': 2, 'construccion': 3, 'unidad': 4, 'caracteristicas': 5, 'derecho': 6,
+          'direccion': 7, 'uebaunit': 8, 'limite': 9}
+
+# Columnas: (nombre, tipo, clave del valor generado)
+_PREDIO = [('departamento', 'TEXT', 'departamento'), ('municipio', 'TEXT', 'municipio'),
+           ('numero_predial', 'TEXT', 'numero_predial'), ('numero_predial_anterior', 'TEXT', 'numero_anterior'),
+           ('matricula_inmobiliaria', 'TEXT', 'matricula'), ('avaluo_catastral', 'REAL', 'avaluo'),
+           ('tipo', 'INTEGER', 'tipo')]
+_TERRENO = [('area_terreno', 'REAL', 'area'), ('avaluo_terreno', 'REAL', 'avaluo')]
+_CONSTRUCCION = [('identificador', 'TEXT', 'identificador'), ('numero_pisos', 'INTEGER', 'numero_pisos'),
+                 ('numero_sotanos', 'INTEGER', 'numero_sotanos'), ('numero_mezanines', 'INTEGER', 'numero_mezanines'),
+                 ('numero_semisotanos', 'INTEGER', 'numero_semisotanos'),
+                 ('area_construccion', 'REAL', 'area_construccion'),
+                 ('avaluo_construccion', 'REAL', 'avaluo_construccion')]
+_UNIDAD = [('planta_ubicacion', 'INTEGER', 'planta_ubicacion'), ('area_construida', 'REAL', 'area_construida'),
+           ('avaluo_unidad_construccion', 'REAL', 'avaluo_unidad_construccion'),
+           ('area_privada_construida', 'REAL', 'area_privada_construida'), ('total_pisos', 'INTEGER', 'total_pisos')]
+_CARACTERISTICAS = [('identificador', 'TEXT', 'identificador'),
+                    ('tipo_unidad_construccion', 'INTEGER', 'tipo_unidad_construccion'),
+                    ('total_habitaciones', 'INTEGER', 'total_habitaciones'), ('total_banios', 'INTEGER', 'total_banios'),
+                    ('total_locales', 'INTEGER', 'total_locales'), ('uso', 'TEXT', 'uso'),
+                    ('anio_construccion', 'INTEGER', 'anio_construccion')]
+_DERECHO = [('tipo', 'INTEGER', 'tipo'), ('fraccion_derecho', 'REAL', 'fraccion'),
+            ('fecha_inicio_tenencia', 'TEXT', 'fecha'), ('unidad', 'INTEGER', 'predio')]
+_DIRECCION = [('tipo_direccion', 'TEXT', 'tipo_direccion'), ('es_direccion_principal', 'BOOLEAN', 'principal'),
+              ('valor_via_principal', 'TEXT', 'via'), ('numero_predio', 'TEXT', 'numero'),
+              ('complemento', 'TEXT', 'complemento')]
+_LIMITE = [('codigo', 'TEXT', 'codigo'), ('nombre', 'TEXT', 'nombre')]
+
+# Capas de límites: tipo de límite -> tabla
+_LIMITES = {
+    'manzana': 'cc_manzana', 'barrio': 'cc_barrio', 'sector_urbano': 'cc_sectorurbano',
+    'localidad': 'cc_localidadcomuna', 'perimetro': 'cc_perimetrourbano', 'municipio': 'cc_limitemunicipio',
+    'sector_rural': 'cc_sectorrural', 'vereda': 'cc_vereda', 'corregimiento': 'cc_corregimiento',
+    'centro_poblado': 'cc_centropoblado',
+}
+
+# Esquema de entrada de cada modelo. Cada tabla: (nombre, geometría o None, columnas).
+# La unidad de construcción de 1.0 trae en col_uebaunit los atributos de construcciones y
+# unidades (las capas "seleccione..." son selecciones ya unidas).
+ESQUEMAS = {
+    'ladm_1_2': {
+        'srs': 9377, 'columna_geometria': 'geometria',
+        'predio': ('lc_predio', None, _PREDIO),
+        'terreno': ('lc_terreno', 'MULTIPOLYGON', _TERRENO),
+        'construccion': ('lc_construccion', 'MULTIPOLYGON', _CONSTRUCCION),
+        'unidad': ('lc_unidadconstruccion', 'MULTIPOLYGON', _UNIDAD + [
+            ('lc_construccion', 'INTEGER', 'construccion'),
+            ('lc_caracteristicasunidadconstruccion', 'INTEGER', 'caracteristicas')]),
+        'caracteristicas': ('lc_caracteristicasunidadconstruccion', None, _CARACTERISTICAS + [
+            ('tipo_planta', 'INTEGER', 'tipo_planta')]),
+        'derecho': ('lc_derecho', None, _DERECHO),
+        'direccion': ('extdireccion', 'POINT', _DIRECCION + [('lc_predio_direccion', 'INTEGER', 'predio')]),
+        'uebaunit': ('col_uebaunit', None, [
+            ('ue_lc_terreno', 'INTEGER', 'terreno'), ('ue_lc_construccion', 'INTEGER', 'construccion'),
+            ('ue_lc_unidadconstruccion', 'INTEGER', 'unidad'), ('baunit', 'INTEGER', 'predio')]),
+        'dominios': {'col_unidadadministrativabasicatipo': PREDIO_TIPO, 'lc_derechotipo': DERECHO_TIPO,
+                     'lc_construccionplantatipo': PLANTA_TIPO, 'lc_unidadconstrucciontipo': UNIDAD_TIPO},
+        'limites': dict(_LIMITES, zhgu='av_zonahomogeneageoeconomicaurbana', zhfu='av_zonahomogeneafisicaurbana',
+                        zhgr='av_zonahomogeneageoeconomicarural', zhfr='av_zonahomogeneafisicarural'),
+    },
+    'interno': {
+        'srs': 9377, 'columna_geometria': 'geometria',
+        'predio': ('ilc_predio', None, [(nombre, tipo, clave) if nombre != 'numero_predial'
+                                        else ('numero_predial_nacional', tipo, clave) for nombre, tipo, clave in _PREDIO]),
+        'terreno': ('cr_terreno', 'MULTIPOLYGON', _TERRENO),
+        'construccion': None,
+        'unidad': ('cr_unidadconstruccion', 'MULTIPOLYGON', _UNIDAD + [
+            ('tipo_planta', 'INTEGER', 'tipo_planta'),
+            ('cr_caracteristicasunidadconstruccion', 'INTEGER', 'caracteristicas')]),
+        'caracteristicas': ('ilc_caracteristicasunidadconstruccion', None, _CARACTERISTICAS),
+        'derecho': ('ilc_derecho', None, _DERECHO),
+        'direccion': ('extdireccion', 'POINT', _DIRECCION + [('ilc_predio_direccion', 'INTEGER', 'predio')]),
+        'uebaunit': ('col_uebaunit', None, [
+            ('ue_cr_terreno', 'INTEGER', 'terreno'), ('ue_cr_unidadconstruccion', 'INTEGER', 'unidad'),
+            ('baunit', 'INTEGER', 'predio')]),
+        'dominios': {'col_unidadadministrativabasicatipo': PREDIO_TIPO, 'ilc_derechocatastraltipo': DERECHO_TIPO,
+                     'cr_construccionplantatipo': PLANTA_TIPO, 'cr_unidadconstrucciontipo': UNIDAD_TIPO},
+        'limites': dict(_LIMITES, zhgu='vm_zonahomogeneageoeconomicaurbana', zhfu='vm_zonahomogeneafisicaurbana',
+                        zhgr='vm_zonahomogeneageoeconomicarural', zhfr='vm_zonahomogeneafisicarural'),
+    },
+    'ladm_1_0': {
+        # Sistema de origen distinto de EPSG:9377: el ETL reproyecta
+        'srs': 3116, 'columna_geometria': 'geom',
+        'predio': ('lc_predio', None, _PREDIO),
+        'terreno': ('lc_terreno', 'MULTIPOLYGON', _TERRENO),
+        'construccion': ('lc_construccion', 'MULTIPOLYGON', _CONSTRUCCION),
+        'unidad': ('lc_unidadconstruccion', 'MULTIPOLYGON', _UNIDAD),
+        'caracteristicas': None,
+        'derecho': ('lc_derecho', None, [(nombre, 'TEXT' if nombre == 'tipo' else tipo, clave)
+                                         for nombre, tipo, clave in _DERECHO]),
+        'direccion': ('extdireccion', 'POINT', _DIRECCION + [('lc_predio_direccion', 'INTEGER', 'predio')]),
+        'uebaunit': ('col_uebaunit', None, [
+            ('ue_lc_terreno', 'INTEGER', 'terreno'), ('ue_lc_construccion', 'INTEGER', 'construccion'),
+            ('ue_lc_unidadconstruccion', 'INTEGER', 'unidad'), ('baunit', 'INTEGER', 'predio')]
+            + [(nombre, tipo, clave) for nombre, tipo, clave in _CONSTRUCCION if nombre != 'identificador']
+            + _UNIDAD + [(nombre, tipo, clave) for nombre, tipo, clave in _CARACTERISTICAS if nombre != 'identificador']
+            + [('tipo_planta', 'INTEGER', 'tipo_planta'), ('lc_construccion', 'INTEGER', 'construccion_unidad')]),
+        'dominios': {'col_unidadadministrativabasicatipo': PREDIO_TIPO, 'lc_derechotipo': DERECHO_TIPO},
+        'limites': _LIMITES,
+    },
+}
+
+ROLES = ('predio', 'terreno', 'construccion', 'unidad', 'caracteristicas', 'derecho', 'direccion', 'uebaunit')
+
+
+# ---------------------------------------------------------------------------
+# Geometrías
+
+def _poligono(anillo):
+    # MULTIPOLYGON WKB de un solo polígono con un solo anillo (cerrado aquí)
+    anillo = list(anillo) + [anillo[0]]
+    return (struct.pack('<BIIBIII', 1, 6, 1, 1, 3, 1, len(anillo))
+            + struct.pack(f'<{2 * len(anillo)}d', *(c for punto in anillo for c in punto)))
+
+
+def _punto(x, y):
+    return struct.pack('<BIdd', 1, 1, x, y)
+
+
+def _rectangulo(x0, y0, x1, y1):
+    return [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+
+
+def _invalidar(anillo):
+    # Corbatín: dos vértices consecutivos intercambiados hacen que el anillo se cruce
+    anillo = list(anillo)
+    anillo[1], anillo[2] = anillo[2], anillo[1]
+    return anillo
+
+
+def _area(anillo):
+    return abs(sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(anillo, anillo[1:] + anillo[:1]))) / 2
+
+
+def _reducir(anillo, factor):
+    cx = sum(x for x, _ in anillo) / len(anillo)
+    cy = sum(y for _, y in anillo) / len(anillo)
+    return [(cx + (x - cx) * factor, cy + (y - cy) * factor) for x, y in anillo]
+
+
+class Municipio:
+    """Cuadrícula de manzanas; cada manzana tiene 2 x FRENTES terrenos con linderos comunes."""
+
+    def __init__(self, predios, origen, semilla):
+        self.semilla = semilla
+        self.manzanas = max(1, math.ceil(predios / (2 * FRENTES)))
+        self.columnas = math.ceil(math.sqrt(self.manzanas))
+        self.filas = math.ceil(self.manzanas / self.columnas)
+        self.paso_x = FRENTES * ANCHO + CALLE
+        self.paso_y = 2 * FONDO + CALLE
+        self.origen = origen
+        ancho = self.columnas * self.paso_x
+        alto = self.filas * self.paso_y
+        self.urbano = (origen[0], origen[1], origen[0] + ancho, origen[1] + alto)
+        margen = max(500.0, ancho / 2, alto / 2)
+        self.municipio = (origen[0] - margen, origen[1] - margen, origen[0] + ancho + margen,
+                          origen[1] + alto + margen)
+
+    def esquina(self, manzana):
+        fila, columna = divmod(manzana, self.columnas)
+        return self.origen[0] + columna * self.paso_x, self.origen[1] + fila * self.paso_y
+
+    def vertices(self, manzana):
+        # Vértices compartidos por los terrenos de la manzana: 3 filas x (FRENTES + 1)
+        x0, y0 = self.esquina(manzana)
+        azar = random.Random(self.semilla * 1000003 + manzana)
+        puntos = []
+        for fila in range(3):
+            linea = []
+            for columna in range(FRENTES + 1):
+                x = x0 + columna * ANCHO
+                y = y0 + fila * FONDO
+                if 0 < columna < FRENTES:
+                    x += azar.uniform(-1.5, 1.5)
+                if fila == 1:
+                    y += azar.uniform(-2.0, 2.0)
+                linea.append((x, y))
+            puntos.append(linea)
+        return puntos
+
+    def terreno(self, vertices, posicion):
+        # Anillo del terreno `posicion` (0 .. 2 * FRENTES - 1) con un vértice más sobre el frente
+        fila, columna = divmod(posicion, FRENTES)
+        a, b = vertices[fila][columna], vertices[fila][columna + 1]
+        c, d = vertices[fila + 1][columna + 1], vertices[fila + 1][columna]
+        if fila == 0:
+            frente = ((a[0] + b[0]) / 2, a[1] - 0.3)
+            return [a, frente, b, c, d], frente
+        frente = ((c[0] + d[0]) / 2, c[1] + 0.3)
+        return [a, b, c, frente, d], frente
+
+    def divisiones(self, tamano):
+        # Rectángulos que agrupan bloques de tamano x tamano manzanas
+        for fila in range(0, self.filas, tamano):
+            for columna in range(0, self.columnas, tamano):
+                x0 = self.origen[0] + columna * self.paso_x
+                y0 = self.origen[1] + fila * self.paso_y
+                x1 = self.origen[0] + min(columna + tamano, self.columnas) * self.paso_x - CALLE / 2
+                y1 = self.origen[1] + min(fila + tamano, self.filas) * self.paso_y - CALLE / 2
+                yield _rectangulo(x0 - CALLE / 2, y0 - CALLE / 2, x1, y1)
+
+    def franjas(self):
+        # Zona rural alrededor del perímetro urbano en cuatro franjas
+        mx0, my0, mx1, my1 = self.municipio
+        ux0, uy0, ux1, uy1 = self.urbano
+        return [(mx0, my0, mx1, uy0), (mx0, uy1, mx1, my1), (mx0, uy0, ux0, uy1), (ux1, uy0, mx1, uy1)]
+
+    def rurales(self, partes):
+        for x0, y0, x1, y1 in self.franjas():
+            largo_x = x1 - x0 >= y1 - y0
+            for i in range(partes):
+                if largo_x:
+                    yield _rectangulo(x0 + (x1 - x0) * i / partes, y0, x0 + (x1 - x0) * (i + 1) / partes, y1)
+                else:
+                    yield _rectangulo(x0, y0 + (y1 - y0) * i / partes, x1, y0 + (y1 - y0) * (i + 1) / partes)
+
+    def limites(self, tipo):
+        if tipo == 'manzana':
+            for manzana in range(self.manzanas):
+                x0, y0 = self.esquina(manzana)
+                yield _rectangulo(x0, y0, x0 + FRENTES * ANCHO, y0 + 2 * FONDO)
+        elif tipo in ('barrio', 'zhgu'):
+            yield from self.divisiones(4)
+        elif tipo == 'zhfu':
+            yield from self.divisiones(3)
+        elif tipo == 'sector_urbano':
+            yield from self.divisiones(8)
+        elif tipo == 'localidad':
+            yield from self.divisiones(16)
+        elif tipo == 'perimetro':
+            x0, y0, x1, y1 = self.urbano
+            yield _rectangulo(x0 - CALLE, y0 - CALLE, x1, y1)
+        elif tipo == 'municipio':
+            yield _rectangulo(*self.municipio)
+        elif tipo == 'sector_rural':
+            yield from (_rectangulo(*franja) for franja in self.franjas())
+        elif tipo in ('vereda', 'zhgr', 'zhfr'):
+            yield from self.rurales(max(2, self.columnas // 4))
+        elif tipo == 'corregimiento':
+            mx0, my0, mx1, my1 = self.municipio
+            yield _rectangulo(mx0, my0, (mx0 + mx1) / 2, my1)
+            yield _rectangulo((mx0 + mx1) / 2, my0, mx1, my1)
+        elif tipo == 'centro_poblado':
+            for x0, y0, x1, y1 in self.franjas():
+                cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+                lado = min(x1 - x0, y1 - y0) / 4
+                yield _rectangulo(cx - lado, cy - lado, cx + lado, cy + lado)
+
+
+# ---------------------------------------------------------------------------
+# Registros
+
+class Generador:
+    def __init__(self, modelo, predios, nulos=0.0, huerfanos=0.0, invalidas=0.0, semilla=0):
+        if modelo not in ESQUEMAS:
+            raise ValueError(f"Modelo desconocido: {modelo}. Opciones: {', '.join(sorted(ESQUEMAS))}")
+        self.esquema = ESQUEMAS[modelo]
+        self.predios = predios
+        self.nulos = nulos
+        self.huerfanos = huerfanos
+        self.invalidas = invalidas
+        self.semilla = semilla
+        self.srs_id = self.esquema['srs']
+        self.municipio = Municipio(predios, _DEFINICIONES[self.srs_id][2], semilla)
+        self._azar = random.Random(semilla)
+        self._contadores = dict.fromkeys(_BASES, 0)
+
+    def _t_id(self, rol):
+        self._contadores[rol] += 1
+        return _BASES[rol] * BLOQUE_T_ID + self._contadores[rol]
+
+    def _referencia(self, rol, t_id):
+        # Con probabilidad `huerfanos`, una llave que no existe en la tabla referenciada
+        if self._azar.random() < self.huerfanos:
+            return (_BASES[rol] + 1) * BLOQUE_T_ID - 1 - self._azar.randrange(1000)
+        return t_id
+
+    def _nulo(self, t_id):
+        return None if self._azar.random() < self.nulos else t_id
+
+    def _geometria(self, anillo):
+        if self._azar.random() < self.invalidas:
+            anillo = _invalidar(anillo)
+        return gpkg_sql.blob_gpkg(_poligono(anillo), self.srs_id)
+
+    def lote(self, inicio, fin):
+        """{rol: [valores]} de los predios inicio .. fin - 1."""
+        azar = self._azar
+        filas = {rol: [] for rol in ROLES}
+        vertices = None
+        manzana_actual = None
+        for indice in range(inicio, fin):
+            manzana, posicion = divmod(indice, 2 * FRENTES)
+            if manzana != manzana_actual:
+                vertices = self.municipio.vertices(manzana)
+                manzana_actual = manzana
+            anillo, frente = self.municipio.terreno(vertices, posicion)
+            codigo = f'2575401{manzana // 10000:06d}{manzana % 10000:04d}{posicion + 1:04d}000000000'
+            predio = self._t_id('predio')
+            area = _area(anillo)
+            filas['predio'].append({
+                't_id': self._nulo(predio), 'departamento': '25', 'municipio': '754', 'numero_predial': codigo,
+                'numero_anterior': codigo[:20], 'matricula': f'50C-{indice + 1}',
+                'avaluo': round(area * azar.uniform(300000, 900000), -3),
+                'tipo': azar.choices(PREDIO_TIPO, weights=(80, 8, 4, 6, 2))[0][0]})
+            terreno = self._t_id('terreno')
+            filas['terreno'].append({'t_id': self._nulo(terreno), 'area': round(area, 2),
+                                     'avaluo': round(area * azar.uniform(200000, 600000), -3),
+                                     'geometria': self._geometria(anillo)})
+            filas['uebaunit'].append({'t_id': self._nulo(self._t_id('uebaunit')), 'terreno': terreno,
+                                      'predio': self._referencia('predio', predio)})
+            for _ in range(2 if azar.random() < 0.05 else 1):
+                filas['derecho'].append({'t_id': self._nulo(self._t_id('derecho')),
+                                         'tipo': azar.choices(DERECHO_TIPO, weights=(85, 5, 10))[0][0],
+                                         'fraccion': 1.0, 'fecha': f'{azar.randint(1950, 2024)}-01-01',
+                                         'predio': self._referencia('predio', predio)})
+            filas['direccion'].append({'t_id': self._nulo(self._t_id('direccion')), 'tipo_direccion': 'Estructurada',
+                                       'principal': 1, 'via': str(manzana % 200 + 1), 'numero': str(posicion + 1),
+                                       'complemento': None, 'predio': self._referencia('predio', predio),
+                                       'geometria': gpkg_sql.blob_gpkg(_punto(*frente), self.srs_id)})
+            if azar.random() < 0.65:
+                self._construccion(filas, anillo, predio)
+        return filas
+
+    def _construccion(self, filas, anillo, predio):
+        azar = self._azar
+        huella = _reducir(anillo, 0.7)
+        area = round(_area(huella), 2)
+        pisos = azar.choices((1, 2, 3, 4, 5), weights=(50, 30, 12, 5, 3))[0]
+        construccion = self._t_id('construccion')
+        datos = {'identificador': 'A', 'numero_pisos': pisos, 'numero_sotanos': int(azar.random() < 0.05),
+                 'numero_mezanines': int(azar.random() < 0.1), 'numero_semisotanos': 0,
+                 'area_construccion': round(area * pisos, 2),
+                 'avaluo_construccion': round(area * pisos * azar.uniform(500000, 1500000), -3)}
+        filas['construccion'].append(dict(datos, t_id=self._nulo(construccion), geometria=self._geometria(huella)))
+        filas['uebaunit'].append(dict(datos, t_id=self._nulo(self._t_id('uebaunit')), construccion=construccion,
+                                      predio=self._referencia('predio', predio)))
+        for piso in range(1, pisos + 1):
+            caracteristicas = self._t_id('caracteristicas')
+            tipo = azar.choices(UNIDAD_TIPO, weights=(70, 18, 4, 3, 5))[0][0]
+            uso = USOS[tipo - 1]
+            atributos = {'identificador': 'A', 'tipo_unidad_construccion': tipo,
+                         'total_habitaciones': azar.randint(0, 5) if tipo == 1 else 0,
+                         'total_banios': azar.randint(1, 3), 'total_locales': int(tipo == 2),
+                         'uso': uso, 'anio_construccion': azar.randint(1950, 2024),
+                         'tipo_planta': 1 if piso > 0 else 3}
+            filas['caracteristicas'].append(dict(atributos, t_id=self._nulo(caracteristicas)))
+            unidad = self._t_id('unidad')
+            medidas = {'planta_ubicacion': piso, 'area_construida': area, 'area_privada_construida': area,
+                       'avaluo_unidad_construccion': round(area * azar.uniform(500000, 1500000), -3),
+                       'total_pisos': pisos, 'construccion': self._referencia('construccion', construccion),
+                       'construccion_unidad': construccion, 'tipo_planta': atributos['tipo_planta'],
+                       'caracteristicas': self._referencia('caracteristicas', caracteristicas)}
+            filas['unidad'].append(dict(medidas, t_id=self._nulo(unidad), geometria=self._geometria(huella)))
+            filas['uebaunit'].append(dict(atributos, **medidas, t_id=self._nulo(self._t_id('uebaunit')),
+                                          unidad=unidad, predio=self._referencia('predio', predio)))
+
+    def limites(self, tipo):
+        filas = []
+        for i, anillo in enumerate(self.municipio.limites(tipo)):
+            filas.append({'t_id': self._nulo(self._t_id('limite')), 'codigo': f'{tipo[:3].upper()}{i + 1:05d}',
+                          'nombre': f'{tipo.replace("_", " ").title()} {i + 1}', 'geometria': self._geometria(anillo)})
+        return filas
+
+
+# ---------------------------------------------------------------------------
+# Escritura
+
+def _crear_tabla(conn, tabla, geometria, columnas, columna_geometria, srs_id):
+    definicion = ['"fid" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL', '"T_Id" INTEGER']
+    definicion += [f'{gpkg_sql.identificador(nombre)} {tipo}' for nombre, tipo, _ in columnas]
+    if geometria:
+        definicion.append(f'{gpkg_sql.identificador(columna_geometria)} {geometria}')
+    conn.execute(f'CREATE TABLE {gpkg_sql.identificador(tabla)} ({", ".join(definicion)})')
+    if not geometria:
+        conn.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier) VALUES (?, 'attributes', ?)",
+                     (tabla, tabla))
+    nombres = ['T_Id'] + [nombre for nombre, _, _ in columnas] + ([columna_geometria] if geometria else [])
+    return (f'INSERT INTO {gpkg_sql.identificador(tabla)} ({", ".join(map(gpkg_sql.identificador, nombres))}) '
+            f'VALUES ({", ".join("?" * len(nombres))})')
+
+
+def _insertar(conn, sentencia, claves, registros):
+    conn.executemany(sentencia, [tuple(registro.get(clave) for clave in claves) for registro in registros])
+
+
+def generar(modelo, ruta, predios, nulos=0.0, huerfanos=0.0, invalidas=0.0, semilla=0, lote=LOTE):
+    """Escribe el GeoPackage de entrada de `modelo` en `ruta`; devuelve {tabla: registros}."""
+    generador = Generador(modelo, predios, nulos, huerfanos, invalidas, semilla)
+    esquema = generador.esquema
+    columna_geometria = esquema['columna_geometria']
+    srs_id = generador.srs_id
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('BEGIN')
+        gpkg_sql.crear_gpkg(conn)
+        nombre_srs, definicion, _ = _DEFINICIONES[srs_id]
+        conn.execute('INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)',
+                     (nombre_srs, srs_id, 'EPSG', srs_id, definicion, nombre_srs))
+
+        tablas = {}    # rol o tipo de límite -> (tabla, geometría, sentencia, claves)
+        for rol in ROLES:
+            if esquema[rol] is None:
+                continue
+            tabla, geometria, columnas = esquema[rol]
+            sentencia = _crear_tabla(conn, tabla, geometria, columnas, columna_geometria, srs_id)
+            claves = ['t_id'] + [clave for _, _, clave in columnas] + (['geometria'] if geometria else [])
+            tablas[rol] = (tabla, geometria, sentencia, claves)
+        for tipo, tabla in esquema['limites'].items():
+            sentencia = _crear_tabla(conn, tabla, 'MULTIPOLYGON', _LIMITE, columna_geometria, srs_id)
+            tablas[tipo] = (tabla, 'MULTIPOLYGON', sentencia, ['t_id'] + [clave for _, _, clave in _LIMITE]
+                            + ['geometria'])
+        for tabla, valores in esquema['dominios'].items():
+            conn.execute(f'''CREATE TABLE {gpkg_sql.identificador(tabla)} (
+                "T_Id" INTEGER PRIMARY KEY, "thisClass" TEXT, "baseClass" TEXT, "itfCode" INTEGER,
+                "iliCode" TEXT NOT NULL, "seq" INTEGER, "inactive" BOOLEAN NOT NULL, "dispName" TEXT NOT NULL,
+                "description" TEXT)''')
+            conn.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier) VALUES (?, 'attributes', ?)",
+                         (tabla, tabla))
+            conn.executemany(f'INSERT INTO {gpkg_sql.identificador(tabla)} VALUES (?, NULL, NULL, NULL, ?, ?, 0, ?, NULL)',
+                             [(t_id, ili, t_id, ili.split('.')[-1].replace('_', ' ')) for t_id, ili in valores])
+        conn.execute('COMMIT')
+
+        for inicio in range(0, predios, lote):
+            filas = generador.lote(inicio, min(inicio + lote, predios))
+            conn.execute('BEGIN')
+            for rol, registros in filas.items():
+                if rol in tablas:
+                    _, _, sentencia, claves = tablas[rol]
+                    _insertar(conn, sentencia, claves, registros)
+            conn.execute('COMMIT')
+
+        conn.execute('BEGIN')
+        for tipo in esquema['limites']:
+            _, _, sentencia, claves = tablas[tipo]
+            _insertar(conn, sentencia, claves, generador.limites(tipo))
+        for tabla, geometria, _, _ in tablas.values():
+            if geometria:
+                gpkg_sql.registrar_capa(conn, tabla, geometria, srs_id, columna=columna_geometria)
+        conn.execute('COMMIT')
+
+        conteos = {}
+        for tabla in [tabla for tabla, _, _, _ in tablas.values()] + list(esquema['dominios']):
+            conteos[tabla] = conn.execute(f'SELECT count(*) FROM {gpkg_sql.identificador(tabla)}').fetchone()[0]
+        return conteos
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog='etl_sintetico',
+        description='Genera un GeoPackage de entrada sintético para uno de los modelos de origen.'
+    )
+    parser.add_argument('modelo', choices=sorted(ESQUEMAS), help='Modelo de origen')
+    parser.add_argument('salida', help='GeoPackage que se crea (se reemplaza si existe)')
+    parser.add_argument('-n', '--predios', type=int, default=1000, help='Número de predios')
+    parser.add_argument('--nulos', type=float, default=0.0, help='Proporción de registros sin T_Id')
+    parser.add_argument('--huerfanos', type=float, default=0.0,
+                        help='Proporción de llaves que apuntan a registros inexistentes')
+    parser.add_argument('--invalidas', type=float, default=0.0, help='Proporción de polígonos inválidos')
+    parser.add_argument('--semilla', type=int, default=0, help='Semilla del generador aleatorio')
+    return parser
+
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if args.predios < 1:
+        parser.error('El número de predios debe ser al menos 1')
+    for nombre in ('nulos', 'huerfanos', 'invalidas'):
+        if not 0 <= getattr(args, nombre) <= 1:
+            parser.error(f'--{nombre} debe estar entre 0 y 1')
+    conteos = generar(args.modelo, args.salida, args.predios, args.nulos, args.huerfanos, args.invalidas,
+                      args.semilla)
+    print(json.dumps({'modelo': args.modelo, 'salida': args.salida, 'tablas': conteos}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
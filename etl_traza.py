@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Traza de una ejecución en formato Trace Event de Chrome.
+
+Con la opción de traza, cada paso y sus operaciones internas (lectura de
+tablas de búsqueda, unión, corrección, reproyección, escritura, índices
+espaciales) quedan como tramos en el hilo que los ejecutó. El archivo
+<salida>_traza.json se abre en chrome://tracing o en https://ui.perfetto.dev:
+
+- cada hilo del pool es una fila; los huecos son trabajadores ociosos;
+- los tramos "espera escritor" son el tiempo que una capa esperó la conexión
+  de escritura mientras otra escribía;
+- las flechas unen cada paso con los pasos de los que depende, y la fila
+  "ruta crítica" repite la cadena de pasos que determinó la duración total.
+
+Sin traza, tramo(None, ...) no hace nada, así que el código instrumentado no
+cambia de comportamiento. Este módulo no depende de QGIS.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+TID_RUTA_CRITICA = 0
+
+
+def ruta_traza(output_gpkg):
+    return f'{os.path.splitext(output_gpkg)[0]}_traza.json'
+
+
+def tramo(traza, nombre, categoria, **args):
+    """Mide el bloque como un tramo de `traza`; sin traza no hace nada."""
+    if traza is None:
+        return contextlib.nullcontext()
+    return traza.tramo(nombre, categoria, **args)
+
+
+class Traza:
+    def __init__(self, proceso=None):
+        self.pid = os.getpid()
+        self._cero = time.perf_counter_ns()
+        self._eventos = []
+        self._hilos = {}        # identificador del hilo -> tid de la traza
+        self._pasos = {}        # paso -> (tid, inicio, fin, dependencias)
+        self._flujos = 0
+        self._lock = threading.Lock()
+        if proceso:
+            self._eventos.append({'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'args': {'name': proceso}})
+        self._eventos.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': TID_RUTA_CRITICA,
+                              'args': {'name': 'ruta crítica'}})
+
+    def _ahora(self):
+        # Microsegundos desde el inicio de la traza
+        return (time.perf_counter_ns() - self._cero) / 1000
+
+    def _tid(self):
+        identificador = threading.get_ident()
+        with self._lock:
+            if identificador not in self._hilos:
+                self._hilos[identificador] = len(self._hilos) + 1
+                self._eventos.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid,
+                                      'tid': self._hilos[identificador],
+                                      'args': {'name': threading.current_thread().name}})
+            return self._hilos[identificador]
+
+    def _agregar(self, *eventos):
+        with self._lock:
+            self._eventos.extend(eventos)
+
+    @contextlib.contextmanager
+    def tramo(self, nombre, categoria, **args):
+        tid = self._tid()
+        inicio = self._ahora()
+        try:
+            yield
+        finally:
+            self._agregar({'name': nombre, 'cat': categoria, 'ph': 'X', 'ts': inicio, 'dur': self._ahora() - inicio,
+                           'pid': self.pid, 'tid': tid, 'args': args})
+
+    @contextlib.contextmanager
+    def paso(self, nombre, categoria, depende=(), **args):
+        """Tramo de un paso del grafo, unido con flechas a los pasos de los que depende."""
+        tid = self._tid()
+        inicio = self._ahora()
+        try:
+            yield
+        finally:
+            fin = self._ahora()
+            eventos = [{'name': nombre, 'cat': 'paso', 'ph': 'X', 'ts': inicio, 'dur': fin - inicio,
+                        'pid': self.pid, 'tid': tid, 'args': dict(args, tipo=categoria)}]
+            with self._lock:
+                self._pasos[nombre] = (tid, inicio, fin, tuple(depende))
+                anteriores = [(dep, self._pasos[dep]) for dep in depende if dep in self._pasos]
+                flujos = range(self._flujos + 1, self._flujos + 1 + len(anteriores))
+                self._flujos += len(anteriores)
+            for flujo, (dep, (tid_dep, inicio_dep, fin_dep, _)) in zip(flujos, anteriores):
+                eventos.append({'name': 'dependencia', 'cat': 'paso', 'ph': 's', 'id': flujo, 'pid': self.pid,
+                                'tid': tid_dep, 'ts': max(inicio_dep, fin_dep - 1)})
+                eventos.append({'name': 'dependencia', 'cat': 'paso', 'ph': 'f', 'bp': 'e', 'id': flujo,
+                                'pid': self.pid, 'tid': tid, 'ts': inicio})
+            self._agregar(*eventos)
+
+    def ruta_critica(self):
+        # Desde el último paso en terminar, la dependencia que terminó más tarde en cada nivel
+        with self._lock:
+            pasos = dict(self._pasos)
+        if not pasos:
+            return []
+        ruta = [max(pasos, key=lambda nombre: pasos[nombre][2])]
+        while True:
+            anteriores = [dep for dep in pasos[ruta[-1]][3] if dep in pasos]
+            if not anteriores:
+                break
+            ruta.append(max(anteriores, key=lambda nombre: pasos[nombre][2]))
+        ruta.reverse()
+        return ruta
+
+    def guardar(self, ruta, **datos):
+        critica = self.ruta_critica()
+        with self._lock:
+            eventos = list(self._eventos)
+            pasos = dict(self._pasos)
+        for nombre in critica:
+            _, inicio, fin, _ = pasos[nombre]
+            eventos.append({'name': nombre, 'cat': 'ruta_critica', 'ph': 'X', 'ts': inicio, 'dur': fin - inicio,
+                            'pid': self.pid, 'tid': TID_RUTA_CRITICA, 'args': {}})
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms',
+                       'otherData': dict(datos, ruta_critica=critica)}, archivo, ensure_ascii=False)
+        return ruta
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Procesos trabajadores con QGIS ya inicializado.
+
+Cada trabajador inicializa QGIS y registra el proveedor una sola vez, y luego
+ejecuta trabajos de etl_cli uno tras otro. Un trabajador se recicla (termina
+y se reemplaza por uno nuevo) después de un número de trabajos o cuando su
+memoria supera un límite.
+
+El pool se puede usar dentro de un proceso (PoolTrabajadores) o dejarse
+corriendo como servidor local que recibe trabajos por un socket:
+
+    python -m Validadores.etl_workers -n 4 --puerto 6000
+    python -m Validadores.etl_cli ladm_1_2 *.gpkg -d salidas/ --servidor 6000
+
+Los mensajes del socket se deserializan con pickle, así que solo se aceptan
+conexiones autenticadas con una clave secreta: la de VALIDADORES_ETL_CLAVE o,
+si no está definida, una clave aleatoria que el servidor genera la primera vez
+en un archivo que solo puede leer su dueño (ver archivo_clave). No hay clave
+por defecto.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import secrets
+import stat
+import sys
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+MAX_TRABAJOS = 50
+HOST = 'localhost'
+
+
+def memoria_mb():
+    # Memoria residente del proceso actual; 0 si no se puede medir
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open('/proc/self/statm') as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def archivo_clave():
+    return os.environ.get('VALIDADORES_ETL_ARCHIVO_CLAVE') or os.path.join(
+        os.path.expanduser('~'), '.config', 'validadores_etl', 'clave_trabajadores')
+
+
+def _revisar_permisos(ruta):
+    # Un archivo que otros usuarios pueden leer o modificar no sirve como secreto
+    if os.name == 'nt':
+        return
+    estado = os.stat(ruta)
+    if estado.st_uid != os.getuid() or estado.st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise PermissionError(f"La clave de los trabajadores ({ruta}) debe pertenecer al usuario actual y "
+                              f"tener permisos 600")
+
+
+def leer_clave(ruta=None):
+    ruta = ruta or archivo_clave()
+    _revisar_permisos(ruta)
+    with open(ruta, encoding='ascii') as archivo:
+        clave = archivo.read().strip()
+    if not clave:
+        raise ValueError(f"El archivo de clave {ruta} está vacío")
+    return clave.encode('ascii')
+
+
+def crear_clave(ruta=None):
+    """Clave aleatoria en `ruta` (permisos 600); si ya existe, la lee."""
+    ruta = ruta or archivo_clave()
+    os.makedirs(os.path.dirname(ruta), mode=0o700, exist_ok=True)
+    try:
+        descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return leer_clave(ruta)
+    with os.fdopen(descriptor, 'w', encoding='ascii') as archivo:
+        archivo.write(secrets.token_hex(32))
+    return leer_clave(ruta)
+
+
+def clave_por_defecto(crear=False):
+    """
+    Clave de VALIDADORES_ETL_CLAVE o del archivo de clave. El servidor la crea
+    (`crear`); un cliente sin clave recibe un error en lugar de usar una conocida.
+    """
+    clave = os.environ.get('VALIDADORES_ETL_CLAVE')
+    if clave:
+        return clave.encode('utf-8')
+    if crear:
+        return crear_clave()
+    try:
+        return leer_clave()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No hay clave para el servidor de trabajadores: defina VALIDADORES_ETL_CLAVE o "
+                                f"inicie el servidor, que crea {archivo_clave()}") from None
+
+
+def _trabajador(trabajos, resultados, max_trabajos, max_memoria_mb, ejecutar=None, iniciar=None):
+    # `ejecutar` e `iniciar`: por defecto, los de etl_cli (QGIS)
+    if ejecutar is None or iniciar is None:
+        from .etl_cli import ejecutar_trabajo, iniciar_qgis
+        ejecutar = ejecutar or ejecutar_trabajo
+        iniciar = iniciar or iniciar_qgis
+
+    pid = os.getpid()
+    try:
+        iniciar()
+    except Exception as e:
+        resultados.put(('fallo', pid, str(e)))
+        return
+    hechos = 0
+    por_centinela = False
+    while True:
+        mensaje = trabajos.get()
+        if mensaje is None:
+            por_centinela = True
+            break
+        id_trabajo, trabajo = mensaje
+        resultados.put(('inicio', pid, id_trabajo))
+        resumen = ejecutar(trabajo)
+        resumen['trabajador'] = pid
+        resultados.put(('fin', pid, (id_trabajo, resumen)))
+        hechos += 1
+        if hechos >= max_trabajos or (max_memoria_mb and memoria_mb() > max_memoria_mb):
+            break
+    resultados.put(('salida', pid, por_centinela))
+
+
+class PoolTrabajadores:
+    def __init__(self, procesos=None, max_trabajos=MAX_TRABAJOS, max_memoria_mb=None, ejecutar=None, iniciar=None):
+        self.procesos = procesos or os.cpu_count() or 1
+        self.max_trabajos = max_trabajos
+        self.max_memoria_mb = max_memoria_mb
+        self._funciones = (ejecutar, iniciar)   # funciones de módulo: se pasan por pickle a cada proceso
+        self.reciclados = 0
+        self._fallos = 0
+        self._centinelas = 0    # avisos de cierre en la cola que nadie ha leído
+        self._contexto = multiprocessing.get_context('spawn')
+        self._trabajos = self._contexto.Queue()
+        self._resultados = self._contexto.Queue()
+        self._vivos = {}        # pid -> proceso
+        self._en_curso = {}     # pid -> id de trabajo
+        self._futuros = {}      # id de trabajo -> (trabajo, Future)
+        self._siguiente = 0
+        self._cerrando = False
+        self._lock = threading.Lock()
+        for _ in range(self.procesos):
+            self._iniciar_proceso()
+        self._supervisor = threading.Thread(target=self._supervisar, name='supervisor-etl', daemon=True)
+        self._supervisor.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+    def _iniciar_proceso(self):
+        proceso = self._contexto.Process(
+            target=_trabajador,
+            args=(self._trabajos, self._resultados, self.max_trabajos, self.max_memoria_mb, *self._funciones),
+            daemon=True
+        )
+        proceso.start()
+        self._vivos[proceso.pid] = proceso
+
+    def enviar(self, trabajo):
+        futuro = Future()
+        with self._lock:
+            if self._cerrando:
+                raise RuntimeError('El pool de trabajadores está cerrado')
+            id_trabajo = self._siguiente
+            self._siguiente += 1
+            self._futuros[id_trabajo] = (trabajo, futuro)
+        self._trabajos.put((id_trabajo, trabajo))
+        return futuro
+
+    def mapa(self, trabajos):
+        futuros = [self.enviar(trabajo) for trabajo in trabajos]
+        return [futuro.result() for futuro in futuros]
+
+    def _terminar(self, id_trabajo, resumen):
+        with self._lock:
+            _, futuro = self._futuros.pop(id_trabajo, (None, None))
+        if futuro is not None:
+            futuro.set_result(resumen)
+
+    def _proceso_terminado(self, pid):
+        proceso = self._vivos.pop(pid, None)
+        if proceso is not None:
+            proceso.join(timeout=5)
+        id_trabajo = self._en_curso.pop(pid, None)
+        if id_trabajo is not None:
+            trabajo = self._futuros.get(id_trabajo, ({}, None))[0]
+            self._terminar(id_trabajo, {
+                'modelo': trabajo.get('modelo'), 'entrada': trabajo.get('entrada'), 'salida': trabajo.get('salida'),
+                'estado': 'error', 'error': 'El proceso trabajador terminó inesperadamente',
+                'trabajador': pid,
+            })
+        if not self._cerrando:
+            self.reciclados += 1
+            self._iniciar_proceso()
+
+    def _supervisar(self):
+        while self._vivos or not self._cerrando:
+            if self._cerrando and len(self._vivos) > self._centinelas:
+                # Un aviso de cierre por proceso, después de los trabajos ya encolados
+                for _ in range(len(self._vivos) - self._centinelas):
+                    self._trabajos.put(None)
+                self._centinelas = len(self._vivos)
+            try:
+                tipo, pid, dato = self._resultados.get(timeout=0.5)
+            except queue.Empty:
+                # Procesos que murieron sin avisar (p. ej. un fallo de QGIS)
+                for pid, proceso in list(self._vivos.items()):
+                    if not proceso.is_alive():
+                        self._proceso_terminado(pid)
+                continue
+            if tipo == 'inicio':
+                self._en_curso[pid] = dato
+            elif tipo == 'fin':
+                self._en_curso.pop(pid, None)
+                self._terminar(*dato)
+            elif tipo == 'salida':
+                if dato:
+                    self._centinelas -= 1
+                self._proceso_terminado(pid)
+            elif tipo == 'fallo':
+                self._fallos += 1
+                if self._fallos >= 3 * self.procesos:
+                    # QGIS no arranca: no seguir reintentando
+                    self._fallar_pendientes(f'No se pudo inicializar QGIS: {dato}')
+                self._proceso_terminado(pid)
+
+    def _fallar_pendientes(self, error):
+        with self._lock:
+            self._cerrando = True
+            pendientes = list(self._futuros.items())
+            self._futuros.clear()
+        for _, (trabajo, futuro) in pendientes:
+            futuro.set_result({'modelo': trabajo.get('modelo'), 'entrada': trabajo.get('entrada'),
+                               'salida': trabajo.get('salida'), 'estado': 'error', 'error': error})
+
+    def cerrar(self, esperar=True):
+        # Los trabajos ya enviados se terminan antes de cerrar los procesos
+        with self._lock:
+            self._cerrando = True
+        if esperar:
+            self._supervisor.join()
+
+
+def servir(pool, puerto, clave=None, host=HOST):
+    """Atiende peticiones {'trabajos': [...]} o {'orden': 'cerrar'} hasta recibir la orden de cerrar."""
+    clave = clave or clave_por_defecto(crear=True)
+    detener = threading.Event()
+
+    def atender(conexion):
+        with conexion:
+            while True:
+                try:
+                    mensaje = conexion.recv()
+                except EOFError:
+                    return
+                if mensaje.get('orden') == 'cerrar':
+                    detener.set()
+                    conexion.send({'estado': 'cerrando'})
+                    # Despertar el accept del hilo principal
+                    try:
+                        Client((host, puerto), authkey=clave).close()
+                    except OSError:
+                        pass
+                    return
+                futuros = [pool.enviar(trabajo) for trabajo in mensaje.get('trabajos', [])]
+                conexion.send({'trabajos': [futuro.result() for futuro in futuros]})
+
+    with Listener((host, puerto), authkey=clave) as listener:
+        while not detener.is_set():
+            try:
+                conexion = listener.accept()
+            except (OSError, multiprocessing.AuthenticationError):
+                continue
+            if detener.is_set():
+                conexion.close()
+                break
+            threading.Thread(target=atender, args=(conexion,), daemon=True).start()
+
+
+def enviar_al_servidor(trabajos, puerto, clave=None, host=HOST):
+    with Client((host, puerto), authkey=clave or clave_por_defecto()) as conexion:
+        conexion.send({'trabajos': trabajos})
+        return conexion.recv()['trabajos']
+
+
+def detener_servidor(puerto, clave=None, host=HOST):
+    with Client((host, puerto), authkey=clave or clave_por_defecto()) as conexion:
+        conexion.send({'orden': 'cerrar'})
+        return conexion.recv()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='etl_workers',
+        description='Mantiene procesos con QGIS inicializado que ejecutan trabajos de etl_cli.'
+    )
+    parser.add_argument('-n', '--procesos', type=int, default=os.cpu_count(), help='Número de procesos trabajadores')
+    parser.add_argument('--puerto', type=int, required=True, help='Puerto local donde se reciben los trabajos')
+    parser.add_argument('--reciclar-trabajos', type=int, default=MAX_TRABAJOS,
+                        help='Trabajos que ejecuta un proceso antes de reemplazarlo')
+    parser.add_argument('--memoria-max', type=float, metavar='MB',
+                        help='Memoria residente a partir de la cual se reemplaza un proceso')
+    parser.add_argument('--detener', action='store_true', help='Detener el servidor que escucha en el puerto')
+    args = parser.parse_args(argv)
+
+    if args.detener:
+        detener_servidor(args.puerto)
+        return 0
+    with PoolTrabajadores(args.procesos, args.reciclar_trabajos, args.memoria_max) as pool:
+        print(f"Trabajadores listos en {HOST}:{args.puerto} ({pool.procesos} procesos)", file=sys.stderr, flush=True)
+        servir(pool, args.puerto)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
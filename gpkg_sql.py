@@ -0,0 +1,691 @@
+# -*- coding: utf-8 -*-
+"""
+Operaciones directas sobre GeoPackage con sqlite3, sin pasar por QGIS.
+
+Copia tablas de un GeoPackage a otro con ATTACH e INSERT ... SELECT y registra
+por su cuenta gpkg_contents, gpkg_geometry_columns y el índice RTree, de modo
+que las geometrías se copian como BLOB sin decodificarse.
+"""
+import re
+import sqlite3
+import struct
+from datetime import datetime, timezone
+
+
+GPKG_APPLICATION_ID = 0x47504B47
+GPKG_USER_VERSION = 10200
+COLUMNA_GEOMETRIA = 'geom'
+
+_DEFINICION_4326 = (
+    'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+    'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,'
+    'AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],'
+    'AXIS["Latitude",NORTH],AXIS["Longitude",EAST],AUTHORITY["EPSG","4326"]]'
+)
+
+
+def identificador(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def conectar(ruta, timeout=60):
+    conn = sqlite3.connect(ruta, timeout=timeout, isolation_level=None, check_same_thread=False)
+    conn.execute('PRAGMA foreign_keys = OFF')
+    return conn
+
+
+def ejecutar_script(conn, script):
+    # A diferencia de executescript, no confirma la transacción en curso
+    sentencia = ''
+    for linea in script.splitlines(keepends=True):
+        sentencia += linea
+        if sqlite3.complete_statement(sentencia):
+            conn.execute(sentencia)
+            sentencia = ''
+    if sentencia.strip():
+        conn.execute(sentencia)
+
+
+# ---------------------------------------------------------------------------
+# Geometrías en formato binario GeoPackage
+
+def secuencias_wkb(wkb, pos=0, secuencias=None):
+    """
+    Lista de (orden, posición, puntos, dimensiones) de cada secuencia de coordenadas
+    de un WKB: las coordenadas de cada una son dobles contiguos desde `posición`.
+    """
+    if secuencias is None:
+        secuencias = []
+    _recorrer_wkb(wkb, pos, secuencias)
+    return secuencias
+
+
+def _recorrer_wkb(wkb, pos, secuencias):
+    orden = '<' if wkb[pos] == 1 else '>'
+    tipo = struct.unpack_from(orden + 'I', wkb, pos + 1)[0]
+    pos += 5
+    dims = 2
+    if tipo & 0xE0000000:
+        # EWKB: banderas Z/M/SRID en los bits altos
+        dims += bool(tipo & 0x80000000) + bool(tipo & 0x40000000)
+        if tipo & 0x20000000:
+            pos += 4
+        tipo &= 0x0FFFFFFF
+    else:
+        dims += {1: 1, 2: 1, 3: 2}.get(tipo // 1000, 0)
+        tipo %= 1000
+
+    def puntos(n, pos):
+        secuencias.append((orden, pos, n, dims))
+        return pos + n * 8 * dims
+
+    if tipo == 1:
+        return puntos(1, pos)
+    if tipo in (2, 8):
+        n = struct.unpack_from(orden + 'I', wkb, pos)[0]
+        return puntos(n, pos + 4)
+    if tipo == 3:
+        anillos = struct.unpack_from(orden + 'I', wkb, pos)[0]
+        pos += 4
+        for _ in range(anillos):
+            n = struct.unpack_from(orden + 'I', wkb, pos)[0]
+            pos = puntos(n, pos + 4)
+        return pos
+    if tipo in (4, 5, 6, 7, 9, 10, 11, 12):
+        partes = struct.unpack_from(orden + 'I', wkb, pos)[0]
+        pos += 4
+        for _ in range(partes):
+            pos = _recorrer_wkb(wkb, pos, secuencias)
+        return pos
+    raise ValueError(f"Tipo de geometría WKB no soportado: {tipo}")
+
+
+def _envolvente_wkb(wkb, pos, limites):
+    for orden, inicio, n, dims in secuencias_wkb(wkb, pos):
+        for coords in struct.iter_unpack(orden + 'd' * dims, wkb[inicio:inicio + n * 8 * dims]):
+            x, y = coords[0], coords[1]
+            if x != x or y != y:
+                continue
+            if x < limites[0]:
+                limites[0] = x
+            if x > limites[1]:
+                limites[1] = x
+            if y < limites[2]:
+                limites[2] = y
+            if y > limites[3]:
+                limites[3] = y
+
+
+def envolvente(blob):
+    """Devuelve (minx, maxx, miny, maxy) de un BLOB GeoPackage, o None si está vacío."""
+    if blob is None or len(blob) < 8 or blob[:2] != b'GP':
+        return None
+    banderas = blob[3]
+    if banderas & 0x10:
+        return None
+    orden = '<' if banderas & 1 else '>'
+    tipo_envolvente = (banderas >> 1) & 7
+    if tipo_envolvente:
+        return struct.unpack_from(orden + '4d', blob, 8)
+    limites = [float('inf'), float('-inf'), float('inf'), float('-inf')]
+    _envolvente_wkb(blob, 8, limites)
+    if limites[0] > limites[1]:
+        return None
+    return tuple(limites)
+
+
+_TAMANO_ENVOLVENTE = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}
+
+
+def wkb(blob):
+    """WKB de un BLOB GeoPackage (sin la cabecera), o None si es nulo o vacío."""
+    if blob is None or len(blob) < 8 or blob[:2] != b'GP':
+        return None
+    banderas = blob[3]
+    if banderas & 0x10:
+        return None
+    return bytes(blob[8 + _TAMANO_ENVOLVENTE[(banderas >> 1) & 7]:])
+
+
+def blob_gpkg(wkb, srs_id):
+    """BLOB GeoPackage con envolvente XY a partir de un WKB."""
+    if wkb is None:
+        return None
+    limites = [float('inf'), float('-inf'), float('inf'), float('-inf')]
+    _envolvente_wkb(wkb, 0, limites)
+    if limites[0] > limites[1]:
+        return struct.pack('<2sBBi', b'GP', 0, 0x11, srs_id) + wkb
+    return struct.pack('<2sBBi4d', b'GP', 0, 0x03, srs_id, *limites) + wkb
+
+
+# ---------------------------------------------------------------------------
+# Estructura del GeoPackage
+
+def crear_gpkg(conn):
+    # Crea las tablas obligatorias si el archivo todavía no es un GeoPackage
+    conn.execute(f'PRAGMA application_id = {GPKG_APPLICATION_ID}')
+    if conn.execute('PRAGMA user_version').fetchone()[0] == 0:
+        conn.execute(f'PRAGMA user_version = {GPKG_USER_VERSION}')
+    ejecutar_script(conn, '''
+        CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (
+            srs_name TEXT NOT NULL, srs_id INTEGER NOT NULL PRIMARY KEY,
+            organization TEXT NOT NULL, organization_coordsys_id INTEGER NOT NULL,
+            definition TEXT NOT NULL, description TEXT);
+        CREATE TABLE IF NOT EXISTS gpkg_contents (
+            table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL,
+            identifier TEXT UNIQUE, description TEXT DEFAULT '',
+            last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+            min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER,
+            CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys(srs_id));
+        CREATE TABLE IF NOT EXISTS gpkg_geometry_columns (
+            table_name TEXT NOT NULL, column_name TEXT NOT NULL,
+            geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL,
+            z TINYINT NOT NULL, m TINYINT NOT NULL,
+            CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+            CONSTRAINT uk_gc_table_name UNIQUE (table_name),
+            CONSTRAINT fk_gc_tn FOREIGN KEY (table_name) REFERENCES gpkg_contents(table_name),
+            CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id) REFERENCES gpkg_spatial_ref_sys (srs_id));
+        CREATE TABLE IF NOT EXISTS gpkg_extensions (
+            table_name TEXT, column_name TEXT, extension_name TEXT NOT NULL,
+            definition TEXT NOT NULL, scope TEXT NOT NULL,
+            CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name));
+    ''')
+    conn.executemany(
+        'INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)',
+        [
+            ('Undefined cartesian SRS', -1, 'NONE', -1, 'undefined', 'undefined cartesian coordinate reference system'),
+            ('Undefined geographic SRS', 0, 'NONE', 0, 'undefined', 'undefined geographic coordinate reference system'),
+            ('WGS 84 geodetic', 4326, 'EPSG', 4326, _DEFINICION_4326, 'longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid'),
+        ]
+    )
+
+
+def existe_tabla(conn, tabla, esquema='main'):
+    fila = conn.execute(
+        f"SELECT 1 FROM {esquema}.sqlite_master WHERE type = 'table' AND lower(name) = lower(?)", (tabla,)
+    ).fetchone()
+    return fila is not None
+
+
+def nombre_real(conn, tabla, esquema='main'):
+    # Los nombres de tabla en SQLite no distinguen mayúsculas
+    fila = conn.execute(
+        f"SELECT name FROM {esquema}.sqlite_master WHERE type = 'table' AND lower(name) = lower(?)", (tabla,)
+    ).fetchone()
+    if fila is None:
+        raise ValueError(f"No existe la tabla '{tabla}' en el GeoPackage")
+    return fila[0]
+
+
+def columnas(conn, tabla, esquema='main'):
+    # [(nombre, tipo, es_clave_primaria)]
+    return [(fila[1], fila[2], bool(fila[5]))
+            for fila in conn.execute(f'PRAGMA {esquema}.table_info({identificador(tabla)})')]
+
+
+def columna_geometria(conn, tabla, esquema='main'):
+    fila = conn.execute(
+        f'SELECT column_name, geometry_type_name, srs_id, z, m FROM {esquema}.gpkg_geometry_columns '
+        'WHERE lower(table_name) = lower(?)', (tabla,)
+    ).fetchone()
+    return fila
+
+
+def srs_epsg(conn, srs_id, esquema='main'):
+    fila = conn.execute(
+        f'SELECT organization, organization_coordsys_id FROM {esquema}.gpkg_spatial_ref_sys WHERE srs_id = ?',
+        (srs_id,)
+    ).fetchone()
+    if fila and fila[0] and fila[0].upper() == 'EPSG':
+        return fila[1]
+    return srs_id
+
+
+def fila_srs(conn, srs_id, esquema='main'):
+    # Registro completo de gpkg_spatial_ref_sys en el orden de sus columnas
+    return conn.execute(
+        'SELECT srs_name, srs_id, organization, organization_coordsys_id, definition, description '
+        f'FROM {esquema}.gpkg_spatial_ref_sys WHERE srs_id = ?', (srs_id,)
+    ).fetchone()
+
+
+def eliminar_tabla(conn, tabla):
+    # Elimina la tabla junto con su registro en los metadatos y su índice espacial
+    if existe_tabla(conn, 'gpkg_geometry_columns'):
+        geometria = columna_geometria(conn, tabla)
+        if geometria is not None:
+            conn.execute(f'DROP TABLE IF EXISTS {identificador(f"rtree_{tabla}_{geometria[0]}")}')
+    if existe_tabla(conn, tabla):
+        conn.execute(f'DROP TABLE {identificador(nombre_real(conn, tabla))}')
+    for meta in ('gpkg_geometry_columns', 'gpkg_extensions', 'gpkg_ogr_contents', 'gpkg_contents'):
+        if existe_tabla(conn, meta):
+            conn.execute(f'DELETE FROM {meta} WHERE lower(table_name) = lower(?)', (tabla,))
+
+
+def registrar_srs(conn, srs_id, esquema):
+    if esquema == 'main' or srs_id is None:
+        return
+    fila = conn.execute('SELECT 1 FROM gpkg_spatial_ref_sys WHERE srs_id = ?', (srs_id,)).fetchone()
+    if fila is None:
+        conn.execute(
+            'INSERT INTO gpkg_spatial_ref_sys (srs_name, srs_id, organization, organization_coordsys_id, '
+            'definition, description) SELECT srs_name, srs_id, organization, organization_coordsys_id, '
+            f'definition, description FROM {esquema}.gpkg_spatial_ref_sys WHERE srs_id = ?', (srs_id,)
+        )
+
+
+def registrar_capa(conn, tabla, tipo_geometria, srs_id, z=0, m=0, columna=COLUMNA_GEOMETRIA, indice=True):
+    # Registra la tabla como capa de entidades y construye su índice RTree.
+    # Sin índice (tablas de trabajo o índice diferido) solo se registran los metadatos.
+    ahora = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+    conn.execute(
+        'INSERT INTO gpkg_contents (table_name, data_type, identifier, description, last_change, srs_id) '
+        "VALUES (?, 'features', ?, '', ?, ?)", (tabla, tabla, ahora, srs_id)
+    )
+    conn.execute('INSERT INTO gpkg_geometry_columns VALUES (?, ?, ?, ?, ?, ?)',
+                 (tabla, columna, tipo_geometria, srs_id, z, m))
+    if existe_tabla(conn, 'gpkg_ogr_contents'):
+        conn.execute(f'INSERT OR REPLACE INTO gpkg_ogr_contents SELECT ?, count(*) FROM {identificador(tabla)}',
+                     (tabla,))
+    if indice:
+        crear_indice_espacial(conn, tabla, columna)
+
+
+def crear_indice_espacial(conn, tabla, columna=COLUMNA_GEOMETRIA):
+    # Construye el RTree de una capa ya registrada en una sola pasada y actualiza su extensión
+    col = identificador(columna)
+    rtree = identificador(f'rtree_{tabla}_{columna}')
+    limites = [None, None, None, None]
+
+    def cajas():
+        lector = conn.cursor()
+        for fid, blob in lector.execute(f'SELECT fid, {col} FROM {identificador(tabla)}'):
+            caja = envolvente(blob)
+            if caja is None:
+                continue
+            limites[0] = caja[0] if limites[0] is None else min(limites[0], caja[0])
+            limites[1] = caja[1] if limites[1] is None else max(limites[1], caja[1])
+            limites[2] = caja[2] if limites[2] is None else min(limites[2], caja[2])
+            limites[3] = caja[3] if limites[3] is None else max(limites[3], caja[3])
+            yield (fid,) + tuple(caja)
+
+    conn.execute(f'DROP TABLE IF EXISTS {rtree}')
+    conn.execute(f'CREATE VIRTUAL TABLE {rtree} USING rtree(id, minx, maxx, miny, maxy)')
+    conn.executemany(f'INSERT INTO {rtree} VALUES (?, ?, ?, ?, ?)', cajas())
+    conn.execute('UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ? '
+                 'WHERE lower(table_name) = lower(?)', (limites[0], limites[2], limites[1], limites[3], tabla))
+    conn.execute(
+        "INSERT OR REPLACE INTO gpkg_extensions VALUES (?, ?, 'gpkg_rtree_index', "
+        "'http://www.geopackage.org/spec120/#extension_rtree', 'write-only')", (tabla, columna)
+    )
+    # Disparadores estándar para que el índice se mantenga en ediciones posteriores (GDAL/QGIS)
+    t, c, r = identificador(tabla), col, rtree
+    nombre = f'rtree_{tabla}_{columna}'
+    ejecutar_script(conn, f'''
+        CREATE TRIGGER {identificador(nombre + '_insert')} AFTER INSERT ON {t}
+        WHEN (new.{c} NOT NULL AND NOT ST_IsEmpty(NEW.{c}))
+        BEGIN
+          INSERT OR REPLACE INTO {r} VALUES (
+            NEW.fid, ST_MinX(NEW.{c}), ST_MaxX(NEW.{c}), ST_MinY(NEW.{c}), ST_MaxY(NEW.{c}));
+        END;
+        CREATE TRIGGER {identificador(nombre + '_update1')} AFTER UPDATE OF {c} ON {t}
+        WHEN OLD.fid = NEW.fid AND (NEW.{c} NOTNULL AND NOT ST_IsEmpty(NEW.{c}))
+        BEGIN
+          INSERT OR REPLACE INTO {r} VALUES (
+            NEW.fid, ST_MinX(NEW.{c}), ST_MaxX(NEW.{c}), ST_MinY(NEW.{c}), ST_MaxY(NEW.{c}));
+        END;
+        CREATE TRIGGER {identificador(nombre + '_update2')} AFTER UPDATE OF {c} ON {t}
+        WHEN OLD.fid = NEW.fid AND (NEW.{c} ISNULL OR ST_IsEmpty(NEW.{c}))
+        BEGIN
+          DELETE FROM {r} WHERE id = OLD.fid;
+        END;
+        CREATE TRIGGER {identificador(nombre + '_update3')} AFTER UPDATE ON {t}
+        WHEN OLD.fid != NEW.fid AND (NEW.{c} NOTNULL AND NOT ST_IsEmpty(NEW.{c}))
+        BEGIN
+          DELETE FROM {r} WHERE id = OLD.fid;
+          INSERT OR REPLACE INTO {r} VALUES (
+            NEW.fid, ST_MinX(NEW.{c}), ST_MaxX(NEW.{c}), ST_MinY(NEW.{c}), ST_MaxY(NEW.{c}));
+        END;
+        CREATE TRIGGER {identificador(nombre + '_update4')} AFTER UPDATE ON {t}
+        WHEN OLD.fid != NEW.fid AND (NEW.{c} ISNULL OR ST_IsEmpty(NEW.{c}))
+        BEGIN
+          DELETE FROM {r} WHERE id IN (OLD.fid, NEW.fid);
+        END;
+        CREATE TRIGGER {identificador(nombre + '_delete')} AFTER DELETE ON {t}
+        WHEN old.{c} NOT NULL
+        BEGIN
+          DELETE FROM {r} WHERE id = OLD.fid;
+        END;
+    ''')
+
+
+# ---------------------------------------------------------------------------
+# Copia directa
+
+def capas_sin_indice(conn):
+    # Capas de entidades registradas cuya tabla RTree todavía no existe
+    if not existe_tabla(conn, 'gpkg_geometry_columns'):
+        return []
+    return [(tabla, columna) for tabla, columna in conn.execute(
+                'SELECT table_name, column_name FROM gpkg_geometry_columns').fetchall()
+            if existe_tabla(conn, tabla) and not existe_tabla(conn, f'rtree_{tabla}_{columna}')]
+
+
+def copiar_tabla(entrada, salida, origen, destino, no_nula='T_Id'):
+    """
+    Copia la tabla `origen` de `entrada` como `destino` en `salida`,
+    descartando los registros con `no_nula` en NULL (None copia todo).
+    Devuelve el número de filas.
+    """
+    conn = conectar(salida)
+    try:
+        conn.execute('ATTACH DATABASE ? AS ent', (entrada,))
+        conn.execute('BEGIN IMMEDIATE')
+        crear_gpkg(conn)
+        filas = copiar_adjunta(conn, origen, destino, no_nula)
+        conn.execute('COMMIT')
+        return filas
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def copiar_adjunta(conn, origen, destino, no_nula='T_Id', indice=True, esquema='ent'):
+    # Copia dentro de una transacción abierta desde la base adjunta como `esquema`
+    origen = nombre_real(conn, origen, esquema)
+    geometria = columna_geometria(conn, origen, esquema)
+    if geometria is None:
+        raise ValueError(f"La tabla '{origen}' no es una capa geográfica")
+    col_geom, tipo_geom, srs_id, z, m = geometria
+    cols = columnas(conn, origen, esquema)
+
+    # Igual que QGIS: fid propio + geometría + el resto de campos (incluida la clave de origen)
+    definicion = ['"fid" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL', f'{identificador(COLUMNA_GEOMETRIA)} {tipo_geom}']
+    destino_cols = [identificador(COLUMNA_GEOMETRIA)]
+    origen_cols = [identificador(col_geom)]
+    for nombre, tipo, es_pk in cols:
+        if nombre.lower() == col_geom.lower():
+            continue
+        if nombre.lower() == 'fid':
+            destino_cols.insert(0, '"fid"')
+            origen_cols.insert(0, identificador(nombre))
+            continue
+        definicion.append(f'{identificador(nombre)} {tipo}'.rstrip())
+        destino_cols.append(identificador(nombre))
+        origen_cols.append(identificador(nombre))
+
+    if no_nula is None:
+        filtro = '1'
+    elif any(nombre.lower() == no_nula.lower() for nombre, _, _ in cols):
+        filtro = f'{identificador(no_nula)} IS NOT NULL'
+    else:
+        # La expresión de QGIS sobre un campo inexistente no selecciona nada
+        filtro = '0'
+
+    eliminar_tabla(conn, destino)
+    registrar_srs(conn, srs_id, esquema)
+    conn.execute(f'CREATE TABLE {identificador(destino)} ({", ".join(definicion)})')
+    cursor = conn.execute(
+        f'INSERT INTO {identificador(destino)} ({", ".join(destino_cols)}) '
+        f'SELECT {", ".join(origen_cols)} FROM {esquema}.{identificador(origen)} WHERE {filtro} ORDER BY rowid'
+    )
+    filas = cursor.rowcount
+    registrar_capa(conn, destino, tipo_geom, srs_id, z, m, indice=indice)
+    return filas
+
+
+def srs_tabla(ruta, tabla):
+    # Código EPSG (o srs_id si no es EPSG) de una capa de un GeoPackage
+    conn = conectar(ruta)
+    try:
+        geometria = columna_geometria(conn, tabla)
+        return srs_epsg(conn, geometria[2]) if geometria else None
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Cadenas de uniones
+
+TIPOS_CALCULADORA = {0: 'REAL', 1: 'INTEGER', 2: 'TEXT', 3: 'DATE'}
+
+
+class CamposUnion:
+    """
+    Campos de la capa que resulta de una cadena de uniones, con la misma
+    resolución de nombres que native:joinattributestable (sufijos _2, _3...).
+    """
+
+    def __init__(self):
+        self.campos = []  # [nombre, expresión SQL, tipo declarado]
+
+    def indice(self, nombre):
+        for i, campo in enumerate(self.campos):
+            if campo[0] == nombre:
+                return i
+        for i, campo in enumerate(self.campos):
+            if campo[0].lower() == nombre.lower():
+                return i
+        return -1
+
+    def expresion(self, nombre):
+        i = self.indice(nombre)
+        return self.campos[i][1] if i >= 0 else None
+
+    def agregar(self, nuevos):
+        usados = {campo[0].lower() for campo in self.campos}
+        nombres = [nombre for nombre, _, _ in nuevos]
+        for nombre, expresion, tipo in nuevos:
+            if nombre.lower() in usados:
+                sufijo = 2
+                while f'{nombre}_{sufijo}'.lower() in usados or f'{nombre}_{sufijo}' in nombres:
+                    sufijo += 1
+                nombre = f'{nombre}_{sufijo}'
+            self.campos.append([nombre, expresion, tipo])
+            usados.add(nombre.lower())
+
+    def reemplazar(self, nombre, expresion, tipo):
+        # Como la calculadora de campos: si el campo existe se sobrescribe
+        i = self.indice(nombre)
+        if i >= 0:
+            self.campos[i][1:] = [expresion, tipo]
+        else:
+            self.campos.append([nombre, expresion, tipo])
+
+
+def _buscar_columna(cols, nombre):
+    for col in cols:
+        if col[0] == nombre:
+            return col
+    for col in cols:
+        if col[0].lower() == nombre.lower():
+            return col
+    return None
+
+
+def afinidad(tipo):
+    """Afinidad de SQLite de un tipo declarado."""
+    tipo = (tipo or '').upper()
+    if 'INT' in tipo:
+        return 'INTEGER'
+    if any(texto in tipo for texto in ('CHAR', 'CLOB', 'TEXT')):
+        return 'TEXT'
+    if 'BLOB' in tipo or not tipo:
+        return 'BLOB'
+    if any(real in tipo for real in ('REAL', 'FLOA', 'DOUB')):
+        return 'REAL'
+    return 'NUMERIC'
+
+
+def _conversion_numerica(expresion):
+    # True si la expresión es entera un CAST(... AS INTEGER|REAL|NUMERIC), que siempre da un número
+    if not re.match(r'\(CAST\(', expresion, re.IGNORECASE):
+        return False
+    nivel = 0
+    comilla = None
+    for pos in range(5, len(expresion)):
+        caracter = expresion[pos]
+        if comilla:
+            comilla = None if caracter == comilla else comilla
+        elif caracter in '\'"':
+            comilla = caracter
+        elif caracter == '(':
+            nivel += 1
+        elif caracter == ')':
+            nivel -= 1
+            if nivel == 0:
+                break
+    return (pos == len(expresion) - 2 and expresion.endswith('))')
+            and re.search(r'\sAS\s+(INTEGER|REAL|NUMERIC)$', expresion[:pos], re.IGNORECASE) is not None)
+
+
+def _decodificacion(campos, op, dominios):
+    # Campos que copia una decodificación como CASE sobre el código, o None si se
+    # resuelve como unión: dominio no cargado, clave distinta de T_Id, demasiados
+    # códigos o una clave que la unión compararía con conversión de tipo.
+    dominio = dominios.dominio(op['tabla']) if dominios is not None else None
+    i = campos.indice(op['campo'])
+    if dominio is None or i < 0 or dominio.columna(op['campo_2']) != dominio.columna('T_Id'):
+        return None
+    _, clave, tipo = campos.campos[i]
+    # En la unión la clave del dominio es entera y SQLite convierte a número el otro
+    # lado; el CASE no convierte, así que la clave ya debe ser numérica
+    if clave.startswith('('):
+        if not _conversion_numerica(clave):
+            return None
+    elif afinidad(tipo) not in ('INTEGER', 'REAL', 'NUMERIC'):
+        return None
+    if op.get('campos'):
+        copiar = [dominio.columnas[j] for j in (dominio.columna(nombre) for nombre in op['campos']) if j >= 0]
+    else:
+        copiar = dominio.columnas
+    nuevos = []
+    for nombre, tipo_copia in copiar:
+        expresion = dominio.expresion(clave, nombre)
+        if expresion is None:
+            return None
+        nuevos.append((nombre, expresion, tipo_copia))
+    return nuevos
+
+
+def tipo_calculado(tipo_campo, longitud=0):
+    tipo = TIPOS_CALCULADORA.get(tipo_campo, 'TEXT')
+    if tipo == 'TEXT' and longitud:
+        return f'TEXT({longitud})'
+    return tipo
+
+
+def plan_cadena(conn, base, operaciones, esquema='ent', dominios=None):
+    """
+    Traduce una cadena de operaciones sobre la tabla `base` a una consulta.
+
+    Operaciones admitidas (en orden):
+      {'tipo': 'unir', 'campo', 'tabla', 'campo_2', 'campos'}  primer coincidente, sin descartar
+      {'tipo': 'decodificar', ...}                              lo mismo contra una tabla de dominio
+      {'tipo': 'calcular', 'campo', 'expresion', 'tipo_sql'}   {campo} se sustituye por su columna
+      {'tipo': 'filtrar', 'campo'}                              conserva los registros con campo no nulo
+
+    Crea en el esquema temp las tablas de primer coincidente de cada unión y
+    devuelve (campos, consulta SELECT, columna de geometría de la base). Con
+    `dominios`
+    (etl_dominios.Dominios) cada decodificación es un CASE sobre el código,
+    sin tabla de búsqueda; si el dominio no se puede traducir así, se une.
+    """
+    base = nombre_real(conn, base, esquema)
+    geometria = columna_geometria(conn, base, esquema)
+    if geometria is None:
+        raise ValueError(f"La tabla '{base}' no es una capa geográfica")
+    campos = CamposUnion()
+    campos.agregar([(nombre, f'b.{identificador(nombre)}', tipo)
+                    for nombre, tipo, _ in columnas(conn, base, esquema)
+                    if nombre.lower() != geometria[0].lower()])
+    uniones = []
+    filtros = []
+    for i, op in enumerate(operaciones, 1):
+        if op['tipo'] == 'decodificar':
+            decodificados = _decodificacion(campos, op, dominios)
+            if decodificados is not None:
+                campos.agregar(decodificados)
+                continue
+            op = dict(op, tipo='unir')
+        if op['tipo'] == 'unir':
+            clave = campos.expresion(op['campo'])
+            tabla = nombre_real(conn, op['tabla'], esquema)
+            geom_2 = columna_geometria(conn, tabla, esquema) if existe_tabla(conn, 'gpkg_geometry_columns', esquema) else None
+            cols = [(nombre, tipo) for nombre, tipo, _ in columnas(conn, tabla, esquema)
+                    if geom_2 is None or nombre.lower() != geom_2[0].lower()]
+            clave_2 = _buscar_columna(cols, op['campo_2'])
+            if clave is None or clave_2 is None:
+                raise ValueError(f"Campos de unión no válidos: {op['campo']} / {op['campo_2']} ({tabla})")
+            if op.get('campos'):
+                copiar = [c for c in (_buscar_columna(cols, nombre) for nombre in op['campos']) if c]
+            else:
+                copiar = cols
+            conn.execute(f'DROP TABLE IF EXISTS temp._u{i}')
+            # Primer registro (en orden de rowid) de cada valor de la clave
+            conn.execute(f'CREATE TEMP TABLE _u{i} (k {clave_2[1]}, rid INTEGER, PRIMARY KEY (k)) WITHOUT ROWID')
+            conn.execute(
+                f'INSERT OR IGNORE INTO temp._u{i} SELECT {identificador(clave_2[0])}, rowid '
+                f'FROM {esquema}.{identificador(tabla)} WHERE {identificador(clave_2[0])} IS NOT NULL ORDER BY rowid'
+            )
+            uniones.append(
+                f'LEFT JOIN temp._u{i} u{i} ON u{i}.k = {clave} '
+                f'LEFT JOIN {esquema}.{identificador(tabla)} j{i} ON j{i}.rowid = u{i}.rid'
+            )
+            campos.agregar([(nombre, f'j{i}.{identificador(nombre)}', tipo) for nombre, tipo in copiar])
+        elif op['tipo'] == 'calcular':
+            def sustituir(coincidencia):
+                return campos.expresion(coincidencia.group(1)) or 'NULL'
+            expresion = re.sub(r'\{([^{}]+)\}', sustituir, op['expresion'])
+            campos.reemplazar(op['campo'], f'({expresion})', op.get('tipo_sql', ''))
+        elif op['tipo'] == 'filtrar':
+            expresion = campos.expresion(op['campo'])
+            filtros.append(f'{expresion} IS NOT NULL' if expresion else '0')
+        else:
+            raise ValueError(f"Operación desconocida: {op['tipo']}")
+
+    seleccion = ', '.join([f'b.{identificador(geometria[0])}'] + [campo[1] for campo in campos.campos])
+    consulta = (f'SELECT {seleccion} FROM {esquema}.{identificador(base)} b {" ".join(uniones)} '
+                f'WHERE {" AND ".join(filtros) or "1"} ORDER BY b.rowid')
+    return campos, consulta, geometria
+
+
+def unir_cadena(entrada, salida, base, operaciones, destino, indice=True, dominios=None):
+    """
+    Ejecuta una cadena de uniones de tablas de `entrada` como una sola consulta
+    y escribe el resultado en la tabla `destino` de `salida` en una transacción.
+    Devuelve el número de filas escritas.
+    """
+    conn = conectar(salida)
+    try:
+        conn.execute('ATTACH DATABASE ? AS ent', (entrada,))
+        campos, consulta, geometria = plan_cadena(conn, base, operaciones, dominios=dominios)
+        _, tipo_geom, srs_id, z, m = geometria
+
+        definicion = ['"fid" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL', f'{identificador(COLUMNA_GEOMETRIA)} {tipo_geom}']
+        destino_cols = [identificador(COLUMNA_GEOMETRIA)]
+        for nombre, _, tipo in campos.campos:
+            if nombre.lower() == 'fid':
+                destino_cols.append('"fid"')
+                continue
+            definicion.append(f'{identificador(nombre)} {tipo}'.rstrip())
+            destino_cols.append(identificador(nombre))
+
+        conn.execute('BEGIN IMMEDIATE')
+        crear_gpkg(conn)
+        eliminar_tabla(conn, destino)
+        registrar_srs(conn, srs_id, 'ent')
+        conn.execute(f'CREATE TABLE {identificador(destino)} ({", ".join(definicion)})')
+        filas = conn.execute(f'INSERT INTO {identificador(destino)} ({", ".join(destino_cols)}) {consulta}').rowcount
+        registrar_capa(conn, destino, tipo_geom, srs_id, z, m, indice=indice)
+        conn.execute('COMMIT')
+        return filas
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Datos de prueba para los módulos que no dependen de QGIS.
+
+    python -m pytest -q tests
+
+Las pruebas importan el plugin como paquete (tests/ está dentro de él), así que
+se ejecutan desde el directorio del plugin o desde su directorio padre.
+"""
+import struct
+
+import pytest
+
+from .. import etl_sintetico, gpkg_sql
+
+
+SRS_ID = 0
+
+
+def punto(x, y):
+    return gpkg_sql.blob_gpkg(struct.pack('<BIdd', 1, 1, x, y), SRS_ID)
+
+
+def crear_tabla(ruta, tabla, columnas, filas, geometria=True):
+    """
+    Crea `tabla` en el GeoPackage `ruta` con `columnas` ([(nombre, tipo)]) y
+    `filas` en ese orden de rowid. Si `geometria`, cada fila recibe un punto y
+    la tabla se registra como capa.
+    """
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        conn.execute('BEGIN')
+        gpkg_sql.crear_gpkg(conn)
+        definicion = ['"fid" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL']
+        definicion += [f'{gpkg_sql.identificador(nombre)} {tipo}' for nombre, tipo in columnas]
+        nombres = [nombre for nombre, _ in columnas]
+        if geometria:
+            definicion.append(f'{gpkg_sql.identificador(gpkg_sql.COLUMNA_GEOMETRIA)} POINT')
+            nombres.append(gpkg_sql.COLUMNA_GEOMETRIA)
+            filas = [tuple(fila) + (punto(i, i),) for i, fila in enumerate(filas)]
+        conn.execute(f'CREATE TABLE {gpkg_sql.identificador(tabla)} ({", ".join(definicion)})')
+        conn.executemany(f'INSERT INTO {gpkg_sql.identificador(tabla)} ({", ".join(map(gpkg_sql.identificador, nombres))}) '
+                         f'VALUES ({", ".join("?" * len(nombres))})', filas)
+        if geometria:
+            gpkg_sql.registrar_capa(conn, tabla, 'POINT', SRS_ID, indice=False)
+        else:
+            conn.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier) VALUES (?, 'attributes', ?)",
+                         (tabla, tabla))
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+
+def leer(ruta, tabla, columnas):
+    """Valores de `columnas` de `tabla` en orden de fid."""
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        seleccion = ', '.join(map(gpkg_sql.identificador, columnas))
+        return conn.execute(f'SELECT {seleccion} FROM {gpkg_sql.identificador(tabla)} ORDER BY fid').fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def entrada(tmp_path):
+    """
+    GeoPackage con una capa base `base` y las tablas que se le unen:
+    `detalle` con claves repetidas, el dominio `clasetipo` (pocos códigos) y
+    el dominio `grandetipo` (más códigos de los que se traducen con CASE).
+    """
+    ruta = str(tmp_path / 'entrada.gpkg')
+    crear_tabla(ruta, 'base', [('T_Id', 'INTEGER'), ('ref', 'INTEGER'), ('clase', 'INTEGER'),
+                               ('clase_texto', 'TEXT'), ('nombre', 'TEXT')], [
+        (1, 10, 1, '1', 'uno'),
+        (2, 20, 2, '2', 'dos'),
+        (3, None, None, None, 'sin clave'),
+        (4, 99, 7, '7', 'huérfano'),
+        (5, 10, 3, '3', 'repetido'),
+    ])
+    # Claves repetidas: gana la primera fila en orden de rowid, no la de menor valor
+    crear_tabla(ruta, 'detalle', [('T_Id', 'INTEGER'), ('nombre', 'TEXT'), ('valor', 'REAL')], [
+        (10, 'primero', 1.5),
+        (20, 'veinte', 2.5),
+        (10, 'segundo', 0.5),
+        (None, 'nulo', 9.0),
+    ], geometria=False)
+    crear_tabla(ruta, 'clasetipo', [('T_Id', 'INTEGER'), ('iliCode', 'TEXT'), ('dispName', 'TEXT')], [
+        (2, 'Clase.B', 'B'),
+        (1, 'Clase.A', 'A'),
+        (3, 'Clase.C', 'C'),
+        (1, 'Clase.A_repetida', 'A repetida'),
+    ], geometria=False)
+    crear_tabla(ruta, 'grandetipo', [('T_Id', 'INTEGER'), ('iliCode', 'TEXT')],
+                [(codigo, f'Grande.{codigo}') for codigo in range(1, 31)], geometria=False)
+    return ruta
+
+
+@pytest.fixture(scope='session')
+def sinteticos(tmp_path_factory):
+    """Entradas sintéticas pequeñas de los tres modelos, con nulos y llaves huérfanas."""
+    directorio = tmp_path_factory.mktemp('sinteticos')
+    rutas = {}
+    for modelo in etl_sintetico.ESQUEMAS:
+        rutas[modelo] = str(directorio / f'{modelo}.gpkg')
+        etl_sintetico.generar(modelo, rutas[modelo], 300, nulos=0.05, huerfanos=0.05, invalidas=0.02, semilla=7)
+    return rutas
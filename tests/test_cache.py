@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+
+import pytest
+
+from .. import etl_cache
+from .conftest import crear_tabla
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 0.0
+
+    def time(self):
+        self.ahora += 1
+        return self.ahora
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # Un reloj que avanza en cada llamada: el orden de uso no depende de la resolución del sistema
+    monkeypatch.setattr(etl_cache, 'time', Reloj())
+    return etl_cache.CacheETL(str(tmp_path / 'cache'), limite=10 ** 9)
+
+
+def _resultado(directorio, nombre):
+    ruta = str(directorio / f'{nombre}.gpkg')
+    crear_tabla(ruta, nombre, [('T_Id', 'INTEGER')], [(i,) for i in range(50)])
+    return {'OUTPUT': f'{ruta}|layername={nombre}', 'RUTA': ruta, 'TABLA': nombre}
+
+
+def _copias(cache):
+    return [archivo for archivo in os.listdir(cache.directorio) if archivo.endswith('.gpkg')]
+
+
+def test_guardar_y_obtener(cache, tmp_path):
+    original = _resultado(tmp_path, 'a')
+    guardado = cache.guardar('clave_a', original)
+    assert guardado['RUTA'].startswith(cache.directorio) and guardado['TABLA'] == 'a'
+    assert guardado['OUTPUT'] == f"{guardado['RUTA']}|layername=a"
+    assert cache.obtener('clave_a') == guardado
+    # La copia no depende del intermedio original
+    os.remove(original['RUTA'])
+    assert os.path.isfile(cache.obtener('clave_a')['RUTA'])
+    assert cache.obtener('otra') is None
+
+
+def test_resultado_sin_archivo_no_se_guarda(cache):
+    resultado = {'OUTPUT': 'memory:capa'}
+    assert cache.guardar('clave', resultado) == resultado
+    assert cache.obtener('clave') is None
+
+
+def test_entrada_sin_archivo_se_descarta(cache, tmp_path):
+    guardado = cache.guardar('clave_a', _resultado(tmp_path, 'a'))
+    os.remove(guardado['RUTA'])
+    assert cache.obtener('clave_a') is None
+    conn = sqlite3.connect(os.path.join(cache.directorio, 'indice.sqlite'))
+    try:
+        assert conn.execute('SELECT count(*) FROM entradas').fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+def test_recortar_desaloja_las_menos_usadas(cache, tmp_path):
+    rutas = {nombre: cache.guardar(f'clave_{nombre}', _resultado(tmp_path, nombre))['RUTA'] for nombre in 'abc'}
+    assert cache.recortar() == 0
+    # `a` se usó después de `b`: con espacio para dos entradas sale `b`, la usada hace más tiempo
+    cache.obtener('clave_a')
+    cache.limite = 2 * os.path.getsize(rutas['a'])
+    assert cache.recortar() == 1
+    assert cache.obtener('clave_b') is None and not os.path.exists(rutas['b'])
+    assert cache.obtener('clave_a') is not None and cache.obtener('clave_c') is not None
+
+    cache.limite = 0
+    assert cache.recortar() == 2
+    assert _copias(cache) == []
+
+
+def test_vaciar(cache, tmp_path):
+    for nombre in 'ab':
+        cache.guardar(f'clave_{nombre}', _resultado(tmp_path, nombre))
+    cache.vaciar()
+    assert cache.obtener('clave_a') is None and cache.obtener('clave_b') is None
+    assert _copias(cache) == []
+
+
+def test_clave_cambia_con_el_contenido_de_la_fuente(cache, tmp_path):
+    # Un intercambio de valores del mismo largo en col_uebaunit cambia el primer
+    # coincidente de las uniones: la clave debe cambiar aunque no cambie el tamaño
+    entrada = str(tmp_path / 'entrada.gpkg')
+    crear_tabla(entrada, 'col_uebaunit', [('ue_lc_terreno', 'INTEGER'), ('baunit', 'INTEGER')],
+                [(1, 10), (2, 20), (3, 30)], geometria=False)
+
+    def clave():
+        return etl_cache.clave({'tipo': 'unir', 'tabla': {'tabla': 'col_uebaunit',
+                                                          'huella': etl_cache.huella_tabla(entrada, 'col_uebaunit')}})
+
+    anterior = clave()
+    cache.guardar(anterior, _resultado(tmp_path, 'unida'))
+    assert clave() == anterior and cache.obtener(clave()) is not None
+
+    conn = sqlite3.connect(entrada)
+    try:
+        conn.execute('UPDATE col_uebaunit SET baunit = 30 - baunit + 10 WHERE baunit IN (10, 30)')
+        conn.commit()
+    finally:
+        conn.close()
+    assert clave() != anterior
+    assert cache.obtener(clave()) is None
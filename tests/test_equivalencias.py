@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Los caminos alternativos del motor directo deben escribir las mismas capas:
+decodificación con CASE o con unión, y un resultado recuperado de la caché o
+recalculado.
+Se comparan con etl_huella sobre las entradas sintéticas de los tres modelos.
+"""
+import pytest
+
+from .. import etl_cache, etl_huella, etl_sintetico, gpkg_sql
+from ..etl_dominios import Dominios
+
+
+def _cadena(modelo):
+    # Terreno -> col_uebaunit -> predio -> tipo de predio -> derecho -> tipo de derecho
+    esquema = etl_sintetico.ESQUEMAS[modelo]
+    terreno, predio, derecho = esquema['terreno'][0], esquema['predio'][0], esquema['derecho'][0]
+    dominios = {valores is etl_sintetico.DERECHO_TIPO: tabla for tabla, valores in esquema['dominios'].items()}
+    return terreno, [
+        {'tipo': 'unir', 'campo': 'T_Id', 'tabla': esquema['uebaunit'][0], 'campo_2': f'ue_{terreno}',
+         'campos': ['baunit']},
+        {'tipo': 'unir', 'campo': 'baunit', 'tabla': predio, 'campo_2': 'T_Id', 'campos': ['T_Id', 'tipo']},
+        {'tipo': 'decodificar', 'campo': 'tipo', 'tabla': 'col_unidadadministrativabasicatipo', 'campo_2': 'T_Id',
+         'campos': ['iliCode']},
+        {'tipo': 'unir', 'campo': 'T_Id_2', 'tabla': derecho, 'campo_2': 'unidad', 'campos': ['tipo']},
+        # En ladm_1_0 el tipo de derecho es texto: la decodificación vuelve a la unión
+        {'tipo': 'decodificar', 'campo': 'tipo_2', 'tabla': dominios[True], 'campo_2': 'T_Id',
+         'campos': ['iliCode']},
+        {'tipo': 'calcular', 'campo': 'derecho', 'expresion': "{iliCode} || '/' || {iliCode_2}", 'tipo_sql': 'TEXT'},
+    ]
+
+
+def _huella(ruta, tabla):
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        return etl_huella.huella_tabla(conn, tabla)['huella']
+    finally:
+        conn.close()
+
+
+def _ejecutar(entrada, salida, modelo, **opciones):
+    base, operaciones = _cadena(modelo)
+    filas = gpkg_sql.unir_cadena(entrada, str(salida), base, operaciones, 'cadena', indice=False, **opciones)
+    return filas, _huella(str(salida), 'cadena')
+
+
+@pytest.mark.parametrize('modelo', sorted(etl_sintetico.ESQUEMAS))
+def test_caminos_de_la_cadena_son_equivalentes(sinteticos, tmp_path, modelo):
+    entrada = sinteticos[modelo]
+    filas, referencia = _ejecutar(entrada, tmp_path / 'union.gpkg', modelo)
+
+    base, _ = _cadena(modelo)
+    conn = gpkg_sql.conectar(entrada)
+    try:
+        # Ningún registro se descarta por llaves nulas o huérfanas
+        assert filas == conn.execute(f'SELECT count(*) FROM {gpkg_sql.identificador(base)}').fetchone()[0]
+    finally:
+        conn.close()
+    conn = gpkg_sql.conectar(str(tmp_path / 'union.gpkg'))
+    try:
+        assert conn.execute('SELECT count(*) FROM cadena WHERE baunit IS NOT NULL AND T_Id_2 IS NULL').fetchone()[0]
+    finally:
+        conn.close()
+
+    assert _ejecutar(entrada, tmp_path / 'dominios.gpkg', modelo, dominios=Dominios(entrada)) == (filas, referencia)
+
+
+def test_resultado_de_la_cache_es_equivalente(sinteticos, tmp_path):
+    entrada = sinteticos['ladm_1_2']
+    cache = etl_cache.CacheETL(str(tmp_path / 'cache'))
+    clave = etl_cache.clave({'paso': 'cadena', 'entrada': etl_cache.huella_tabla(entrada, 'lc_terreno')})
+    assert cache.obtener(clave) is None
+
+    # Primera ejecución: se calcula y se guarda; segunda: se recupera sin calcular
+    ruta = str(tmp_path / 'calculado.gpkg')
+    _, calculado = _ejecutar(entrada, ruta, 'ladm_1_2')
+    guardado = cache.guardar(clave, {'OUTPUT': f'{ruta}|layername=cadena', 'RUTA': ruta, 'TABLA': 'cadena'})
+    recuperado = cache.obtener(clave)
+    assert recuperado == guardado and recuperado['RUTA'] != ruta
+    assert _huella(recuperado['RUTA'], recuperado['TABLA']) == calculado
+
+    # Sin caché, otra ejecución da la misma capa
+    _, sin_cache = _ejecutar(entrada, tmp_path / 'sin_cache.gpkg', 'ladm_1_2')
+    assert sin_cache == calculado
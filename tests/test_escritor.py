@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+
+import pytest
+
+from .. import gpkg_sql
+from ..etl_escritor import EscritorGpkg
+from .conftest import SRS_ID, leer, punto
+
+
+@pytest.fixture
+def salida(tmp_path):
+    return str(tmp_path / 'salida.gpkg')
+
+
+@pytest.fixture
+def escritor(salida):
+    escritor = EscritorGpkg(salida, diario='WAL')
+    yield escritor
+    escritor.cerrar()
+
+
+def _consultar(ruta, sentencia, *parametros):
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        return conn.execute(sentencia, parametros).fetchall()
+    finally:
+        conn.close()
+
+
+def _capas_sin_indice(ruta):
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        return gpkg_sql.capas_sin_indice(conn)
+    finally:
+        conn.close()
+
+
+def _srs(ruta):
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        return gpkg_sql.fila_srs(conn, SRS_ID)
+    finally:
+        conn.close()
+
+
+def test_copiar(entrada, salida, escritor):
+    assert escritor.copiar(entrada, 'BASE', 'copia') == 5
+    assert escritor.capas == 1
+    assert leer(salida, 'copia', ['T_Id', 'nombre']) == leer(entrada, 'base', ['T_Id', 'nombre'])
+    assert _consultar(salida, 'SELECT data_type, srs_id FROM gpkg_contents WHERE table_name = ?', 'copia') == [
+        ('features', SRS_ID)]
+
+    # Reescribir una capa la reemplaza
+    assert escritor.copiar(entrada, 'base', 'copia', no_nula='ref') == 4
+    assert leer(salida, 'copia', ['T_Id']) == [(1,), (2,), (4,), (5,)]
+    with pytest.raises(ValueError, match='geográfica'):
+        escritor.copiar(entrada, 'detalle', 'otra')
+
+
+def test_crear_capa_e_insertar_por_lotes(salida, entrada, escritor):
+    escritor.crear_capa('capa', [('T_Id', 'INTEGER'), ('nombre', 'TEXT')], 'POINT', _srs(entrada))
+    filas = [(punto(i, i), i, f'n{i}') for i in range(7)]
+    assert escritor.insertar_filas('capa', ['geom', 'T_Id', 'nombre'], filas, lote=3) == 7
+    assert leer(salida, 'capa', ['T_Id', 'nombre']) == [(i, f'n{i}') for i in range(7)]
+    assert _consultar(salida, 'SELECT geometry_type_name FROM gpkg_geometry_columns WHERE table_name = ?',
+                      'capa') == [('POINT',)]
+
+
+def test_transaccion_fallida_no_deja_cambios(salida, escritor):
+    escritor.ejecutar_sql('CREATE TABLE t (x INTEGER);\nINSERT INTO t VALUES (1);\n')
+    with pytest.raises(sqlite3.OperationalError):
+        escritor.ejecutar_sql('INSERT INTO t VALUES (2);\nINSERT INTO no_existe VALUES (3);\n')
+    assert _consultar(salida, 'SELECT x FROM t') == [(1,)]
+
+
+def test_indices_al_finalizar(entrada, salida, escritor):
+    escritor.copiar(entrada, 'base', 'copia')
+    escritor.crear_capa('vacia', [], 'POINT', _srs(entrada))
+    # Mientras se escribe: WAL y sin índices espaciales
+    assert os.path.exists(f'{salida}-wal')
+    assert sorted(tabla for tabla, _ in _capas_sin_indice(salida)) == ['copia', 'vacia']
+
+    escritor.finalizar()
+    assert _capas_sin_indice(salida) == []
+    assert _consultar(salida, 'SELECT count(*) FROM rtree_copia_geom') == [(5,)]
+    assert _consultar(salida, "SELECT count(*) FROM gpkg_extensions WHERE extension_name = 'gpkg_rtree_index'") == [
+        (2,)]
+    # Al cerrar vuelve al diario por defecto: el archivo queda autocontenido
+    assert not os.path.exists(f'{salida}-wal') and not os.path.exists(f'{salida}-shm')
+    assert _consultar(salida, 'PRAGMA journal_mode') == [('delete',)]
+    with pytest.raises(RuntimeError, match='cerró'):
+        escritor.copiar(entrada, 'base', 'otra')
+    escritor.cerrar()
+
+
+def test_diario_y_cache(salida, monkeypatch):
+    monkeypatch.setenv('VALIDADORES_ETL_DIARIO', 'TRUNCATE')
+    escritor = EscritorGpkg(salida, cache_kb=1024)
+    try:
+        assert escritor._conn.execute('PRAGMA journal_mode').fetchone() == ('truncate',)
+        assert escritor._conn.execute('PRAGMA cache_size').fetchone() == (-1024,)
+        # 1 = FILE
+        assert escritor._conn.execute('PRAGMA temp_store').fetchone() == (1,)
+    finally:
+        escritor.cerrar()
+    assert _consultar(salida, 'PRAGMA journal_mode') == [('delete',)]
+
+
+def _desplazar(blobs):
+    # Mueve cada punto una unidad en x
+    return [punto(minx + 1, miny) for minx, _, miny, _ in map(gpkg_sql.envolvente, blobs)]
+
+
+def test_copiar_transformada(entrada, salida, escritor):
+    lotes = []
+
+    def transformar(blobs):
+        lotes.append(len(blobs))
+        return _desplazar(blobs)
+
+    assert escritor.copiar_transformada(entrada, 'base', 'movida', transformar, _srs(entrada), lote=2) == 5
+    assert lotes == [2, 2, 1]
+    assert escritor.capas == 1
+    assert [gpkg_sql.envolvente(blob)[:1] for blob, in leer(salida, 'movida', ['geom'])] == [
+        (1.0,), (2.0,), (3.0,), (4.0,), (5.0,)]
+    assert leer(salida, 'movida', ['T_Id', 'nombre']) == leer(entrada, 'base', ['T_Id', 'nombre'])
+    # Siempre se escriben geometrías múltiples
+    assert _consultar(salida, 'SELECT geometry_type_name FROM gpkg_geometry_columns WHERE table_name = ?',
+                      'movida') == [('MULTIPOINT',)]
+
+
+def test_copiar_transformada_descarta_la_capa_si_falla(entrada, salida, escritor):
+    escritor.copiar(entrada, 'base', 'intacta')
+    llamadas = []
+
+    def transformar(blobs):
+        llamadas.append(len(blobs))
+        if len(llamadas) == 2:
+            raise ValueError('geometría imposible')
+        return blobs
+
+    with pytest.raises(ValueError, match='imposible'):
+        escritor.copiar_transformada(entrada, 'base', 'a_medias', transformar, _srs(entrada), lote=2)
+    # El primer lote ya se había confirmado: la capa entera se elimina
+    assert escritor.capas == 1
+    conn = gpkg_sql.conectar(salida)
+    try:
+        assert not gpkg_sql.existe_tabla(conn, 'a_medias')
+        assert conn.execute("SELECT count(*) FROM gpkg_contents WHERE table_name = 'a_medias'").fetchone() == (0,)
+        assert conn.execute("SELECT count(*) FROM gpkg_geometry_columns WHERE table_name = 'a_medias'").fetchone() == (0,)
+    finally:
+        conn.close()
+
+    # El escritor sigue disponible y las demás capas no cambian
+    assert leer(salida, 'intacta', ['T_Id']) == [(i,) for i in range(1, 6)]
+    escritor.copiar_transformada(entrada, 'base', 'a_medias', lambda blobs: blobs, _srs(entrada))
+    assert escritor.capas == 2
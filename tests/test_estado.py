@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import sqlite3
+
+import pytest
+
+from .. import gpkg_sql
+from ..etl_estado import TABLA, EstadoEjecucion
+from ..etl_grafo import ErrorPaso, GrafoETL, Paso, ejecutar_grafo
+from .conftest import crear_tabla, leer
+
+
+def _escribir(ruta, tabla, valores):
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        if gpkg_sql.existe_tabla(conn, tabla):
+            gpkg_sql.eliminar_tabla(conn, tabla)
+    finally:
+        conn.close()
+    crear_tabla(ruta, tabla, [('valor', 'TEXT')], [(valor,) for valor in valores])
+
+
+def _editar(ruta, sentencia):
+    conn = sqlite3.connect(ruta)
+    try:
+        conn.execute(sentencia)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class Ejecucion:
+    """
+    Grafo intermedio -> salida -> modificar -> final como el del ETL: el
+    intermedio va al directorio de trabajo, `salida` escribe una tabla de la
+    salida y `modificar` la reescribe. `fallar` hace fallar un paso.
+    """
+
+    def __init__(self, tmp_path):
+        self.directorio = str(tmp_path / 'salida.gpkg-etl')
+        self.salida = str(tmp_path / 'salida.gpkg')
+        self.intermedio = f'{self.directorio}/intermedio.gpkg'
+        self.firmas = {'intermedio': 'f1', 'salida': 'f2', 'modificar': 'f3', 'final': 'f4'}
+
+    def _intermedio(self, entradas):
+        _escribir(self.intermedio, 'intermedio', ['uno', 'dos'])
+        return {'OUTPUT': f'{self.intermedio}|layername=intermedio'}
+
+    def _salida(self, entradas):
+        valores = [valor.upper() for valor, in leer(self.intermedio, 'intermedio', ['valor'])]
+        _escribir(self.salida, 'capa', valores)
+        return {'OUTPUT': 'capa'}
+
+    def _modificar(self, entradas):
+        _editar(self.salida, "UPDATE capa SET valor = valor || '!'")
+        return {'OUTPUT': 'capa'}
+
+    def _final(self, entradas):
+        _escribir(self.salida, 'final', [valor for valor, in leer(self.salida, 'capa', ['valor'])])
+        return {'OUTPUT': 'final'}
+
+    def ejecutar(self, reanudar=False, fallar=None):
+        estado = EstadoEjecucion(self.directorio, reanudar)
+        ejecutados = []
+        escritas = {'intermedio': (self.intermedio, 'intermedio'), 'salida': (self.salida, 'capa'),
+                    'modificar': (self.salida, 'capa'), 'final': (self.salida, 'final')}
+        anterior = None
+        grafo = GrafoETL()
+        for nombre in ('intermedio', 'salida', 'modificar', 'final'):
+            def funcion(entradas, nombre=nombre, calcular=getattr(self, f'_{nombre}')):
+                ejecutados.append(nombre)
+                if nombre == fallar:
+                    raise RuntimeError('interrumpida')
+                return calcular(entradas)
+            grafo.agregar(Paso(nombre, estado.envolver(nombre, lambda nombre=nombre: self.firmas[nombre], funcion,
+                                                       lambda resultado, nombre=nombre: [escritas[nombre]]),
+                               depende=[anterior] if anterior else []))
+            anterior = nombre
+        try:
+            ejecutar_grafo(grafo, max_hilos=2)
+        finally:
+            self.recuperados = estado.recuperados
+        return ejecutados
+
+
+@pytest.fixture
+def ejecucion(tmp_path):
+    ejecucion = Ejecucion(tmp_path)
+    with pytest.raises(ErrorPaso):
+        ejecucion.ejecutar(fallar='final')
+    return ejecucion
+
+
+def test_reanudar_no_repite_los_pasos_completados(ejecucion):
+    assert ejecucion.ejecutar(reanudar=True) == ['final']
+    assert ejecucion.recuperados == {'intermedio', 'salida', 'modificar'}
+    # La tabla que reescribió `modificar` no hace repetir a `salida`
+    assert leer(ejecucion.salida, 'final', ['valor']) == [('UNO!',), ('DOS!',)]
+
+
+def test_sin_reanudar_se_repite_todo(ejecucion):
+    assert ejecucion.ejecutar() == ['intermedio', 'salida', 'modificar', 'final']
+    assert ejecucion.recuperados == set()
+
+
+def test_intermedio_cambiado_se_repite(ejecucion):
+    # Mismas filas y mismo largo: solo la huella del contenido lo detecta
+    _editar(ejecucion.intermedio, "UPDATE intermedio SET valor = 'una' WHERE valor = 'uno'")
+    assert ejecucion.ejecutar(reanudar=True) == ['intermedio', 'salida', 'modificar', 'final']
+    assert leer(ejecucion.salida, 'final', ['valor']) == [('UNO!',), ('DOS!',)]
+
+
+def test_salida_cambiada_se_repite(ejecucion):
+    # Una reescritura interrumpida de `capa` (aquí, una fila de menos)
+    _editar(ejecucion.salida, 'DELETE FROM capa WHERE fid = 2')
+    assert ejecucion.ejecutar(reanudar=True) == ['salida', 'modificar', 'final']
+    assert ejecucion.recuperados == {'intermedio'}
+
+
+def test_archivo_borrado_se_repite(ejecucion):
+    os.remove(ejecucion.intermedio)
+    assert ejecucion.ejecutar(reanudar=True) == ['intermedio', 'salida', 'modificar', 'final']
+
+
+def test_firma_distinta_se_repite(ejecucion):
+    ejecucion.firmas['modificar'] = 'otra'
+    assert ejecucion.ejecutar(reanudar=True) == ['modificar', 'final']
+    assert leer(ejecucion.salida, 'final', ['valor']) == [('UNO!!',), ('DOS!!',)]
+
+
+def test_diario_con_numero_de_filas(ejecucion):
+    # Diario de una versión anterior: guardaba filas en lugar de huellas
+    conn = sqlite3.connect(f'{ejecucion.directorio}/estado.sqlite')
+    try:
+        for paso, tablas in conn.execute(f'SELECT paso, tablas FROM {TABLA}').fetchall():
+            filas = [[ruta, tabla, 2] for ruta, tabla, _ in json.loads(tablas)]
+            conn.execute(f'UPDATE {TABLA} SET tablas = ? WHERE paso = ?', (json.dumps(filas), paso))
+        conn.commit()
+    finally:
+        conn.close()
+    assert ejecucion.ejecutar(reanudar=True) == ['intermedio', 'salida', 'modificar', 'final']
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Corrección y reproyección con shapely y pyproj. Los sistemas de QGIS se
+reemplazan por un objeto con authid() y toWkt(), lo único que se les pide en
+ese camino.
+"""
+import struct
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+shapely = pytest.importorskip('shapely', minversion='2.0')
+pyproj = pytest.importorskip('pyproj')
+
+from .. import etl_geometria, gpkg_sql  # noqa: E402
+
+
+class Crs:
+    def __init__(self, authid):
+        self._authid = authid
+
+    def authid(self):
+        return self._authid
+
+    def toWkt(self):
+        return pyproj.CRS(self._authid).to_wkt()
+
+
+def _blob(wkt, srs_id=3116):
+    return gpkg_sql.blob_gpkg(shapely.to_wkb(shapely.from_wkt(wkt)), srs_id)
+
+
+def _geometria(blob):
+    return shapely.from_wkb(gpkg_sql.wkb(blob))
+
+
+CUADRADO = 'POLYGON ((0 0, 2 0, 2 2, 0 2, 0 0))'
+# Polígono en moño: se corrige en dos polígonos
+MONO = 'POLYGON ((0 0, 2 2, 2 0, 0 2, 0 0))'
+# Polígono con una espiga: make_valid da una colección de polígono y línea
+ESPIGA = 'POLYGON ((0 0, 2 0, 2 2, 3 3, 2 2, 0 2, 0 0))'
+# Polígono sin área: solo quedan líneas y se descarta
+PLANO = 'POLYGON ((0 0, 1 1, 2 2, 0 0))'
+
+
+def test_corrige_solo_las_invalidas():
+    ajuste = etl_geometria.AjusteGeometrias(Crs('EPSG:3116'), Crs('EPSG:3116'), 3116)
+    assert ajuste.transformador is None and ajuste.transformacion is None
+    blobs = [_blob(CUADRADO), _blob(MONO), None, _blob(ESPIGA), _blob(PLANO)]
+    cuadrado, mono, nula, espiga, plano = ajuste(blobs)
+
+    assert ajuste.resumen() == {'invalidas': 3, 'corregidas': 2, 'descartadas': 1}
+    # La válida pasa sin cambios, solo como geometría múltiple
+    assert gpkg_sql.wkb(cuadrado) == etl_geometria.a_multiple(gpkg_sql.wkb(blobs[0]))
+    assert shapely.get_type_id(_geometria(mono)) == 6
+    assert shapely.is_valid(_geometria(mono)) and shapely.area(_geometria(mono)) == pytest.approx(2.0)
+    # De la colección solo queda la parte de la misma dimensión
+    assert shapely.equals(_geometria(espiga), shapely.from_wkt(CUADRADO))
+    assert nula is None and plano is None
+
+
+def test_lote_sin_invalidas():
+    ajuste = etl_geometria.AjusteGeometrias(Crs('EPSG:3116'), Crs('EPSG:3116'), 3116)
+    assert ajuste([None, None]) == [None, None]
+    assert len(ajuste([_blob(CUADRADO)] * 3)) == 3
+    assert ajuste.resumen() == {'invalidas': 0, 'corregidas': 0, 'descartadas': 0}
+
+
+def test_reproyecta_como_pyproj():
+    origen, destino = Crs('EPSG:3116'), Crs('EPSG:9377')
+    ajuste = etl_geometria.AjusteGeometrias(origen, destino, 9377)
+    assert ajuste.transformador is etl_geometria.transformador('EPSG:3116', 'EPSG:9377')
+
+    wkts = ['POINT (1000000 1000000)',
+            'LINESTRING (1000000 1000000, 1000100 1000050, 1000200 999900)',
+            'POLYGON ((1000000 1000000, 1000100 1000000, 1000100 1000100, 1000000 1000100, 1000000 1000000), '
+            '(1000010 1000010, 1000020 1000010, 1000020 1000020, 1000010 1000010))',
+            'MULTIPOINT Z ((1000000 1000000 5), (1000300 1000300 7))',
+            'POLYGON ((1000000 1000000, 1000002 1000002, 1000002 1000000, 1000000 1000002, 1000000 1000000))']
+    resultado = ajuste([_blob(wkt) for wkt in wkts])
+
+    directo = pyproj.Transformer.from_crs('EPSG:3116', 'EPSG:9377', always_xy=True)
+    for wkt, blob in zip(wkts, resultado):
+        assert struct.unpack_from('<i', blob, 4)[0] == 9377
+        geometria = _geometria(blob)
+        assert shapely.get_type_id(geometria) in (4, 5, 6)
+        original = shapely.from_wkt(wkt)
+        if not shapely.is_valid(original):
+            original = shapely.make_valid(original)
+        esperado = shapely.transform(original, lambda xy: numpy.column_stack(directo.transform(xy[:, 0], xy[:, 1])))
+        assert numpy.allclose(shapely.get_coordinates(geometria), shapely.get_coordinates(esperado), rtol=0,
+                              atol=1e-6)
+        # La Z no se transforma
+        assert numpy.array_equal(shapely.get_coordinates(geometria, include_z=True)[:, 2:],
+                                 shapely.get_coordinates(original, include_z=True)[:, 2:], equal_nan=True)
+
+
+def test_mismo_sistema_no_se_transforma():
+    assert etl_geometria.mismo_crs(Crs('EPSG:9377'), Crs('EPSG:9377'))
+    assert not etl_geometria.mismo_crs(Crs('EPSG:3116'), Crs('EPSG:9377'))
+    # Sin código de autoridad solo cuenta la igualdad
+    assert not etl_geometria.mismo_crs(Crs(''), Crs(''))
+
+    ajuste = etl_geometria.AjusteGeometrias(Crs('EPSG:9377'), Crs('EPSG:9377'), 9377)
+    blob = _blob('POINT (4880524.25 2065965.5)', 9377)
+    assert shapely.get_coordinates(_geometria(ajuste([blob])[0])).tolist() == [[4880524.25, 2065965.5]]
+
+
+@pytest.mark.parametrize('orden', ['<', '>'])
+def test_a_multiple(orden):
+    byte = b'\x01' if orden == '<' else b'\x00'
+    punto = byte + struct.pack(orden + 'Idd', 1, 3.0, 4.0)
+    multiple = etl_geometria.a_multiple(punto)
+    assert multiple == byte + struct.pack(orden + 'II', 4, 1) + punto
+    assert shapely.from_wkb(multiple).equals(shapely.from_wkt('MULTIPOINT (3 4)'))
+
+    # Z en el estilo ISO (1001) y ya múltiple
+    punto_z = byte + struct.pack(orden + 'Iddd', 1001, 3.0, 4.0, 5.0)
+    assert struct.unpack_from(orden + 'I', etl_geometria.a_multiple(punto_z), 1)[0] == 1004
+    assert etl_geometria.a_multiple(multiple) == multiple
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from .. import gpkg_sql
+from ..etl_dominios import Dominios
+from .conftest import leer
+
+
+def _unir(entrada, tmp_path, operaciones, dominios=None):
+    tmp_path.mkdir(exist_ok=True)
+    salida = str(tmp_path / 'salida.gpkg')
+    filas = gpkg_sql.unir_cadena(entrada, salida, 'base', operaciones, 'resultado', indice=False, dominios=dominios)
+    return salida, filas
+
+
+def _plan(entrada, operaciones, dominios=None):
+    conn = gpkg_sql.conectar(':memory:')
+    try:
+        conn.execute('ATTACH DATABASE ? AS ent', (entrada,))
+        campos, consulta, _ = gpkg_sql.plan_cadena(conn, 'base', operaciones, dominios=dominios)
+        return [nombre for nombre, _, _ in campos.campos], consulta
+    finally:
+        conn.close()
+
+
+UNIR_DETALLE = {'tipo': 'unir', 'campo': 'ref', 'tabla': 'detalle', 'campo_2': 'T_Id', 'campos': ['nombre', 'valor']}
+
+
+def test_unir_toma_el_primer_coincidente_en_orden_de_rowid(entrada, tmp_path):
+    salida, filas = _unir(entrada, tmp_path, [UNIR_DETALLE])
+    assert filas == 5
+    assert leer(salida, 'resultado', ['T_Id', 'nombre_2', 'valor']) == [
+        (1, 'primero', 1.5),
+        (2, 'veinte', 2.5),
+        (3, None, None),
+        (4, None, None),
+        (5, 'primero', 1.5),
+    ]
+
+
+def test_unir_conserva_claves_nulas_y_huerfanas(entrada, tmp_path):
+    # La clave nula no coincide con la fila de `detalle` sin T_Id y la huérfana
+    # (99) no descarta el registro: ambos quedan con los campos unidos en NULL
+    salida, _ = _unir(entrada, tmp_path, [UNIR_DETALLE])
+    assert leer(salida, 'resultado', ['nombre', 'ref', 'nombre_2']) == [
+        ('uno', 10, 'primero'),
+        ('dos', 20, 'veinte'),
+        ('sin clave', None, None),
+        ('huérfano', 99, None),
+        ('repetido', 10, 'primero'),
+    ]
+
+
+def test_filtrar_descarta_los_registros_sin_coincidencia(entrada, tmp_path):
+    operaciones = [UNIR_DETALLE, {'tipo': 'filtrar', 'campo': 'nombre_2'}]
+    salida, filas = _unir(entrada, tmp_path, operaciones)
+    assert filas == 3
+    assert leer(salida, 'resultado', ['T_Id']) == [(1,), (2,), (5,)]
+
+
+def test_unir_renombra_los_campos_repetidos(entrada):
+    nombres, _ = _plan(entrada, [UNIR_DETALLE, UNIR_DETALLE])
+    assert nombres == ['fid', 'T_Id', 'ref', 'clase', 'clase_texto', 'nombre', 'nombre_2', 'valor', 'nombre_3', 'valor_2']
+
+
+def test_campos_union_sufijos():
+    campos = gpkg_sql.CamposUnion()
+    campos.agregar([('T_Id', 'b.t', 'INTEGER'), ('nombre', 'b.n', 'TEXT')])
+    # Sin distinguir mayúsculas
+    campos.agregar([('NOMBRE', 'j.n', 'TEXT'), ('t_id', 'j.t', 'INTEGER')])
+    # Sin chocar con un nombre que llega en la misma unión
+    campos.agregar([('nombre', 'k.n', 'TEXT'), ('nombre_3', 'k.n3', 'TEXT')])
+    assert [nombre for nombre, _, _ in campos.campos] == ['T_Id', 'nombre', 'NOMBRE_2', 't_id_2', 'nombre_4',
+                                                          'nombre_3']
+    assert campos.expresion('nombre_3') == 'k.n3'
+    assert campos.expresion('Nombre') == 'b.n'
+
+
+def test_calcular_sobrescribe_y_sustituye_campos(entrada, tmp_path):
+    operaciones = [UNIR_DETALLE,
+                   {'tipo': 'calcular', 'campo': 'valor', 'expresion': '{valor} * 2', 'tipo_sql': 'REAL'},
+                   {'tipo': 'calcular', 'campo': 'etiqueta', 'expresion': "{nombre} || '-' || {nombre_2}",
+                    'tipo_sql': 'TEXT'}]
+    salida, _ = _unir(entrada, tmp_path, operaciones)
+    assert leer(salida, 'resultado', ['valor', 'etiqueta']) == [
+        (3.0, 'uno-primero'), (5.0, 'dos-veinte'), (None, None), (None, None), (3.0, 'repetido-primero')]
+
+
+@pytest.mark.parametrize('expresion, esperado', [
+    ('(CAST(b."clase_texto" AS INTEGER))', True),
+    ('(CAST(b."x" AS real))', True),
+    ("(CAST('a)' || b.\"x\" AS NUMERIC))", True),
+    ('(CAST(b."x" AS TEXT))', False),
+    ('(CAST(b."x" AS INTEGER) + 1)', False),
+    ('(CAST(b."x" AS INTEGER) || CAST(b."y" AS REAL))', False),
+    ('(b."x")', False),
+    ('b."x"', False),
+])
+def test_conversion_numerica(expresion, esperado):
+    assert gpkg_sql._conversion_numerica(expresion) is esperado
+
+
+def _decodificar(campo, tabla='clasetipo', campo_2='T_Id'):
+    return {'tipo': 'decodificar', 'campo': campo, 'tabla': tabla, 'campo_2': campo_2, 'campos': ['iliCode']}
+
+
+CONVERTIR = {'tipo': 'calcular', 'campo': 'clase_numero', 'expresion': 'CAST({clase_texto} AS INTEGER)',
+             'tipo_sql': 'INTEGER'}
+CLASES = [('Clase.A',), ('Clase.B',), (None,), (None,), ('Clase.C',)]
+
+
+@pytest.mark.parametrize('operaciones', [
+    [_decodificar('clase')],
+    [CONVERTIR, _decodificar('clase_numero')],
+])
+def test_decodificar_con_case(entrada, tmp_path, operaciones):
+    dominios = Dominios(entrada)
+    _, consulta = _plan(entrada, operaciones, dominios)
+    assert 'CASE' in consulta and 'temp._u' not in consulta
+
+    con_case, _ = _unir(entrada, tmp_path / 'case', operaciones, dominios)
+    con_union, _ = _unir(entrada, tmp_path / 'union', operaciones)
+    # El primer T_Id 1 del dominio gana sobre el repetido, como en la unión
+    assert leer(con_case, 'resultado', ['iliCode']) == CLASES
+    assert leer(con_union, 'resultado', ['iliCode']) == CLASES
+
+
+@pytest.mark.parametrize('operaciones, esperado', [
+    # Clave de texto: la unión la compara como número y el CASE no lo haría
+    ([_decodificar('clase_texto')], CLASES),
+    # Más de MAX_CODIGOS códigos
+    ([_decodificar('clase', 'grandetipo')], [('Grande.1',), ('Grande.2',), (None,), ('Grande.7',), ('Grande.3',)]),
+    # Clave del dominio distinta de T_Id
+    ([{'tipo': 'calcular', 'campo': 'codigo', 'expresion': "'Clase.' || {nombre}", 'tipo_sql': 'TEXT'},
+      _decodificar('codigo', campo_2='iliCode')], [(None,)] * 5),
+])
+def test_decodificar_vuelve_a_la_union(entrada, tmp_path, operaciones, esperado):
+    dominios = Dominios(entrada)
+    _, consulta = _plan(entrada, operaciones, dominios)
+    assert 'CASE' not in consulta and 'temp._u' in consulta
+
+    con_dominios, _ = _unir(entrada, tmp_path / 'dominios', operaciones, dominios)
+    sin_dominios, _ = _unir(entrada, tmp_path / 'union', operaciones)
+    assert leer(con_dominios, 'resultado', ['iliCode']) == esperado
+    assert leer(sin_dominios, 'resultado', ['iliCode']) == esperado
+
+
+def test_decodificacion_sin_dominio_cargado(entrada):
+    campos = gpkg_sql.CamposUnion()
+    campos.agregar([('clase', 'b."clase"', 'INTEGER')])
+    assert gpkg_sql._decodificacion(campos, _decodificar('clase'), None) is None
+    decodificados = gpkg_sql._decodificacion(campos, _decodificar('clase'), Dominios(entrada))
+    assert [nombre for nombre, _, _ in decodificados] == ['iliCode']
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from ..etl_grafo import ErrorGrafo, ErrorPaso, GrafoETL, Paso, Salida, ejecutar_grafo, referencias, resolver
+
+
+class Registro:
+    """Eventos ('inicio' | 'fin', paso) en el orden en que ocurren en los hilos."""
+
+    def __init__(self):
+        self.eventos = []
+        self._lock = threading.Lock()
+
+    def anotar(self, evento, nombre):
+        with self._lock:
+            self.eventos.append((evento, nombre))
+
+    def posicion(self, evento, nombre):
+        return self.eventos.index((evento, nombre))
+
+    def paso(self, nombre, espera=0.0):
+        def funcion(entradas):
+            self.anotar('inicio', nombre)
+            time.sleep(espera)
+            self.anotar('fin', nombre)
+            return {'OUTPUT': nombre, 'entradas': entradas}
+        return funcion
+
+
+def _grafo(*pasos):
+    grafo = GrafoETL()
+    for paso in pasos:
+        grafo.agregar(paso)
+    return grafo
+
+
+def test_respeta_las_dependencias():
+    registro = Registro()
+    # a -> (b, c) -> d
+    grafo = _grafo(Paso('d', registro.paso('d'), depende=['b', 'c']),
+                   Paso('b', registro.paso('b', 0.05), depende=['a']),
+                   Paso('c', registro.paso('c'), depende=['a']),
+                   Paso('a', registro.paso('a', 0.05)))
+    resultados = ejecutar_grafo(grafo, max_hilos=4)
+
+    assert sorted(resultados) == ['a', 'b', 'c', 'd']
+    for paso in grafo:
+        for dep in paso.depende:
+            assert registro.posicion('fin', dep) < registro.posicion('inicio', paso.nombre)
+    # Cada paso recibe las salidas de sus dependencias, y solo esas
+    assert resultados['d']['entradas'] == {'b': resultados['b'], 'c': resultados['c']}
+    assert resultados['a']['entradas'] == {}
+
+
+def test_ramas_independientes_en_paralelo():
+    # Las dos ramas solo terminan si corren a la vez
+    barrera = threading.Barrier(2, timeout=5)
+
+    def rama(entradas):
+        barrera.wait()
+        return {'OUTPUT': True}
+
+    resultados = ejecutar_grafo(_grafo(Paso('a', rama), Paso('b', rama)), max_hilos=2)
+    assert resultados == {'a': {'OUTPUT': True}, 'b': {'OUTPUT': True}}
+
+
+def test_serializa_los_pasos_que_comparten_recursos():
+    registro = Registro()
+    grafo = _grafo(*[Paso(f'escribir_{i}', registro.paso(f'escribir_{i}', 0.02), recursos=['salida'])
+                     for i in range(4)],
+                   Paso('libre', registro.paso('libre', 0.05)))
+    ejecutar_grafo(grafo, max_hilos=5)
+
+    activos, maximo = set(), 0
+    for evento, nombre in registro.eventos:
+        if nombre == 'libre':
+            continue
+        if evento == 'inicio':
+            activos.add(nombre)
+            maximo = max(maximo, len(activos))
+        else:
+            activos.discard(nombre)
+    assert maximo == 1
+    # El paso sin recursos no espera a los que escriben
+    assert registro.posicion('inicio', 'libre') < registro.posicion('fin', 'escribir_0')
+
+
+def test_cancelacion():
+    registro = Registro()
+    cancelar = threading.Event()
+    avisos = []
+
+    def largo(entradas):
+        registro.anotar('inicio', 'largo')
+        cancelar.set()
+        time.sleep(0.1)
+        registro.anotar('fin', 'largo')
+        return {'OUTPUT': 'largo'}
+
+    grafo = _grafo(Paso('largo', largo), Paso('despues', registro.paso('despues'), depende=['largo']),
+                   Paso('otro', registro.paso('otro'), depende=['largo']))
+    resultado = ejecutar_grafo(grafo, max_hilos=2, cancelado=cancelar.is_set,
+                               al_cancelar=lambda: avisos.append(True))
+
+    assert resultado is None
+    assert avisos == [True]
+    # El paso en curso termina; los que dependen de él no se lanzan
+    assert registro.eventos == [('inicio', 'largo'), ('fin', 'largo')]
+
+
+def test_error_de_un_paso():
+    registro = Registro()
+    avisos, terminados = [], []
+
+    def falla(entradas):
+        raise ValueError('capa dañada')
+
+    grafo = _grafo(Paso('a', registro.paso('a')), Paso('b', falla, depende=['a']),
+                   Paso('c', registro.paso('c'), depende=['b']))
+    with pytest.raises(ErrorPaso) as excinfo:
+        ejecutar_grafo(grafo, max_hilos=2, al_cancelar=lambda: avisos.append(True),
+                       al_terminar=lambda paso, resultado: terminados.append(paso.nombre))
+
+    assert excinfo.value.paso == 'b'
+    assert isinstance(excinfo.value.error, ValueError)
+    assert excinfo.value.__cause__ is excinfo.value.error
+    assert "'b'" in str(excinfo.value) and 'capa dañada' in str(excinfo.value)
+    assert avisos == [True]
+    assert terminados == ['a']
+    assert ('inicio', 'c') not in registro.eventos
+
+
+def test_error_no_interrumpe_los_pasos_en_curso():
+    registro = Registro()
+
+    def falla(entradas):
+        raise RuntimeError('falla')
+
+    grafo = _grafo(Paso('lento', registro.paso('lento', 0.1)), Paso('falla', falla),
+                   Paso('siguiente', registro.paso('siguiente'), depende=['lento']))
+    with pytest.raises(ErrorPaso) as excinfo:
+        ejecutar_grafo(grafo, max_hilos=2)
+    assert excinfo.value.paso == 'falla'
+    assert registro.eventos == [('inicio', 'lento'), ('fin', 'lento')]
+
+
+def test_validar():
+    with pytest.raises(ErrorGrafo, match='inexistentes'):
+        _grafo(Paso('a', None, depende=['x'])).validar()
+    with pytest.raises(ErrorGrafo, match='ciclos'):
+        _grafo(Paso('a', None, depende=['b']), Paso('b', None, depende=['a']), Paso('c', None)).validar()
+    with pytest.raises(ErrorGrafo, match='duplicado'):
+        _grafo(Paso('a', None), Paso('a', None))
+    # Orden topológico estable: respeta el orden de inserción entre pasos independientes
+    grafo = _grafo(Paso('c', None, depende=['a']), Paso('b', None), Paso('a', None))
+    assert grafo.orden() == ['b', 'a', 'c']
+
+
+def test_referencias_y_resolver():
+    parametros = {'INPUT': Salida('a'), 'CAMPOS': [Salida('b', 'FIELD'), 'fijo'], 'OTRO': (Salida('c', None),)}
+    assert referencias(parametros) == {'a', 'b', 'c'}
+    resultados = {'a': {'OUTPUT': 'capa_a'}, 'b': {'FIELD': 'campo'}, 'c': 'crudo'}
+    assert resolver(parametros, resultados) == {'INPUT': 'capa_a', 'CAMPOS': ['campo', 'fijo'], 'OTRO': ('crudo',)}
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+from .. import etl_cache, etl_manifiesto, gpkg_sql
+from .conftest import crear_tabla, punto
+
+
+@pytest.fixture
+def fuente(tmp_path):
+    ruta = str(tmp_path / 'fuente.gpkg')
+    crear_tabla(ruta, 'capa', [('T_Id', 'INTEGER'), ('codigo', 'TEXT'), ('valor', 'REAL')], [
+        (1, 'A', 1.0),
+        (2, 'B', 2.0),
+        (3, 'C', 3.0),
+    ])
+    return ruta
+
+
+def _editar(ruta, sentencia, *parametros):
+    # Edición hecha directamente en SQLite: no actualiza gpkg_contents.last_change
+    conn = sqlite3.connect(ruta)
+    try:
+        conn.execute(sentencia, parametros)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('sentencia, parametros', [
+    # Mismo largo de texto
+    ("UPDATE capa SET codigo = 'Z' WHERE T_Id = 1", ()),
+    # Dos filas que intercambian valores: mismas sumas y largos por columna
+    ("UPDATE capa SET codigo = CASE T_Id WHEN 1 THEN 'B' ELSE 'A' END, "
+     "valor = CASE T_Id WHEN 1 THEN 2.0 ELSE 1.0 END WHERE T_Id IN (1, 2)", ()),
+    # Geometría del mismo tamaño
+    ('UPDATE capa SET geom = ? WHERE T_Id = 3', (punto(5, 7),)),
+    # Claves intercambiadas: cambia el primer coincidente de una unión
+    ('UPDATE capa SET T_Id = 4 - T_Id WHERE T_Id IN (1, 3)', ()),
+])
+def test_huella_de_contenido_detecta_ediciones(fuente, sentencia, parametros):
+    antes = etl_cache.huella_tabla(fuente, 'capa')
+    metadatos = etl_cache.huella_tabla(fuente, 'capa', contenido=False)
+    _editar(fuente, sentencia, *parametros)
+    assert etl_cache.huella_tabla(fuente, 'capa') != antes
+    # La huella de metadatos no lee las filas: no ve estas ediciones
+    assert etl_cache.huella_tabla(fuente, 'capa', contenido=False) == metadatos
+
+
+def test_huella_de_contenido_no_depende_de_la_fecha(fuente):
+    # Una entrega reexportada con los mismos datos conserva su huella
+    antes = etl_cache.huella_tabla(fuente, 'capa')
+    _editar(fuente, "UPDATE gpkg_contents SET last_change = '2030-01-01T00:00:00.000Z' WHERE table_name = 'capa'")
+    assert etl_cache.huella_tabla(fuente, 'capa') == antes
+    assert etl_cache.huella_tabla(fuente, 'capa', contenido=False) != antes
+
+
+def test_huella_de_tabla_inexistente(fuente):
+    assert etl_cache.huella_tabla(fuente, 'no_existe') == {'existe': False}
+
+
+def test_manifiesto(tmp_path):
+    ruta = str(tmp_path / 'salida.gpkg')
+    assert etl_manifiesto.leer(ruta) == {}
+    for tabla in ('lc_terreno', 'lc_predio'):
+        crear_tabla(ruta, tabla, [('T_Id', 'INTEGER')], [(1,)])
+    assert etl_manifiesto.leer(ruta) == {}
+
+    etl_manifiesto.escribir(ruta, 'ladm_1_2', {'lc_terreno': 'f1', 'lc_predio': 'f2'})
+    assert etl_manifiesto.leer(ruta) == {'lc_terreno': 'f1', 'lc_predio': 'f2'}
+    etl_manifiesto.escribir(ruta, 'ladm_1_2', {'lc_terreno': 'f3'})
+    assert etl_manifiesto.leer(ruta) == {'lc_terreno': 'f3', 'lc_predio': 'f2'}
+
+    # Una tabla borrada de la salida no cuenta como al día
+    conn = gpkg_sql.conectar(ruta)
+    try:
+        gpkg_sql.eliminar_tabla(conn, 'lc_predio')
+    finally:
+        conn.close()
+    assert etl_manifiesto.leer(ruta) == {'lc_terreno': 'f3'}
+
+    # Antes de reescribir una tabla se olvida su firma
+    etl_manifiesto.olvidar(ruta, ['lc_terreno'])
+    assert etl_manifiesto.leer(ruta) == {}
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from .. import etl_modelos, etl_sintetico
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return etl_modelos.CacheDetecciones(str(tmp_path / 'cache'))
+
+
+@pytest.mark.parametrize('modelo', sorted(etl_sintetico.ESQUEMAS))
+def test_detecta_los_modelos_sinteticos(sinteticos, cache, modelo):
+    ruta = sinteticos[modelo]
+    antes = os.stat(ruta)
+    resultado = etl_modelos.detectar(ruta, cache=cache)
+    assert resultado['modelo'] == modelo and resultado['cache'] is False
+    assert 'motivo' not in resultado
+    assert resultado['cobertura'][modelo] > 0.5
+    assert etl_modelos.modelo_de(ruta, cache=False) == modelo
+    # Solo lee metadatos: el archivo no cambia ni queda con -wal
+    despues = os.stat(ruta)
+    assert (despues.st_size, despues.st_mtime_ns) == (antes.st_size, antes.st_mtime_ns)
+    assert not os.path.exists(f'{ruta}-wal')
+
+
+def test_descartados_explican_el_motivo(sinteticos):
+    resultado = etl_modelos.detectar(sinteticos['ladm_1_0'], cache=False)
+    assert set(resultado['descartados']) == {'interno', 'ladm_1_2'}
+    assert 'falta la tabla lc_caracteristicasunidadconstruccion' in resultado['descartados']['ladm_1_2']
+    assert 'falta la tabla cr_terreno' in resultado['descartados']['interno']
+
+
+def test_cache_de_detecciones(sinteticos, cache, tmp_path):
+    ruta = str(tmp_path / 'entrada.gpkg')
+    shutil.copyfile(sinteticos['ladm_1_0'], ruta)
+    assert etl_modelos.detectar(ruta, cache=cache)['cache'] is False
+    assert etl_modelos.detectar(ruta, cache=cache) == dict(etl_modelos.detectar(ruta, cache=False), cache=True)
+    # Persiste entre procesos
+    otra = etl_modelos.CacheDetecciones(cache.directorio)
+    assert etl_modelos.detectar(ruta, cache=otra)['cache'] is True
+
+    # Con la tabla que excluye LADM 1.0 el archivo pasa a cumplir LADM 1.2: la huella
+    # del archivo cambia y la detección guardada no se reutiliza
+    conn = sqlite3.connect(ruta)
+    try:
+        conn.execute('CREATE TABLE lc_caracteristicasunidadconstruccion (T_Id INTEGER)')
+        conn.commit()
+    finally:
+        conn.close()
+    resultado = etl_modelos.detectar(ruta, cache=cache)
+    assert resultado['cache'] is False and resultado['modelo'] == 'ladm_1_2'
+    assert 'tiene la tabla lc_caracteristicasunidadconstruccion' in resultado['descartados']['ladm_1_0']
+
+
+def test_cache_por_defecto(sinteticos, tmp_path, monkeypatch):
+    monkeypatch.setenv('VALIDADORES_ETL_CACHE', str(tmp_path / 'cache'))
+    monkeypatch.setattr(etl_modelos, '_cache', None)
+    assert etl_modelos.detectar(sinteticos['interno'])['cache'] is False
+    assert etl_modelos.detectar(sinteticos['interno'])['cache'] is True
+    assert os.path.isfile(tmp_path / 'cache' / 'modelos.sqlite')
+
+
+def test_sin_modelo(entrada):
+    resultado = etl_modelos.detectar(entrada, cache=False)
+    assert resultado['modelo'] is None and resultado['motivo'] == 'ningún perfil coincide'
+    with pytest.raises(ValueError, match='ningún perfil coincide'):
+        etl_modelos.modelo_de(entrada, cache=False)
+    with pytest.raises(FileNotFoundError):
+        etl_modelos.detectar(f'{entrada}.no', cache=False)
+
+
+def test_empate():
+    perfil = {'capas': {'terreno': 'lc_terreno'}, 'deteccion': {'requeridas': {'lc_terreno': []}, 'excluidas': []}}
+    resultado = etl_modelos.detectar_esquema({'lc_terreno': set()}, {'a': perfil, 'b': perfil})
+    assert resultado['modelo'] is None and resultado['motivo'] == 'ambiguo entre b y a'
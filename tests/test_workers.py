@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+El pool corre con funciones de prueba en lugar de las de etl_cli: los procesos
+(spawn) las importan de este módulo, sin QGIS.
+"""
+import multiprocessing
+import os
+import socket
+import stat
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from .. import etl_workers
+
+
+def _iniciar():
+    pass
+
+
+def _iniciar_con_fallo():
+    raise RuntimeError('sin QGIS')
+
+
+def _ejecutar(trabajo):
+    if trabajo.get('morir'):
+        # Un fallo a mitad del trabajo, cuando el aviso de inicio ya salió de la cola
+        time.sleep(0.5)
+        os._exit(1)
+    return {'estado': 'ok', 'valor': trabajo['valor']}
+
+
+def _pool(**opciones):
+    return etl_workers.PoolTrabajadores(ejecutar=_ejecutar, iniciar=_iniciar, **opciones)
+
+
+def test_recicla_despues_de_max_trabajos():
+    with _pool(procesos=1, max_trabajos=2) as pool:
+        resumenes = pool.mapa([{'valor': i} for i in range(5)])
+    assert [resumen['valor'] for resumen in resumenes] == list(range(5))
+    trabajadores = [resumen['trabajador'] for resumen in resumenes]
+    # Dos trabajos por proceso
+    assert trabajadores[0] == trabajadores[1] != trabajadores[2] == trabajadores[3] != trabajadores[4]
+    assert pool.reciclados >= 2
+
+
+def test_recicla_por_memoria():
+    with _pool(procesos=1, max_memoria_mb=1) as pool:
+        resumenes = pool.mapa([{'valor': i} for i in range(3)])
+    assert len({resumen['trabajador'] for resumen in resumenes}) == 3
+
+
+def test_reemplaza_un_proceso_que_muere():
+    with _pool(procesos=1) as pool:
+        caido, siguiente = pool.mapa([{'morir': True, 'modelo': 'ladm_1_2', 'entrada': 'a.gpkg', 'salida': 'b.gpkg'},
+                                      {'valor': 1}])
+    assert pool.reciclados == 1
+    assert caido['estado'] == 'error' and 'inesperadamente' in caido['error']
+    assert (caido['modelo'], caido['entrada'], caido['salida']) == ('ladm_1_2', 'a.gpkg', 'b.gpkg')
+    assert siguiente == {'estado': 'ok', 'valor': 1, 'trabajador': siguiente['trabajador']}
+    assert siguiente['trabajador'] != caido['trabajador']
+
+
+def test_qgis_que_no_arranca_falla_los_pendientes():
+    pool = etl_workers.PoolTrabajadores(procesos=1, ejecutar=_ejecutar, iniciar=_iniciar_con_fallo)
+    resumen = pool.enviar({'valor': 1, 'modelo': 'interno'}).result(timeout=60)
+    pool.cerrar()
+    assert resumen['estado'] == 'error' and 'sin QGIS' in resumen['error']
+    with pytest.raises(RuntimeError, match='cerrado'):
+        pool.enviar({'valor': 2})
+
+
+@pytest.fixture
+def sin_clave(tmp_path, monkeypatch):
+    ruta = str(tmp_path / 'config' / 'clave')
+    monkeypatch.setenv('VALIDADORES_ETL_ARCHIVO_CLAVE', ruta)
+    monkeypatch.delenv('VALIDADORES_ETL_CLAVE', raising=False)
+    return ruta
+
+
+def test_clave_por_defecto(sin_clave, monkeypatch):
+    # Un cliente no inventa una clave; el servidor la crea
+    with pytest.raises(FileNotFoundError, match='VALIDADORES_ETL_CLAVE'):
+        etl_workers.clave_por_defecto()
+    clave = etl_workers.clave_por_defecto(crear=True)
+    assert len(clave) == 64
+    assert etl_workers.clave_por_defecto() == clave == etl_workers.crear_clave()
+
+    monkeypatch.setenv('VALIDADORES_ETL_CLAVE', 'secreta')
+    assert etl_workers.clave_por_defecto() == b'secreta'
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='permisos POSIX')
+def test_permisos_del_archivo_de_clave(sin_clave):
+    etl_workers.crear_clave()
+    assert stat.S_IMODE(os.stat(sin_clave).st_mode) == 0o600
+    os.chmod(sin_clave, 0o644)
+    with pytest.raises(PermissionError, match='600'):
+        etl_workers.leer_clave()
+    with pytest.raises(PermissionError):
+        etl_workers.crear_clave()
+
+
+def test_archivo_de_clave_vacio(sin_clave):
+    os.makedirs(os.path.dirname(sin_clave))
+    descriptor = os.open(sin_clave, os.O_WRONLY | os.O_CREAT, 0o600)
+    os.close(descriptor)
+    with pytest.raises(ValueError, match='vacío'):
+        etl_workers.leer_clave()
+
+
+class PoolInmediato:
+    """Resuelve cada trabajo en el hilo que lo envía."""
+
+    def enviar(self, trabajo):
+        futuro = Future()
+        futuro.set_result({'estado': 'ok', 'valor': trabajo['valor']})
+        return futuro
+
+
+def _puerto_libre():
+    with socket.socket() as conexion:
+        conexion.bind((etl_workers.HOST, 0))
+        return conexion.getsockname()[1]
+
+
+def test_servidor_rechaza_otra_clave():
+    puerto = _puerto_libre()
+    servidor = threading.Thread(target=etl_workers.servir, args=(PoolInmediato(), puerto, b'correcta'), daemon=True)
+    servidor.start()
+    for _ in range(100):
+        try:
+            resumenes = etl_workers.enviar_al_servidor([{'valor': 1}, {'valor': 2}], puerto, b'correcta')
+            break
+        except ConnectionRefusedError:
+            time.sleep(0.05)
+    assert resumenes == [{'estado': 'ok', 'valor': 1}, {'estado': 'ok', 'valor': 2}]
+
+    with pytest.raises(multiprocessing.AuthenticationError):
+        etl_workers.enviar_al_servidor([{'valor': 3}], puerto, b'otra')
+    # El servidor sigue atendiendo después de rechazar la conexión
+    assert etl_workers.enviar_al_servidor([{'valor': 4}], puerto, b'correcta') == [{'estado': 'ok', 'valor': 4}]
+
+    assert etl_workers.detener_servidor(puerto, b'correcta') == {'estado': 'cerrando'}
+    servidor.join(timeout=10)
+    assert not servidor.is_alive()
@@ -1,665 +1,88 @@
-# -*- coding: utf-8 -*-
-from qgis.core import QgsProcessing, QgsProcessingAlgorithm, QgsProcessingMultiStepFeedback, QgsProcessingParameterFile, QgsProcessingParameterFileDestination, QgsProcessingProvider
-import processing
-import os
-
-class Validadores(QgsProcessingAlgorithm):
-
-    def initAlgorithm(self, config=None):
-        self.addParameter(QgsProcessingParameterFile('input_gpkg', 'Seleccione el archivo GeoPackage de entrada', extension='gpkg'))
-        self.addParameter(QgsProcessingParameterFileDestination('output_gpkg', 'Archivo GeoPackage de salida', 'GeoPackage files (*.gpkg)'))
-
-    def processAlgorithm(self, parameters, context, feedback):
-        feedback = QgsProcessingMultiStepFeedback(21, feedback)
-        results = {}
-        outputs = {}
-
-        input_gpkg = parameters['input_gpkg']
-        output_gpkg = parameters['output_gpkg']
-
-        # Verifica la ruta de salida
-        print(f"Ruta del archivo de salida: {output_gpkg}")
-
-        # Crear el directorio de salida si no existe
-        directory = os.path.dirname(output_gpkg)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-
-        # Leer automáticamente las capas del GeoPackage
-        layers = {
-            'col_uebaunit': 'col_uebaunit',
-            'lc_unidad': 'cr_unidadconstruccion',
-            'lc_caracteristicas': 'ilc_caracteristicasunidadconstruccion',
-            'cr_construccionplantatipo': 'cr_construccionplantatipo',
-            'cr_unidadconstrucciontipo': 'cr_unidadconstrucciontipo',
-            'direccion': 'extdireccion',
-            'tabla_predio': 'ilc_predio',
-            'tabla_derecho': 'ilc_derecho',
-            'tabla_derecho_tipo': 'ilc_derechocatastraltipo',
-            'col_unidad_administrativa_basica_tipo': 'col_unidadadministrativabasicatipo',
-            'lc_terreno': 'cr_terreno',
-            'CC_Barrio': 'cc_barrio',
-            'CC_Localidad_Comuna': 'cc_localidadcomuna',
-            'CC_Sector_Urbano': 'cc_sectorurbano',
-            'CC_Sector_Rural': 'cc_sectorrural',
-            'CC_Centro_Poblado': 'cc_centropoblado',
-            'CC_Corregimiento': 'cc_corregimiento',
-            'CC_Manzana': 'cc_manzana',
-            'CC_Vereda': 'cc_vereda',
-            'CC_Limite_Municipio': 'cc_limitemunicipio',
-            'CC_Perimetro_Urbano': 'cc_perimetrourbano',
-            'AV_ZHGU': 'vm_zonahomogeneageoeconomicaurbana',
-            'AV_ZHFU': 'vm_zonahomogeneafisicaurbana',
-            'AV_ZHGR': 'vm_zonahomogeneageoeconomicarural',
-            'AV_ZHFR': 'vm_zonahomogeneafisicarural',
-        }
-        
-        
-
-        def layer_path(layer_name):
-            return f"{input_gpkg}|layername={layer_name}"
-
-        # Extraer por expresión
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['CC_Limite_Municipio']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Limite_Municipio" (geom)',
-        }
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-
-        feedback.setCurrentStep(1)
-        if feedback.isCanceled():
-            return {}
-
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['CC_Centro_Poblado']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Centro_Poblado" (geom)',
-        }
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        feedback.setCurrentStep(2)
-        if feedback.isCanceled():
-            return {}
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['AV_ZHGU']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="Zona_homo_geoeconomicaurbana" (geom)',
-        }
-        
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        feedback.setCurrentStep(3)
-        if feedback.isCanceled():
-            return {}
-        
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['AV_ZHFU']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="Zona_homo_fisicaurbana" (geom)',
-        }
-        
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        
-        feedback.setCurrentStep(4)
-        if feedback.isCanceled():
-            return {}
-        
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['AV_ZHFR']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="Zona_homo_fisicarural" (geom)',
-        }
-        
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        
-        feedback.setCurrentStep(5)
-        if feedback.isCanceled():
-            return {}
-        
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['AV_ZHGR']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="Zona_homo_geoeconomicarural" (geom)',
-        }
-        
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        
-        feedback.setCurrentStep(6)
-        if feedback.isCanceled():
-            return {}
-            
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['CC_Corregimiento']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Corregimiento" (geom)',
-        }
-        
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        
-        feedback.setCurrentStep(7)
-        if feedback.isCanceled():
-            return {}
-        
-    
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['CC_Manzana']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_manzana" (geom)',
-        }
-        
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        
-        feedback.setCurrentStep(8)
-        if feedback.isCanceled():
-            return {}
-        
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['CC_Barrio']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_barrio" (geom)',
-        }
-        
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin']= result
-        
-        feedback.setCurrentStep(9)
-        if feedback.isCanceled():
-            return {}
-
-
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['CC_Vereda']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_vereda" (geom)',
-        }
-        
-
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        feedback.setCurrentStep(10)
-        if feedback.isCanceled():
-            return {}
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['CC_Localidad_Comuna']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Localidad_comuna" (geom)',
-        }
-        
-
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['extractbyexpression'] = result
-        
-        feedback.setCurrentStep(11)
-        if feedback.isCanceled():
-            return {}
-        
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['CC_Sector_Urbano']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Sector_urbano" (geom)',
-        }
-        
-
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        feedback.setCurrentStep(12)
-        if feedback.isCanceled():
-            return {}
-        
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['CC_Sector_Rural']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Sector_rural" (geom)',
-        }
-        
-
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        feedback.setCurrentStep(13)
-        if feedback.isCanceled():
-            return {}
-        
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['CC_Perimetro_Urbano']),
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="CC_Perimetro" (geom)',
-        }
-        
-
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-        
-        feedback.setCurrentStep(14)
-        if feedback.isCanceled():
-            return {}
-        
-        
-        
-        # join-terreno-predio
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 't_id',
-            'FIELDS_TO_COPY': ['baunit'],
-            'FIELD_2': 'ue_cr_terreno',
-            'INPUT': layer_path(layers['lc_terreno']),
-            'INPUT_2': layer_path(layers['col_uebaunit']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT,
-        }
-
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-        outputs['JoinAtributos'] = result
-        
-        feedback.setCurrentStep(15)
-        if feedback.isCanceled():
-            return {}
-        
-        
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'baunit',
-            'FIELDS_TO_COPY': [''],
-            'FIELD_2': 't_id',
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layers['tabla_predio']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="lc_predio" (geom)',
-        }
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-        
-        feedback.setCurrentStep(16)
-        if feedback.isCanceled():
-            return {}
-
-        
-        
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'tipo',
-            'FIELDS_TO_COPY': ['iliCode'],
-            'FIELD_2': 'T_id',
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layers['col_unidad_administrativa_basica_tipo']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="Lc_Tipo_predio" (geom)',
-            'PREFIX': ''
-        }
-
-        result =  processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-        outputs['JoinAtributos'] = result
-        
-        
-        feedback.setCurrentStep(17)
-        if feedback.isCanceled():
-            return {}
-        
-        ##derecho
-
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'T_id',
-            'FIELDS_TO_COPY': ['baunit'],
-            'FIELD_2': 'ue_cr_terreno',
-            'INPUT': layer_path(layers['lc_terreno']),
-            'INPUT_2': layer_path(layers['col_uebaunit']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT,
-        }
-        
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-        outputs['JoinAtributos'] = result
-        
-        feedback.setCurrentStep(18)
-        if feedback.isCanceled():
-            return {}
-
-        
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'baunit',
-            'FIELDS_TO_COPY': ['numero_predial_nacional','baunit'],
-            'FIELD_2': 'T_id',
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layers['tabla_predio']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT,
-        }
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-        
-        feedback.setCurrentStep(19)
-        if feedback.isCanceled():
-            return {}
-
-        
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'baunit',
-            'FIELDS_TO_COPY': ['tipo'],
-            'FIELD_2': 'unidad',
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layers['tabla_derecho']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }
-        
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-        
-        feedback.setCurrentStep(20)
-        if feedback.isCanceled():
-            return {}
-
-        
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'tipo',
-            'FIELDS_TO_COPY': ['iliCode'],
-            'FIELD_2': 'T_id',
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layers['tabla_derecho_tipo']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="lc_derecho_tipo" (geom)',
-            'PREFIX': ''
-        }
-        
-        result =  processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-        outputs['JoinAtributos'] = result
-        
-        
-        feedback.setCurrentStep(21)
-        if feedback.isCanceled():
-            return {}
-        
-        ##
-        
-        
-        #direccion
-        
-        alg_params = {
-            'EXPRESSION': ' "T_Id" is not NULL',
-            'INPUT': layer_path(layers['direccion']),
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT,
-        }
-        result = processing.run('native:extractbyexpression', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['ExtraerPorExpresin'] = result
-
-        feedback.setCurrentStep(20)
-        if feedback.isCanceled():
-            return {}
-
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'ilc_predio_direccion',
-            'FIELD_2': 'T_id',
-            'FIELDS_TO_COPY': [''],
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layers['tabla_predio']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="Extdireccion" (geom)',
-        }
-        
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        feedback.setCurrentStep(21)
-        if feedback.isCanceled():
-            return {}
-        
-        
-        #unidad
-        
-        
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'T_id',
-            'FIELDS_TO_COPY': ['baunit'],
-            'FIELD_2': 'ue_cr_unidadconstruccion',
-            'INPUT':   layer_path(layers['lc_unidad']),
-            'INPUT_2': layer_path(layers['col_uebaunit']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT
-        }
-        
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-        feedback.setCurrentStep(22)
-        if feedback.isCanceled():
-            return {}   
-
-
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'baunit',
-            'FIELDS_TO_COPY': ['numero_predial_nacional','baunit'],
-            'FIELD_2': 'T_id',
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layers['tabla_predio']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT,
-        }
-        
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-              
-        feedback.setCurrentStep(23)
-        if feedback.isCanceled():
-            return {}
-
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'cr_caracteristicasunidadconstruccion',
-            'FIELDS_TO_COPY': ['identificador', 'tipo_unidad_construccion'],
-            'FIELD_2': 'T_id',
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layers['lc_caracteristicas']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT,
-        }
-
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-        
-        feedback.setCurrentStep(24)
-        if feedback.isCanceled():
-            return {} 
-        
-    
-    
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'tipo_unidad_construccion',
-            'FIELDS_TO_COPY': ['iliCode'],
-            'FIELD_2': 'T_id',
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layers['cr_unidadconstrucciontipo']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT,
-        }
-
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-        
-    
-        alg_params = {
-            'DISCARD_NONMATCHING': False,
-            'FIELD': 'tipo_planta',
-            'FIELDS_TO_COPY': [''],
-            'FIELD_2': 'T_id',
-            'INPUT': result['OUTPUT'],
-            'INPUT_2': layer_path(layers['cr_construccionplantatipo']),
-            'METHOD': 1,  # Tomar solo los atributos del primer objeto coincidente (uno a uno)
-            'PREFIX': '',
-            'OUTPUT': QgsProcessing.TEMPORARY_OUTPUT,
-        }
-
-        result = processing.run('native:joinattributestable', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['JoinAtributos'] = result
-        
-        
-        
-        if result is None:
-            feedback.pushInfo("Error al ejecutar joinattributestable.")
-            return {}
-        
-
-        outputs['JoinAtributos'] = result
-        
-        feedback.setCurrentStep(22)
-        if feedback.isCanceled():
-            return {} 
-
-
-
- # Crear el campo adicional 'planta_total'
-        alg_params = {
-            'FIELD_NAME': 'piso_total',
-            'FIELD_TYPE': 2,  # Tipo texto (String)
-            'FIELD_LENGTH': 20,  # Longitud del campo ajustada según sea necesario
-            'FIELD_PRECISION': 0,
-            'NEW_FIELD': True,
-            'FORMULA': 'concat(to_string("iliCode_2"), \' \', to_string("planta_ubicacion"))',  # Concatenar los campos con un espacio entre ellos
-            'INPUT': result['OUTPUT'],
-            'OUTPUT': f'ogr:dbname=\'{output_gpkg}\' table="lc_unidadconstruccion" (geom)',
-        }
-
-        result = processing.run('native:fieldcalculator', alg_params, context=context, feedback=feedback, is_child_algorithm=True)
-        outputs['FieldCalculator'] = result
-
-        if result is None:
-            feedback.pushInfo("Error al ejecutar fieldcalculator.")
-            return {}
-
-        feedback.setCurrentStep(25)
-        if feedback.isCanceled():
-            return {}
-
-
-    
-    ###
-        
-        
-        
-        
-        results['Output GeoPackage'] = output_gpkg
-        return results
-        
-        
-        
-    def name(self):
-        return 'etl_modelo_interno'
-
-    def displayName(self):
-        return 'ETL MODELO INTERNO 1.0'
-
-    def group(self):
-        return 'Validadores ETL'
-
-    def groupId(self):
-        return 'validadores_etl'
-
-    def createInstance(self):
-        return Validadores()
+# -*- coding: utf-8 -*-
+from .etl_base import AlgoritmoETL
+from .etl_modelos import capas
+
+
+# Capas del GeoPackage de entrada: perfil 'interno' de perfiles_modelos.json
+CAPAS = capas('interno')
+
+# Capas de límites que se copian filtrando los registros sin T_Id: (capa, tabla de salida)
+EXTRACCIONES = [
+    ('CC_Limite_Municipio', 'CC_Limite_Municipio'),
+    ('CC_Centro_Poblado', 'CC_Centro_Poblado'),
+    ('AV_ZHGU', 'Zona_homo_geoeconomicaurbana'),
+    ('AV_ZHFU', 'Zona_homo_fisicaurbana'),
+    ('AV_ZHFR', 'Zona_homo_fisicarural'),
+    ('AV_ZHGR', 'Zona_homo_geoeconomicarural'),
+    ('CC_Corregimiento', 'CC_Corregimiento'),
+    ('CC_Manzana', 'CC_manzana'),
+    ('CC_Barrio', 'CC_barrio'),
+    ('CC_Vereda', 'CC_vereda'),
+    ('CC_Localidad_Comuna', 'CC_Localidad_comuna'),
+    ('CC_Sector_Urbano', 'CC_Sector_urbano'),
+    ('CC_Sector_Rural', 'CC_Sector_rural'),
+    ('CC_Perimetro_Urbano', 'CC_Perimetro'),
+]
+
+PASOS = [
+    {'nombre': salida, 'tipo': 'extraer', 'entrada': capa, 'salida': salida}
+    for capa, salida in EXTRACCIONES
+] + [
+    # join-terreno-predio
+    {'nombre': 'terreno_baunit', 'tipo': 'unir', 'entrada': 'lc_terreno', 'campo': 't_id',
+     'entrada_2': 'col_uebaunit', 'campo_2': 'ue_cr_terreno', 'campos': ['baunit']},
+    {'nombre': 'lc_predio', 'tipo': 'unir', 'entrada': '@terreno_baunit', 'campo': 'baunit',
+     'entrada_2': 'tabla_predio', 'campo_2': 't_id', 'campos': None, 'salida': 'lc_predio'},
+    {'nombre': 'Lc_Tipo_predio', 'tipo': 'decodificar', 'entrada': '@lc_predio', 'campo': 'tipo',
+     'entrada_2': 'col_unidad_administrativa_basica_tipo', 'campo_2': 'T_id', 'campos': ['iliCode'],
+     'salida': 'Lc_Tipo_predio'},
+
+    # derecho
+    {'nombre': 'derecho_terreno_baunit', 'tipo': 'unir', 'entrada': 'lc_terreno', 'campo': 'T_id',
+     'entrada_2': 'col_uebaunit', 'campo_2': 'ue_cr_terreno', 'campos': ['baunit']},
+    {'nombre': 'derecho_predio', 'tipo': 'unir', 'entrada': '@derecho_terreno_baunit', 'campo': 'baunit',
+     'entrada_2': 'tabla_predio', 'campo_2': 'T_id', 'campos': ['numero_predial_nacional', 'baunit']},
+    {'nombre': 'derecho_tipo', 'tipo': 'unir', 'entrada': '@derecho_predio', 'campo': 'baunit',
+     'entrada_2': 'tabla_derecho', 'campo_2': 'unidad', 'campos': ['tipo']},
+    {'nombre': 'lc_derecho_tipo', 'tipo': 'decodificar', 'entrada': '@derecho_tipo', 'campo': 'tipo',
+     'entrada_2': 'tabla_derecho_tipo', 'campo_2': 'T_id', 'campos': ['iliCode'],
+     'salida': 'lc_derecho_tipo'},
+
+    # direccion
+    {'nombre': 'direccion_filtrada', 'tipo': 'extraer', 'entrada': 'direccion'},
+    {'nombre': 'Extdireccion', 'tipo': 'unir', 'entrada': '@direccion_filtrada', 'campo': 'ilc_predio_direccion',
+     'entrada_2': 'tabla_predio', 'campo_2': 'T_id', 'campos': None, 'salida': 'Extdireccion'},
+
+    # unidad
+    {'nombre': 'unidad_baunit', 'tipo': 'unir', 'entrada': 'lc_unidad', 'campo': 'T_id',
+     'entrada_2': 'col_uebaunit', 'campo_2': 'ue_cr_unidadconstruccion', 'campos': ['baunit']},
+    {'nombre': 'unidad_predio', 'tipo': 'unir', 'entrada': '@unidad_baunit', 'campo': 'baunit',
+     'entrada_2': 'tabla_predio', 'campo_2': 'T_id', 'campos': ['numero_predial_nacional', 'baunit']},
+    {'nombre': 'unidad_caracteristicas', 'tipo': 'unir', 'entrada': '@unidad_predio',
+     'campo': 'cr_caracteristicasunidadconstruccion', 'entrada_2': 'lc_caracteristicas', 'campo_2': 'T_id',
+     'campos': ['identificador', 'tipo_unidad_construccion']},
+    {'nombre': 'unidad_tipo', 'tipo': 'decodificar', 'entrada': '@unidad_caracteristicas', 'campo': 'tipo_unidad_construccion',
+     'entrada_2': 'cr_unidadconstrucciontipo', 'campo_2': 'T_id', 'campos': ['iliCode']},
+    {'nombre': 'unidad_planta', 'tipo': 'decodificar', 'entrada': '@unidad_tipo', 'campo': 'tipo_planta',
+     'entrada_2': 'cr_construccionplantatipo', 'campo_2': 'T_id', 'campos': None},
+    # Crear el campo adicional 'piso_total'
+    {'nombre': 'lc_unidadconstruccion', 'tipo': 'calcular', 'entrada': '@unidad_planta',
+     'campo': 'piso_total', 'tipo_campo': 2, 'longitud': 20,
+     'formula': 'concat(to_string("iliCode_2"), \' \', to_string("planta_ubicacion"))',
+     'expresion_sql': "ifnull(CAST({iliCode_2} AS TEXT), '') || ' ' || ifnull(CAST({planta_ubicacion} AS TEXT), '')",
+     'salida': 'lc_unidadconstruccion'},
+]
+
+
+class Validadores(AlgoritmoETL):
+    CAPAS = CAPAS
+    PASOS = PASOS
+
+    def name(self):
+        return 'etl_modelo_interno'
+
+    def displayName(self):
+        return 'ETL MODELO INTERNO 1.0'
+
+    def createInstance(self):
+        return Validadores()
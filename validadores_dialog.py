@@ -28,4 +28,9 @@ class ValidadoresDialog(QtWidgets.QDialog, FORM_CLASS):
 
     def get_output_gpkg(self):
         return self.output_gpkg.filePath()
-        return self.output_gpkg.filePath()
\ No newline at end of file
+
+    def get_perfil(self):
+        return self.perfil.isChecked()
+
+    def get_usar_cache(self):
+        return self.usar_cache.isChecked()
@@ -2,7 +2,7 @@
 from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QMessageBox, QMenu, QToolButton
-from qgis.core import QgsApplication, QgsProcessingProvider, Qgis, QgsProcessingContext, QgsProcessingFeedback
+from qgis.core import QgsApplication, Qgis, QgsProcessingContext, QgsProcessingFeedback
 import os.path
 import logging
 
@@ -11,30 +11,8 @@ from .validadores_algorithm import Validadores
 from .etl_gpk_1_2 import ValidadoresLADM
 from .validadores_dialog import ValidadoresDialog
 from .etl_gpk_LADM1_0 import ValidadoresLADM10
-
-class ValidadoresProvider(QgsProcessingProvider):
-    def __init__(self):
-        super().__init__()
-
-    def loadAlgorithms(self):
-        self.addAlgorithm(Validadores())
-        self.addAlgorithm(ValidadoresLADM())
-        self.addAlgorithm(ValidadoresLADM10())
-
-    def id(self):
-        return 'validadoresETL'
-
-    def name(self):
-        return self.tr('Validadores ETL')
-
-    def icon(self):
-        return QIcon(os.path.join(os.path.dirname(__file__), 'icon_plugin.ico'))
-
-    def createContext(self):
-        return QgsProcessingContext()
-
-    def createFeedback(self):
-        return QgsProcessingFeedback()
+from .validadores_provider import MODELOS, ValidadoresProvider
+from .etl_modelos import PERFILES, detectar
 
 class ValidadoresPlugin:
     def __init__(self, iface):
@@ -57,6 +35,10 @@ class ValidadoresPlugin:
         QgsApplication.processingRegistry().addProvider(self.provider)
         
         # Crear acciones para cada herramienta
+        self.action_auto = QAction(
+            QIcon(os.path.join(self.plugin_dir, 'icon_plugin.ico')),
+            'ETL (DETECTAR MODELO)', 
+            self.iface.mainWindow())
         self.action_interno = QAction(
             QIcon(os.path.join(self.plugin_dir, 'icon_plugin.ico')),
             'ETL MODELO INTERNO 1.0', 
@@ -76,19 +58,22 @@ class ValidadoresPlugin:
         self.action_ladm_10.triggered.connect(self.run_ladm_10)
         
         # Agregar al menú desplegable
+        self.toolButton.menu().addAction(self.action_auto)
         self.toolButton.menu().addAction(self.action_interno)
         self.toolButton.menu().addAction(self.action_ladm)
         self.toolButton.menu().addAction(self.action_ladm_10)
         
         
         # Conectar las acciones
+        self.action_auto.triggered.connect(self.run_auto)
         self.action_interno.triggered.connect(self.run_interno)
         self.action_ladm.triggered.connect(self.run_ladm)
         
         # Agregar acciones al menú desplegable
         self.toolButton.menu().addAction(self.action_interno)
         self.toolButton.menu().addAction(self.action_ladm)
-        self.toolButton.setDefaultAction(self.action_interno)
+        # Por defecto el modelo se identifica a partir del GeoPackage de entrada
+        self.toolButton.setDefaultAction(self.action_auto)
 
     def unload(self):
         QgsApplication.processingRegistry().removeProvider(self.provider)
@@ -97,6 +82,40 @@ class ValidadoresPlugin:
     def tr(self, message):
         return QCoreApplication.translate('ValidadoresPlugin', message)
 
+    def run_auto(self):
+        dialog = ValidadoresDialog()
+        dialog.setWindowTitle("ETL (DETECTAR MODELO)")
+        if not dialog.exec_():
+            return
+        input_gpkg = dialog.get_input_gpkg()
+        if not input_gpkg or not dialog.get_output_gpkg():
+            self.iface.messageBar().pushMessage(
+                "Error", 
+                "Por favor, seleccione los archivos de entrada y salida", 
+                level=Qgis.Critical
+            )
+            return
+
+        try:
+            deteccion = detectar(input_gpkg)
+        except Exception as e:
+            QMessageBox.critical(self.iface.mainWindow(), "Error", f"No se pudo leer el archivo de entrada: {str(e)}")
+            return
+        modelo = deteccion['modelo']
+        if modelo is None:
+            detalle = "\n".join(f"- {PERFILES[nombre]['nombre']}: {', '.join(motivos)}"
+                                 for nombre, motivos in deteccion['descartados'].items())
+            message = (f"No se pudo identificar el modelo del archivo de entrada ({deteccion['motivo']}). "
+                       f"Use la acción del modelo correspondiente.\n{detalle}")
+            QMessageBox.warning(self.iface.mainWindow(), "Advertencia", message)
+            return
+        self.iface.messageBar().pushMessage(
+            "Validadores ETL", 
+            f"Modelo detectado: {PERFILES[modelo]['nombre']}", 
+            level=Qgis.Info
+        )
+        self._run_etl(MODELOS[modelo](), dialog)
+
     def run_interno(self):
         dialog = ValidadoresDialog()
         dialog.setWindowTitle("ETL MODELO INTERNO 1.0")
@@ -135,7 +154,9 @@ class ValidadoresPlugin:
             result = algorithm.processAlgorithm(
                 {
                     'input_gpkg': input_gpkg,
-                    'output_gpkg': output_gpkg
+                    'output_gpkg': output_gpkg,
+                    'perfil': dialog.get_perfil(),
+                    'usar_cache': dialog.get_usar_cache()
                 }, 
                 context=context, 
                 feedback=feedback
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import QgsProcessingProvider, QgsProcessingContext, QgsProcessingFeedback
+import os.path
+
+from .validadores_algorithm import Validadores
+from .etl_gpk_1_2 import ValidadoresLADM
+from .etl_gpk_LADM1_0 import ValidadoresLADM10
+
+# Modelos disponibles por nombre corto (línea de comandos, trabajadores)
+MODELOS = {
+    'interno': Validadores,
+    'ladm_1_2': ValidadoresLADM,
+    'ladm_1_0': ValidadoresLADM10,
+}
+
+
+class ValidadoresProvider(QgsProcessingProvider):
+    def __init__(self):
+        super().__init__()
+
+    def loadAlgorithms(self):
+        self.addAlgorithm(Validadores())
+        self.addAlgorithm(ValidadoresLADM())
+        self.addAlgorithm(ValidadoresLADM10())
+
+    def id(self):
+        return 'validadoresETL'
+
+    def name(self):
+        return self.tr('Validadores ETL')
+
+    def icon(self):
+        return QIcon(os.path.join(os.path.dirname(__file__), 'icon_plugin.ico'))
+
+    def createContext(self):
+        return QgsProcessingContext()
+
+    def createFeedback(self):
+        return QgsProcessingFeedback()